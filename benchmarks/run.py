@@ -0,0 +1,179 @@
+"""Headless benchmarks for the Track Trades page.
+
+    python -m benchmarks.run --sizes 1e3 1e4 1e5 --output bench.json
+    python -m benchmarks.run --sizes 1e3 1e4 1e5 --compare bench.json
+
+Each stage of a page load (load, derive, aggregate, render) is timed on
+synthetic journals of the requested sizes with Streamlit stubbed out. The
+JSON report carries the commit it was run on, so reports from two commits
+can be compared stage by stage.
+"""
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks import streamlit_stub
+
+streamlit_stub.install()
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from benchmarks.synthetic_journal import synthetic_journal  # noqa: E402
+from src.journal.store import JOURNAL_COLUMNS, CsvJournalStore, ParquetJournalStore  # noqa: E402
+from src.trades_analysis.derived_columns import calculate_derived_columns  # noqa: E402
+from src.trades_analysis.monthly_profit_graph import monthly_profit_graph  # noqa: E402
+from src.trades_analysis.period_cube import build_period_cube  # noqa: E402
+from src.trades_analysis.summary_metrics import SummaryMetrics  # noqa: E402
+from src.trades_analysis.trade_data import trade_data  # noqa: E402
+from src.trades_analysis.trade_index import build_trade_index  # noqa: E402
+from src.trades_analysis.trade_summaries import trade_summaries  # noqa: E402
+from src.trades_analysis.yearly_performance import yearly_performance  # noqa: E402
+
+INITIAL_AMOUNT = 1000000
+# Stages too slow to be worth running above this many rows
+RENDER_LIMIT = 1_000_000
+
+
+def measure(func, repeat):
+    # Best wall time over `repeat` untraced runs; peak memory from one more
+    # run under tracemalloc, which would distort the timings
+    seconds = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+        del result
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, min(seconds), peak
+
+
+def stages(df, workdir):
+    csv_store = CsvJournalStore(workdir / "journal.csv")
+    parquet_store = ParquetJournalStore(workdir / "journal.parquet")
+    csv_store.save(df)
+    parquet_store.save(df)
+    # Two versions of the journal differing in one row; the parquet save
+    # alternates between them so every repeat rewrites that row's partition
+    # instead of finding nothing changed
+    edits = [df.copy(), df.copy()]
+    edits[0].loc[df.index[-1], "price_out"] = 1.0
+    edits[1].loc[df.index[-1], "price_out"] = 2.0
+    saves = []
+
+    def save_one_row():
+        written = parquet_store.save(edits[len(saves) % 2])
+        saves.append(written)
+        return written
+
+    loaded = {}
+    yield "load.csv", lambda: csv_store.load(JOURNAL_COLUMNS)
+    yield "load.parquet", lambda: loaded.setdefault("df", parquet_store.load(JOURNAL_COLUMNS))
+    yield "load.parquet_columns", lambda: parquet_store.load(["date_out", "P/L (INR)"])
+    yield "save.csv", lambda: csv_store.save(edits[0])
+    yield "save.parquet_one_row", save_one_row
+
+    frame = loaded["df"]
+    yield "derive", lambda: calculate_derived_columns(frame.copy())
+    cube = {}
+    yield "aggregate.period_cube", lambda: cube.setdefault("cube", build_period_cube(frame))
+    yield "aggregate.summary_metrics", lambda: SummaryMetrics.from_frame(frame)
+    index = {}
+    yield "aggregate.trade_index", lambda: index.setdefault("index", build_trade_index(frame))
+
+    # Cold start of the headless report: a fresh interpreter per run
+    report = [sys.executable, "-m", "src.cli.report", str(csv_store.path), "-o", str(workdir / "reports")]
+    yield "cli.report_json", lambda: subprocess.run(report, check=True)
+
+    if len(frame) <= RENDER_LIMIT:
+        yield "render.trade_data", lambda: trade_data(frame.copy(), parquet_store)
+        yield "render.trade_summaries", lambda: trade_summaries(frame, INITIAL_AMOUNT, index=index["index"])
+        yield "render.monthly_profit_graph", lambda: monthly_profit_graph(frame, cube["cube"])
+        yield "render.yearly_performance", lambda: yearly_performance(frame, cube["cube"])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat, seed):
+    results = []
+    for rows in sizes:
+        journal, seconds, peak = measure(lambda: synthetic_journal(rows, seed=seed), 1)
+        print(f"{rows:>10,} rows  {'generate':<28} {seconds:9.4f}s {peak / 2**20:9.1f} MiB", file=sys.stderr)
+        with tempfile.TemporaryDirectory() as tmp:
+            for stage, func in stages(journal, Path(tmp)):
+                _, seconds, peak = measure(func, repeat)
+                results.append({"rows": rows, "stage": stage, "seconds": seconds, "peak_mib": peak / 2**20})
+                print(f"{rows:>10,} rows  {stage:<28} {seconds:9.4f}s {peak / 2**20:9.1f} MiB", file=sys.stderr)
+    return {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "seed": seed,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold):
+    # Ratio of this run to the baseline per (rows, stage); > 1 is slower
+    before = {(r["rows"], r["stage"]): r for r in baseline["results"]}
+    regressions = 0
+    print(f"{'rows':>10} {'stage':<28} {'before':>9} {'after':>9} {'ratio':>7}")
+    for r in report["results"]:
+        old = before.get((r["rows"], r["stage"]))
+        if old is None:
+            continue
+        ratio = r["seconds"] / old["seconds"] if old["seconds"] else float("inf")
+        flag = "  <-- slower" if ratio > threshold else ""
+        regressions += bool(flag)
+        print(f"{r['rows']:>10,} {r['stage']:<28} {old['seconds']:9.4f} {r['seconds']:9.4f} {ratio:7.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the journal pipeline on synthetic journals")
+    parser.add_argument("--sizes", nargs="+", type=float, default=[1e3, 1e4, 1e5],
+                        help="journal sizes in rows, 1e3 up to 1e7")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="ratio above which a stage is reported as a regression")
+    args = parser.parse_args(argv)
+
+    report = run([int(size) for size in args.sizes], args.repeat, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    elif not args.compare:
+        print(text)
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        return 1 if compare(report, baseline, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
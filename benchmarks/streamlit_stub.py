@@ -0,0 +1,126 @@
+import sys
+import types
+from contextlib import nullcontext
+
+
+class _SessionState(dict):
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+class _ColumnConfig:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: {"type": name, **kwargs}
+
+
+class StreamlitStub(types.ModuleType):
+    """Headless stand-in for ``streamlit`` used by the benchmarks.
+
+    Widgets return their default value, layout helpers return context
+    managers and output calls do nothing, except that dataframes and charts
+    are still serialized so styling and figure building show up in timings.
+    """
+
+    def __init__(self):
+        super().__init__("streamlit")
+        self.session_state = _SessionState()
+        self.column_config = _ColumnConfig()
+        self.sidebar = self
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: None
+
+    # Widgets
+    def number_input(self, label, min_value=None, max_value=None, value=None, *args, **kwargs):
+        return value if value is not None else (min_value or 0)
+
+    def selectbox(self, label, options, index=0, *args, **kwargs):
+        options = list(options)
+        return options[index] if options and index is not None else None
+
+    def radio(self, label, options, index=0, *args, **kwargs):
+        return self.selectbox(label, options, index)
+
+    def multiselect(self, label, options, default=None, *args, **kwargs):
+        return list(default or [])
+
+    def checkbox(self, label, value=False, *args, **kwargs):
+        return value
+
+    toggle = checkbox
+
+    def button(self, *args, **kwargs):
+        return False
+
+    def date_input(self, label, value=None, *args, **kwargs):
+        return value
+
+    def text_input(self, label, value="", *args, **kwargs):
+        return value
+
+    def data_editor(self, data, *args, **kwargs):
+        return data
+
+    # Output that carries real serialization cost in the app
+    def dataframe(self, data, *args, **kwargs):
+        _serialize_frame(data)
+        return None
+
+    def plotly_chart(self, figure, *args, **kwargs):
+        figure.to_json()
+        return None
+
+    # Layout
+    def columns(self, spec, *args, **kwargs):
+        count = spec if isinstance(spec, int) else len(spec)
+        return [nullcontext() for _ in range(count)]
+
+    def tabs(self, labels, *args, **kwargs):
+        return [nullcontext() for _ in labels]
+
+    def expander(self, *args, **kwargs):
+        return nullcontext()
+
+    container = expander
+    spinner = expander
+    status = expander
+
+    # Caching and fragments are pass-through decorators
+    def _decorator(self, func=None, **kwargs):
+        if func is None:
+            return lambda inner: inner
+        return func
+
+    cache_data = _decorator
+    cache_resource = _decorator
+    fragment = _decorator
+
+
+def _serialize_frame(data):
+    # What st.dataframe does with its argument: compute Styler CSS, then
+    # convert the frame to Arrow for the browser
+    import pyarrow as pa
+    from pandas.io.formats.style import Styler
+
+    if isinstance(data, Styler):
+        data._compute()
+        data = data.data
+    try:
+        pa.Table.from_pandas(data)
+    except (pa.ArrowException, TypeError, ValueError):
+        data.astype(str)
+
+
+def install():
+    # Must run before anything imports streamlit
+    stub = StreamlitStub()
+    sys.modules["streamlit"] = stub
+    return stub
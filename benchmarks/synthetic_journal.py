@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from src.journal.store import JOURNAL_COLUMNS
+from src.trades_analysis.derived_columns import derived_values
+
+# Share of journal rows per trade_base, roughly as in SKORM_Journal.csv
+TRADE_BASES = {
+    "ML-5": 0.30, "alert": 0.18, "JK": 0.12, "BTS": 0.06, "ML-2": 0.06, "ML-3": 0.06,
+    "ML-4": 0.06, "AVG": 0.05, "LONG": 0.05, "SWING": 0.03, "NEWS": 0.03,
+}
+# Share of rows that are fully booked, partially booked and still open
+STATUS_WEIGHTS = (0.50, 0.05, 0.45)
+
+
+def _symbols(count):
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    rng = np.random.default_rng(count)
+    names = {"".join(rng.choice(letters, size=rng.integers(4, 11))) for _ in range(count * 2)}
+    return np.array(sorted(names)[:count])
+
+
+def synthetic_journal(rows, seed=0, start="2015-01-01", years=None):
+    """Random journal with the trade_data.csv schema and derived columns filled in.
+
+    Symbols follow a Zipf-like popularity curve, trade_bases and booking
+    status follow the shares above, and the journal spans more years as it
+    grows (about 20k trades a year). The same rows and seed always produce
+    the same journal.
+    """
+    rng = np.random.default_rng(seed)
+    years = years or max(1, min(20, int(np.ceil(rows / 20000))))
+
+    symbol_count = int(min(5000, max(50, np.sqrt(rows) * 2)))
+    symbols = _symbols(symbol_count)
+    popularity = 1.0 / np.arange(1, symbol_count + 1) ** 1.1
+    script_name = symbols[rng.choice(symbol_count, size=rows, p=popularity / popularity.sum())]
+
+    bases = np.array(list(TRADE_BASES))
+    weights = np.array(list(TRADE_BASES.values()))
+    trade_base = bases[rng.choice(len(bases), size=rows, p=weights / weights.sum())]
+
+    price_in = np.round(rng.lognormal(np.log(300), 1.0, size=rows), 2)
+    amount = rng.lognormal(np.log(12000), 0.6, size=rows)
+    quantity_in = np.maximum(1, np.round(amount / price_in)).astype("int64")
+
+    first_day = np.datetime64(start, "D")
+    date_in = first_day + rng.integers(0, 365 * years, size=rows).astype("timedelta64[D]")
+    holding = np.ceil(rng.lognormal(np.log(40), 0.9, size=rows)).astype("int64")
+    date_out = date_in + holding.astype("timedelta64[D]")
+    price_out = np.round(price_in * np.exp(rng.normal(0.03, 0.12, size=rows)), 2)
+
+    status = rng.choice(3, size=rows, p=STATUS_WEIGHTS)
+    closed, partial, still_open = status == 0, status == 1, status == 2
+    quantity_left = np.where(closed, 0, quantity_in)
+    partial_left = np.floor(quantity_in * rng.uniform(0.2, 0.8, size=rows)).astype("int64")
+    quantity_left = np.where(partial & (quantity_in > 1), np.clip(partial_left, 1, quantity_in - 1), quantity_left)
+
+    df = pd.DataFrame({
+        "script_name": script_name,
+        "trade_base": trade_base,
+        "price_in": price_in,
+        "quantity_in": quantity_in.astype("float64"),
+        "quantity_left": quantity_left.astype("float64"),
+        "date_in": pd.to_datetime(date_in),
+        "date_out": pd.to_datetime(np.where(still_open, np.datetime64("NaT"), date_out)),
+        "price_out": np.where(still_open, np.nan, price_out),
+    })
+    values = derived_values(df["price_in"], df["quantity_in"], df["quantity_left"],
+                            df["price_out"], df["date_in"], df["date_out"])
+    for column, column_values in values.items():
+        df[column] = column_values
+    return df.sort_values("date_in", kind="stable").reset_index(drop=True)[JOURNAL_COLUMNS]
@@ -5,12 +5,33 @@ from datetime import datetime
 from pathlib import Path
 import plotly.express as px
 import sys
+import time
 
 sys.path.append('..')
 from src.trades_analysis.trade_summaries import trade_summaries
-from src.trades_analysis.monthly_profit_graph import monthly_profit_graph
+from src.trades_analysis.monthly_profit_graph import monthly_profit_graph, equity_curve_graph
+from src.trades_analysis.equity_curve import (daily_realized_pl, daily_unrealized_pl, held_symbols, merge_daily_pl,
+                                              equity_curve, drawdown_stats)
 from src.trades_analysis.yearly_performance import yearly_performance
-from src.trades_analysis.trade_data import trade_data
+from src.trades_analysis.strategy_performance import strategy_performance
+from src.trades_analysis.strategy_analytics import StrategyAnalytics, booked_trades
+from src.trades_analysis.trade_data import trade_data, editor_changes, DEFAULT_INITIAL_AMOUNT
+from src.trades_analysis.period_cube import build_period_cube
+from src.trades_analysis.summary_metrics import IncrementalSummary
+from src.trades_analysis.trade_index import build_trade_index, merge_trade_indexes
+from src.journal.store import JOURNAL_COLUMNS, open_journal_store
+from src.journal.cache import journal_cache
+from src.journal.multi import discover_journals, journal_set
+from src.journal.schema import schema_report
+from src.live_data.price_store import open_price_store
+from src.live_data.bulk_fetcher import refresh_latest_prices
+from src.trades_analysis.mark_to_market import open_position_rows, open_symbols
+from src.instrumentation.spans import span
+from src.instrumentation.panel import start_rerun_profile, profiling_panel, profiled_fragment
+
+# Frames handed out by the journal cache are shared between reruns and
+# sessions; copy-on-write keeps any local modification from leaking into them
+pd.set_option("mode.copy_on_write", True)
 
 # Set page configuration with a custom theme
 st.set_page_config(
@@ -40,6 +61,19 @@ st.markdown("""
     .stTabs [aria-selected="true"] {
         background-color: #59a14f;
     }
+    div[role="radiogroup"] {
+        gap: 24px;
+    }
+    div[role="radiogroup"] label {
+        background-color: #4e79a7;
+        color: white;
+        font-weight: bold;
+        padding: 12px 16px;
+        border-radius: 5px 5px 0 0;
+    }
+    div[role="radiogroup"] label:has(input:checked) {
+        background-color: #59a14f;
+    }
     .stMetric {
         background-color: #87CEEB;  /* Changed to sky blue */
         padding: 15px;
@@ -49,36 +83,304 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-csv_file = Path("SKORM_Journal.csv")
-columns = [
-    "script_name", "trade_base", "price_in", "quantity_in", "quantity_left", "date_in", 
-    "amount_in", "balance_left", "date_out", "price_out",
-    "P/L (INR)", "P/L in %", "days_taken"
-]
-
-# Check if CSV file exists
-if os.path.exists(csv_file):
-    # Read existing CSV file
-    df = pd.read_csv(csv_file, parse_dates=["date_in", "date_out"])
-    df = df[columns]
-else:
-    # Create an empty DataFrame if CSV doesn't exist
-    df = pd.DataFrame(columns=columns)
+# Optional timing of every stage below, toggled from the sidebar
+start_rerun_profile("Track Trades")
 
-# Streamlit app
-st.title("📊 Trade Data Management")
+# Every journal next to the app is an account; the partitioned parquet journal
+# is preferred once it has been migrated from the CSV
+# (python -m src.journal.store SKORM_Journal.csv)
+PRIMARY_ACCOUNT = "SKORM"
+journals = discover_journals(".")
+if PRIMARY_ACCOUNT not in journals:
+    journals[PRIMARY_ACCOUNT] = Path("SKORM_Journal.csv")
+accounts = [PRIMARY_ACCOUNT] + sorted(a for a in journals if a != PRIMARY_ACCOUNT)
+selected_accounts = [PRIMARY_ACCOUNT]
+if len(accounts) > 1:
+    selected_accounts = st.sidebar.multiselect("Accounts", accounts, default=[PRIMARY_ACCOUNT],
+                                               key="accounts") or [PRIMARY_ACCOUNT]
+consolidated = len(selected_accounts) > 1
+
+# Trades are added and edited in one account's journal at a time
+edit_account = selected_accounts[0]
+if consolidated:
+    edit_account = st.sidebar.selectbox("Journal to edit", selected_accounts, key="edit_account")
+if st.session_state.get("editing_account", edit_account) != edit_account:
+    # The editor's change set refers to rows of the previous journal
+    st.session_state.pop("journal_editor", None)
+st.session_state["editing_account"] = edit_account
+store = open_journal_store(journals[edit_account])
+columns = JOURNAL_COLUMNS
+
+# Load only the columns the page needs; an empty frame if the journal doesn't exist yet.
+# Reruns triggered by widgets are served from the cache until trade_data() saves.
+with span("load journal"):
+    edit_df = journal_cache.load(store, columns)
+    df = edit_df
+    if consolidated:
+        # Each account is loaded and aggregated in its own process, and only
+        # again once its file changes. The views below merge what was built
+        # per journal; only the open positions are combined row by row
+        journal_set.refresh({account: journals[account] for account in selected_accounts}, columns)
+        df = None
+    open_df = df
+    if consolidated:
+        open_df = journal_set.derived(selected_accounts, "open_positions", open_position_rows,
+                                      merge=lambda parts: pd.concat(parts, ignore_index=True))
+
+
+def account_frames():
+    # The journal of every selected account, for views that add up per journal
+    if consolidated:
+        return [journal_set.partial(account).frame for account in selected_accounts]
+    return [df]
+
+
+with st.sidebar.expander("Diagnostics"):
+    cache_stats = journal_cache.stats()
+    st.caption(f"Journal cache: {cache_stats['hits']} hits · {cache_stats['misses']} loads from disk · {cache_stats['invalidations']} invalidations")
+    reports = [report for report in map(schema_report, account_frames()) if report]
+    if reports:
+        memory_before = sum(report["memory_before"] for report in reports)
+        memory_after = sum(report["memory_after"] for report in reports)
+        saved = 1 - memory_after / memory_before if memory_before else 0
+        st.caption(f"Journal memory: {memory_after / 2**20:.2f} MiB, {saved:.0%} less than default dtypes")
+        for report in reports:
+            for note in report["kept_wide"]:
+                st.caption(note)
+    verify_summaries = st.checkbox("Verify incremental summaries", value=False)
+
+for account, frame in zip(selected_accounts, account_frames()):
+    report = schema_report(frame)
+    if report and report["issues"]:
+        st.sidebar.warning(f"{account} journal validation: " + "; ".join(report["issues"]))
+
+# With lazy tabs only the selected section runs on a rerun; otherwise all five
+# are rendered as tabs. Either way each section is a fragment, so its own
+# widgets rerun only that section. Tabs stay the default: switching away from
+# a lazy section unmounts the editor, and its unsaved change set with it.
+lazy_tabs = st.sidebar.toggle("Render only the active tab", value=False, key="lazy_tabs",
+                              help="Faster reruns, but unsaved edits are discarded when switching sections")
+# Open trades are valued at the latest close from the local price store, which
+# only fetches the sessions it doesn't have yet
+mark_open_trades = st.sidebar.toggle("Mark open trades to market", value=False, key="mark_to_market")
+
+
+PRICE_REFRESH_SECONDS = 900
+
+
+def latest_prices(symbols, lookback_days=10):
+    # Refreshed at most every PRICE_REFRESH_SECONDS per session; in between the
+    # closes are read straight from the store. Each symbol's result is shown
+    # as soon as it arrives.
+    store = open_price_store()
+    refreshed = st.session_state.get("prices_refreshed")
+    if (refreshed and refreshed[0] == (symbols, lookback_days)
+            and time.time() - refreshed[1] < PRICE_REFRESH_SECONDS):
+        return store.latest_close(symbols), refreshed[2]
+
+    with st.status(f"Fetching prices for {len(symbols)} symbols") as status:
+        progress = st.progress(0.0)
+        done = []
+
+        def on_result(result):
+            done.append(result)
+            progress.progress(len(done) / len(symbols), text=f"{len(done)}/{len(symbols)} symbols")
+            if result.ok:
+                st.write(f"{result.symbol}: {len(result.fetched)} range(s) fetched in {result.seconds:.1f}s")
+            else:
+                st.write(f"{result.symbol}: failed after {result.attempts} attempt(s), {result.error}")
+
+        prices, failed = refresh_latest_prices(store, symbols, lookback_days, on_result=on_result)
+        status.update(label=f"Prices refreshed for {len(symbols) - len(failed)}/{len(symbols)} symbols",
+                      state="error" if failed else "complete", expanded=False)
+    st.session_state["prices_refreshed"] = ((symbols, lookback_days), time.time(), failed)
+    return prices, failed
+
+
+def period_cube():
+    # Period aggregates shared by the Profit Graph and Yearly Performance tabs,
+    # rebuilt only when the journal contents change
+    with span("period cube"):
+        if consolidated:
+            return journal_set.cube(selected_accounts)
+        return journal_cache.derived(store, "period_cube", build_period_cube, columns)
 
-# Create tabs with custom styling
-tab1, tab2, tab3, tab4 = st.tabs(["📝 Add/Edit Trades", "📊 Trade Summaries", "📈Profit Graph", ":chart: Yearly Performance"])
 
-with tab1:
-    initial_amount = trade_data(df, csv_file)
+def trade_index():
+    # Sort keys behind every leaderboard on the summaries tab, built once per
+    # journal version
+    with span("trade index"):
+        if consolidated:
+            return journal_set.derived(selected_accounts, "trade_index", build_trade_index, merge=merge_trade_indexes)
+        return journal_cache.derived(store, "trade_index", build_trade_index, columns)
 
-with tab2:
-    trade_summaries(df, initial_amount)
 
-with tab3:
-    monthly_profit_graph(df)
+def daily_pl():
+    # Realized P/L per calendar day behind the equity curve, once per journal version
+    with span("daily P/L"):
+        if consolidated:
+            return journal_set.derived(selected_accounts, "daily_pl", daily_realized_pl, merge=merge_daily_pl)
+        return journal_cache.derived(store, "daily_pl", daily_realized_pl, columns)
+
+
+def daily_equity():
+    # Realized equity, plus the trades open on each day valued at that day's
+    # stored close when marking to market; the closes of every symbol held
+    # since the first day are fetched once
+    realized = daily_pl()
+    unrealized = None
+    symbols = ()
+    if mark_open_trades and len(realized):
+        symbols = tuple(sorted({symbol for frame in account_frames()
+                                for symbol in held_symbols(frame, realized.index[0])}))
+    if symbols:
+        realized = realized.reindex(pd.date_range(realized.index[0], pd.Timestamp.today().normalize(), name="date"),
+                                    fill_value=0.0)
+        lookback_days = (realized.index[-1] - realized.index[0]).days
+        with span("price history"):
+            _, failed = latest_prices(symbols, lookback_days)
+            prices = open_price_store()
+            closes = {symbol: prices.history(symbol, realized.index[0], columns=["date", "close"])
+                      .set_index("date")["close"] for symbol in symbols}
+        if failed:
+            st.warning(f"Couldn't refresh prices for {', '.join(failed)}; their history may be incomplete")
+        # Adds up per journal like the realized P/L
+        unrealized = sum(daily_unrealized_pl(frame, realized.index, closes) for frame in account_frames())
+    with span("equity curve"):
+        curve = equity_curve(realized, st.session_state.get("initial_amount", DEFAULT_INITIAL_AMOUNT), unrealized)
+        return curve, drawdown_stats(curve), unrealized is not None
+
+
+def booked_trades_of_accounts():
+    # Booked trades of every journal, keyed by account so a journal's rows keep
+    # their identity when another one changes
+    if consolidated:
+        return journal_set.derived(selected_accounts, "booked_trades", booked_trades,
+                                   merge=lambda parts: pd.concat(parts, keys=selected_accounts))
+    return booked_trades(df)
+
+
+def strategy_analytics():
+    # Per-base prefix sums behind the strategy comparison. A new journal
+    # version only appends the trades booked since; edits to booked trades
+    # rebuild it
+    with span("strategy analytics"):
+        version = tuple((account, open_journal_store(journals[account]).fingerprint()) for account in selected_accounts)
+        cached = st.session_state.get("strategy_engine")
+        if cached is None or [a for a, _ in cached[0]] != selected_accounts:
+            analytics = StrategyAnalytics(booked_trades_of_accounts())
+        elif cached[0] != version:
+            analytics = cached[1].sync_trades(booked_trades_of_accounts())
+        else:
+            analytics = cached[1]
+        st.session_state["strategy_engine"] = (version, analytics)
+        return analytics
+
+
+def summary_metrics():
+    # Summary totals follow the editor's unsaved changes by applying only the
+    # rows that changed since the last rerun; a new journal version starts over
+    with span("summary metrics"):
+        summary = st.session_state.get("summary_engine")
+        journal_version = (edit_account, store.fingerprint())
+        if summary is None or summary.version != journal_version:
+            summary = IncrementalSummary(edit_df, version=journal_version)
+            st.session_state["summary_engine"] = summary
+        metrics = summary.sync(editor_changes())
+        if verify_summaries and not summary.verify():
+            # Shown in the section: a fragment can't write to the sidebar
+            st.error("Incremental summaries diverged from a full recompute, rebuilding")
+            metrics = summary.rebuild(summary.applied)
+        if consolidated:
+            # The edited account's running totals stand in for its saved partial
+            others = [a for a in selected_accounts if a != edit_account]
+            metrics = metrics + journal_set.metrics(others)
+        return summary, metrics
+
+
+def leaderboard_index(summary):
+    # With unsaved edits the leaderboards are built from the same edited
+    # journal as the totals, once per change set
+    if not summary.pending_changes:
+        return trade_index()
+
+    def build(edited):
+        if not consolidated:
+            return build_trade_index(edited)
+        # The edited journal's index stands in for its saved one
+        return merge_trade_indexes(build_trade_index(edited) if account == edit_account
+                                   else journal_set.partial_derived(account, "trade_index", build_trade_index)
+                                   for account in selected_accounts)
+
+    with span("trade index (unsaved edits)"):
+        return summary.edited_derived(("trade_index", tuple(selected_accounts)), build)
+
+
+@st.fragment
+@profiled_fragment("edit trades")
+def edit_trades_section():
+    if lazy_tabs and st.session_state.get("journal_editor", {}).get("edited_rows"):
+        st.caption("Unsaved edits are discarded when switching to another section")
+    if consolidated:
+        st.caption(f"Editing the {edit_account} journal; the other sections show {', '.join(selected_accounts)}")
+    trade_data(edit_df, store)
+
+
+@st.fragment
+@profiled_fragment("trade summaries")
+def trade_summaries_section():
+    summary, metrics = summary_metrics()
+    if summary.pending_changes:
+        st.caption(f"Totals and leaderboards include {summary.pending_changes} unsaved change(s) from the editor")
+    prices = None
+    if mark_open_trades:
+        with span("latest prices"):
+            prices, failed = latest_prices(tuple(open_symbols(open_df)))
+        if failed:
+            st.warning(f"Couldn't refresh prices for {', '.join(failed)}; using the last stored close")
+    # Only the open positions are read from the rows, to mark them to market
+    trade_summaries(open_df, st.session_state.get("initial_amount", DEFAULT_INITIAL_AMOUNT), metrics, prices,
+                    leaderboard_index(summary))
+
+
+@st.fragment
+@profiled_fragment("profit graph")
+def profit_graph_section():
+    monthly_profit_graph(df, period_cube())
+    equity_curve_graph(*daily_equity())
+
+
+@st.fragment
+@profiled_fragment("yearly performance")
+def yearly_performance_section():
+    yearly_performance(df, period_cube())
+
+
+@st.fragment
+@profiled_fragment("strategies")
+def strategy_performance_section():
+    strategy_performance(df, st.session_state.get("initial_amount", DEFAULT_INITIAL_AMOUNT), strategy_analytics())
+
+
+sections = {
+    "📝 Add/Edit Trades": edit_trades_section,
+    "📊 Trade Summaries": trade_summaries_section,
+    "📈Profit Graph": profit_graph_section,
+    ":chart: Yearly Performance": yearly_performance_section,
+    "🧭 Strategies": strategy_performance_section,
+}
+
+# Streamlit app
+st.title("📊 Trade Data Management")
+
+if lazy_tabs:
+    active_section = st.radio("Section", list(sections), horizontal=True, key="active_section",
+                              label_visibility="collapsed")
+    sections[active_section]()
+else:
+    # Create tabs with custom styling
+    for tab, render_section in zip(st.tabs(list(sections)), sections.values()):
+        with tab:
+            render_section()
 
-with tab4:
-    yearly_performance(df)
\ No newline at end of file
+profiling_panel()
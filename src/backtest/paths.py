@@ -0,0 +1,111 @@
+import hashlib
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# Bar fields the exit rules look at; "day" is the bar's date in days since the epoch
+BAR_FIELDS = ["day", "open", "high", "low", "close"]
+# Trading days followed after each entry
+DEFAULT_HORIZON = 250
+
+
+@dataclass
+class PriceBook:
+    """Daily bars of every entry's symbol back to back, and each entry's slice of them.
+
+    ``start`` is the first bar after the entry day and ``stop`` the end of
+    that symbol's bars, so an entry's price path is bars[start:stop] of one
+    flat array per field instead of a frame per symbol.
+    """
+
+    bars: dict
+    start: np.ndarray
+    stop: np.ndarray
+    missing: list
+    version: str
+
+
+def load_price_book(store, entries):
+    """Bars for the symbols of ``entries`` (script_name, date_in), read from ``store`` only.
+
+    Nothing is fetched: symbols with no stored bars are listed in
+    ``missing``, and their entries, like entries after the last stored bar,
+    get empty paths. ``version`` is a
+    digest of the bars read, so cached results follow newer price files.
+    """
+    days = entries["date_in"].to_numpy(dtype="datetime64[D]").astype("int64")
+    start = np.zeros(len(entries), dtype="int64")
+    stop = np.zeros(len(entries), dtype="int64")
+    parts, missing, offset = [], [], 0
+    for symbol, rows in entries.groupby("script_name", sort=True).indices.items():
+        bars = store.history(symbol, start=entries["date_in"].iloc[rows].min(), columns=BAR_FIELDS[1:] + ["date"])
+        bars = bars.dropna(subset=BAR_FIELDS[1:])
+        if not len(bars):
+            missing.append(symbol)
+            continue
+        symbol_days = bars["date"].to_numpy(dtype="datetime64[D]").astype("int64")
+        start[rows] = offset + np.searchsorted(symbol_days, days[rows], side="right")
+        offset += len(bars)
+        stop[rows] = offset
+        parts.append(pd.DataFrame({"day": symbol_days, **{f: bars[f].to_numpy() for f in BAR_FIELDS[1:]}}))
+
+    frame = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=BAR_FIELDS)
+    book = {field: np.ascontiguousarray(frame[field].to_numpy(dtype="int64" if field == "day" else "float64"))
+            for field in BAR_FIELDS}
+    digest = hashlib.sha1()
+    for field in BAR_FIELDS:
+        digest.update(book[field].tobytes())
+    return PriceBook(book, start, stop, missing, digest.hexdigest()[:16])
+
+
+def entry_paths(bars, start, stop, horizon=DEFAULT_HORIZON):
+    # (entries, horizon) matrices of the bars after each entry; ``valid``
+    # marks the ones that exist, the rest repeat the last bar
+    index = start[:, None] + np.arange(horizon)
+    valid = index < stop[:, None]
+    index = np.clip(np.minimum(index, stop[:, None] - 1), 0, max(len(bars["day"]) - 1, 0))
+    if not len(bars["day"]):
+        return {**{field: np.zeros(index.shape) for field in BAR_FIELDS}, "valid": valid}
+    paths = {field: bars[field][index] for field in BAR_FIELDS}
+    paths["valid"] = valid
+    return paths
+
+
+class SharedArrays:
+    """numpy arrays copied once into shared memory, for worker processes to map read-only.
+
+    ``spec`` is what a worker needs to attach with attach_shared(); the
+    owner unlinks the blocks when it leaves the ``with`` block.
+    """
+
+    def __init__(self, arrays):
+        self._blocks = []
+        self.spec = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self._blocks.append(block)
+            self.spec[name] = (block.name, array.shape, array.dtype.str)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+
+
+def attach_shared(spec):
+    # Read-only views of a SharedArrays' blocks, and the blocks to keep alive
+    arrays, blocks = {}, []
+    for name, (block_name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype, buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+        blocks.append(block)
+    return arrays, blocks
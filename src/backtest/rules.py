@@ -0,0 +1,115 @@
+import itertools
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+# Why an entry was exited, by code; "open" means no rule fired within the prices available
+EXIT_REASONS = ["open", "stop", "trailing", "target", "max_days"]
+
+
+@dataclass(frozen=True)
+class ExitRule:
+    """Exit of a long entry: the first of a target, a stop-loss, a trailing stop and a time limit.
+
+    Percentages are of the entry price (the trailing stop's of the highest
+    high since entry) and max_days counts calendar days like days_taken.
+    None leaves that leg out; a rule with every leg off holds to the end of
+    the prices.
+    """
+
+    target_pct: float = None
+    stop_pct: float = None
+    trailing_pct: float = None
+    max_days: int = None
+
+    @property
+    def key(self):
+        # Stable file-name-safe identity, used for the result cache
+        return "_".join(f"{name}-{value:g}" for name, value in asdict(self).items() if value is not None) or "hold"
+
+    @property
+    def label(self):
+        parts = []
+        if self.target_pct is not None:
+            parts.append(f"target {self.target_pct:g}%")
+        if self.stop_pct is not None:
+            parts.append(f"stop {self.stop_pct:g}%")
+        if self.trailing_pct is not None:
+            parts.append(f"trail {self.trailing_pct:g}%")
+        if self.max_days is not None:
+            parts.append(f"{self.max_days:g} days")
+        return ", ".join(parts) or "hold"
+
+
+def rule_grid(targets=(None,), stops=(None,), trailing=(None,), max_days=(None,)):
+    # Every combination of the given legs
+    return [ExitRule(*combo) for combo in itertools.product(targets or (None,), stops or (None,),
+                                                           trailing or (None,), max_days or (None,))]
+
+
+def _first(hit):
+    # Column of the first True per row, or the row length when there is none
+    return np.where(hit.any(axis=1), hit.argmax(axis=1), hit.shape[1])
+
+
+def _at(values, index):
+    return np.take_along_axis(values, np.minimum(index, values.shape[1] - 1)[:, None], axis=1)[:, 0]
+
+
+def apply_rule(rule, entry_price, entry_day, paths):
+    """Exit of every entry under ``rule``, vectorized over the entries x days paths.
+
+    ``paths`` holds open/high/low/close/day arrays of shape (entries, horizon)
+    with the bars after each entry day, and ``valid`` marking the bars that
+    exist. Each leg finds its first triggering bar with one comparison over
+    the whole matrix; when several fire on the same bar the stop, then the
+    trailing stop, then the target wins, so a bar's order is never assumed
+    to favour the trade. Stops and targets fill at their level, or at the
+    open when the bar gaps through it; the time limit fills at the close.
+
+    Returns the exit bar (-1 without prices), exit price and reason code.
+    """
+    valid = paths["valid"]
+    entries, horizon = valid.shape
+    entry = np.asarray(entry_price, dtype="float64")[:, None]
+    open_, high, low, close = (paths[name] for name in ["open", "high", "low", "close"])
+
+    legs = []
+    if rule.stop_pct is not None:
+        level = entry * (1 - rule.stop_pct / 100)
+        legs.append((1, valid & (low <= level), np.minimum(open_, level)))
+    if rule.trailing_pct is not None:
+        # Highest high before each bar, starting from the entry price
+        highs = np.where(valid, high, -np.inf)
+        peak = np.maximum.accumulate(np.concatenate([entry, highs[:, :-1]], axis=1), axis=1)
+        peak = np.maximum(peak, entry)
+        level = peak * (1 - rule.trailing_pct / 100)
+        legs.append((2, valid & (low <= level), np.minimum(open_, level)))
+    if rule.target_pct is not None:
+        level = entry * (1 + rule.target_pct / 100)
+        legs.append((3, valid & (high >= level), np.maximum(open_, np.broadcast_to(level, high.shape))))
+    if rule.max_days is not None:
+        elapsed = paths["day"] - np.asarray(entry_day, dtype="int64")[:, None]
+        legs.append((4, valid & (elapsed >= rule.max_days), close))
+
+    bars = valid.sum(axis=1)
+    exit_bar = np.full(entries, horizon)
+    reason = np.zeros(entries, dtype="int8")
+    exit_price = np.full(entries, np.nan)
+    # Legs are in priority order, so a later leg only wins on a strictly earlier bar
+    for code, hit, fill in legs:
+        first = _first(hit)
+        better = first < exit_bar
+        exit_bar = np.where(better, first, exit_bar)
+        reason = np.where(better, code, reason)
+        exit_price = np.where(better, _at(fill, first), exit_price)
+
+    # Nothing fired: still open at the last close available
+    still_open = exit_bar == horizon
+    last = np.maximum(bars - 1, 0)
+    exit_bar = np.where(still_open, last, exit_bar)
+    exit_price = np.where(still_open, _at(close, last), exit_price)
+    unpriced = bars == 0
+    exit_bar = np.where(unpriced, -1, exit_bar)
+    exit_price = np.where(unpriced, np.nan, exit_price)
+    return exit_bar.astype("int32"), exit_price, reason
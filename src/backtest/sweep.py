@@ -0,0 +1,284 @@
+"""Exit-rule sweeps over the journal's own entries.
+
+    python -m src.backtest.sweep SKORM_Journal.csv --targets 10 20 --stops 5 8 --trailing none 10 --max-days 60 120
+    python -m src.backtest.sweep Broker_Journal.parquet --prices prices --workers 4 -o backtests/broker.csv
+
+Every entry (date_in, price_in) is replayed against the daily bars already
+in the price store, so the sweep runs offline; symbols without stored bars
+are reported and left out. Exits are cached on disk per rule, keyed by the
+journal entries and the bars they were computed from, so a rerun only
+evaluates rules it hasn't seen and editing the journal or fetching newer
+prices starts a fresh cache.
+"""
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.backtest.paths import DEFAULT_HORIZON, SharedArrays, attach_shared, entry_paths, load_price_book
+from src.backtest.rules import EXIT_REASONS, apply_rule, rule_grid
+from src.trades_analysis.derived_columns import parse_dates
+
+ENTRY_COLUMNS = ["script_name", "trade_base", "date_in", "price_in", "quantity_in"]
+DEFAULT_CACHE_DIR = Path("backtests")
+# Part of the cache key; bump it when apply_rule's exits change meaning
+ENGINE_VERSION = 1
+# Entries whose paths are laid out at once, to bound the (entries, horizon) matrices
+ENTRY_BLOCK = 4096
+# Below this many rule x entry x day cells, starting worker processes costs
+# more than evaluating the grid in this one
+PARALLEL_MIN_CELLS = 20_000_000
+
+
+def journal_entries(df):
+    # Entries with a symbol, a trade base, an entry date and a positive entry
+    # price, indexed by journal row; trades without a base are left out like
+    # in the per-base summaries
+    dates = parse_dates(df["date_in"])
+    price = pd.to_numeric(df["price_in"], errors="coerce")
+    keep = (dates.notna() & (price > 0) & df["script_name"].notna() & df["trade_base"].notna()).to_numpy()
+    return pd.DataFrame({
+        "script_name": df["script_name"].astype(str)[keep],
+        "trade_base": df["trade_base"].astype(object)[keep].astype(str),
+        "date_in": dates[keep].dt.normalize(),
+        "price_in": price[keep].astype("float64"),
+        "quantity_in": pd.to_numeric(df["quantity_in"], errors="coerce")[keep].astype("float64"),
+    }, index=df.index[keep])
+
+
+def journal_version(entries):
+    # Digest of the entries the sweep replays; other journal edits keep it
+    hashes = pd.util.hash_pandas_object(entries[ENTRY_COLUMNS], index=True).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()[:16]
+
+
+def sweep_horizon(rules):
+    # Bars to follow: a time exit after N calendar days fires within N bars,
+    # rules without one are followed for DEFAULT_HORIZON trading days
+    limits = [rule.max_days for rule in rules]
+    horizon = DEFAULT_HORIZON if any(limit is None for limit in limits) else 1
+    return int(max([horizon] + [limit + 1 for limit in limits if limit is not None]))
+
+
+def evaluate_rules(rules, bars, start, stop, entry_price, entry_day, horizon):
+    """(exit bar, exit price, reason) of every entry under each rule, a block of entries at a time."""
+    parts = [[] for _ in rules]
+    for lo in range(0, len(start), ENTRY_BLOCK):
+        block = slice(lo, lo + ENTRY_BLOCK)
+        paths = entry_paths(bars, start[block], stop[block], horizon)
+        for part, rule in zip(parts, rules):
+            part.append(apply_rule(rule, entry_price[block], entry_day[block], paths))
+    empty = (np.zeros(0, dtype="int32"), np.zeros(0), np.zeros(0, dtype="int8"))
+    return [tuple(np.concatenate(arrays) for arrays in zip(*part)) if part else empty for part in parts]
+
+
+# Set once per worker process by _init_worker
+_worker = {}
+
+
+def _init_worker(spec, start, stop, entry_price, entry_day, horizon):
+    # The bars stay in the parent's shared memory; only the small per-entry
+    # arrays were pickled
+    bars, blocks = attach_shared(spec)
+    _worker.update(bars=bars, blocks=blocks, start=start, stop=stop, entry_price=entry_price,
+                   entry_day=entry_day, horizon=horizon)
+
+
+def _evaluate(rules):
+    w = _worker
+    return evaluate_rules(rules, w["bars"], w["start"], w["stop"], w["entry_price"], w["entry_day"], w["horizon"])
+
+
+class ExitCache:
+    """Exits of one rule per .npz file, in a directory per journal and price version."""
+
+    def __init__(self, root, journal_version, price_version, horizon):
+        self.dir = Path(root) / f"v{ENGINE_VERSION}-{journal_version}-{price_version}-h{horizon}"
+
+    def _path(self, rule):
+        return self.dir / f"{rule.key}.npz"
+
+    def get(self, rule):
+        try:
+            with np.load(self._path(rule)) as data:
+                return data["exit_bar"], data["exit_price"], data["reason"]
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            return None
+
+    def put(self, rule, exits):
+        # Written aside and renamed, so a reader never sees half a file
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp = self._path(rule).with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, exit_bar=exits[0], exit_price=exits[1], reason=exits[2])
+        os.replace(tmp, self._path(rule))
+
+
+def _results(entries, book, rules, exits):
+    # One row per (rule, priced entry)
+    entry_day = entries["date_in"].to_numpy(dtype="datetime64[D]").astype("int64")
+    price_in = entries["price_in"].to_numpy()
+    frames = []
+    for rule in rules:
+        exit_bar, exit_price, reason = exits[rule]
+        priced = exit_bar >= 0
+        exit_day = book.bars["day"][book.start[priced] + exit_bar[priced]]
+        frames.append(pd.DataFrame({
+            "rule": rule.label,
+            "entry": entries.index[priced],
+            "script_name": entries["script_name"].to_numpy()[priced],
+            "trade_base": entries["trade_base"].to_numpy()[priced],
+            "date_in": entries["date_in"].to_numpy()[priced],
+            "price_in": price_in[priced],
+            "exit_date": exit_day.astype("datetime64[D]").astype("datetime64[ns]"),
+            "exit_price": exit_price[priced],
+            "exit_reason": pd.Categorical.from_codes(reason[priced], EXIT_REASONS),
+            "days_held": exit_day - entry_day[priced],
+            "return_pct": (exit_price[priced] / price_in[priced] - 1) * 100,
+            "pl": (exit_price[priced] - price_in[priced]) * entries["quantity_in"].to_numpy()[priced],
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def run_sweep(df, rules, store, horizon=None, cache_dir=DEFAULT_CACHE_DIR, max_workers=None,
+              parallel_min_cells=PARALLEL_MIN_CELLS):
+    """Replay every journal entry under every rule against the bars in ``store``.
+
+    Returns one row per (rule, entry with prices) and a dict with the
+    symbols that had no stored bars and how many rules came from the cache.
+    Rules not in the cache are split across spawned worker processes once
+    the grid is large enough; the workers map the bars from shared memory
+    instead of each receiving a copy.
+    """
+    rules = list(dict.fromkeys(rules))
+    horizon = horizon or sweep_horizon(rules)
+    entries = journal_entries(df)
+    book = load_price_book(store, entries)
+    entry_price = entries["price_in"].to_numpy()
+    entry_day = entries["date_in"].to_numpy(dtype="datetime64[D]").astype("int64")
+    cache = ExitCache(cache_dir, journal_version(entries), book.version, horizon) if cache_dir else None
+
+    exits = {}
+    for rule in rules:
+        cached = cache.get(rule) if cache else None
+        if cached is not None and len(cached[0]) == len(entries):
+            exits[rule] = cached
+    todo = [rule for rule in rules if rule not in exits]
+    if todo:
+        workers = min(len(todo), max_workers or os.cpu_count() or 1)
+        if workers > 1 and len(todo) * len(entries) * horizon >= parallel_min_cells:
+            chunks = [chunk for chunk in np.array_split(np.arange(len(todo)), workers) if len(chunk)]
+            # Spawned workers, like JournalSet: forking a process that runs server threads is unsafe
+            with SharedArrays(book.bars) as shared, ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker,
+                    initargs=(shared.spec, book.start, book.stop, entry_price, entry_day, horizon)) as pool:
+                futures = [pool.submit(_evaluate, [todo[i] for i in chunk]) for chunk in chunks]
+                computed = [exit for future in futures for exit in future.result()]
+        else:
+            computed = evaluate_rules(todo, book.bars, book.start, book.stop, entry_price, entry_day, horizon)
+        for rule, result in zip(todo, computed):
+            exits[rule] = result
+            if cache:
+                cache.put(rule, result)
+
+    info = {"entries": len(entries), "missing_symbols": book.missing, "horizon": horizon,
+            "cached_rules": len(rules) - len(todo), "computed_rules": len(todo)}
+    return _results(entries, book, rules, exits), info
+
+
+def summarize(results):
+    """Trades, win rate, average return, P/L and holding days per (rule, trade_base)."""
+    grouped = results.assign(win=results["pl"] > 0, still_open=results["exit_reason"] == "open") \
+        .groupby(["rule", "trade_base"], sort=False)
+    summary = grouped.agg(
+        trades=("entry", "size"),
+        win_rate=("win", "mean"),
+        avg_return_pct=("return_pct", "mean"),
+        total_pl=("pl", "sum"),
+        avg_days=("days_held", "mean"),
+        still_open=("still_open", "sum"),
+    )
+    summary["win_rate"] *= 100
+    return summary.reset_index()
+
+
+def journal_summary(df):
+    # The journal's actual booked exits, in the columns of summarize()
+    booked = df[parse_dates(df["date_out"]).notna().to_numpy() & df["trade_base"].notna().to_numpy()]
+    pl = pd.to_numeric(booked["P/L (INR)"], errors="coerce")
+    summary = pd.DataFrame({
+        "trade_base": booked["trade_base"].astype(object).astype(str),
+        "win": pl > 0,
+        "return_pct": pd.to_numeric(booked["P/L in %"], errors="coerce"),
+        "pl": pl,
+        "days": pd.to_numeric(booked["days_taken"], errors="coerce"),
+    }).groupby("trade_base", sort=False).agg(
+        trades=("win", "size"),
+        win_rate=("win", "mean"),
+        avg_return_pct=("return_pct", "mean"),
+        total_pl=("pl", "sum"),
+        avg_days=("days", "mean"),
+    )
+    summary["win_rate"] *= 100
+    summary["still_open"] = 0
+    summary = summary.reset_index()
+    summary.insert(0, "rule", "journal")
+    return summary
+
+
+def _leg(value):
+    # --stops none 5 10: "none" sweeps the rule without that leg too
+    return None if value.lower() in ("none", "off") else float(value)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.journal.store import open_journal_store
+    from src.live_data.price_store import DEFAULT_PRICE_DIR, PriceStore
+
+    parser = argparse.ArgumentParser(description="Backtest a grid of exit rules on a journal's entries")
+    parser.add_argument("journal", help="journal CSV or parquet directory")
+    parser.add_argument("--targets", nargs="+", type=_leg, default=[None], help="profit targets in %%")
+    parser.add_argument("--stops", nargs="+", type=_leg, default=[None], help="stop-losses in %%")
+    parser.add_argument("--trailing", nargs="+", type=_leg, default=[None], help="trailing stops in %%")
+    parser.add_argument("--max-days", nargs="+", type=_leg, default=[None], help="holding limits in calendar days")
+    parser.add_argument("--prices", default=str(DEFAULT_PRICE_DIR), help="price store directory")
+    parser.add_argument("--horizon", type=int, help="trading days to follow each entry (default: from --max-days)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--top", type=int, default=3, help="best rules shown per trade base")
+    parser.add_argument("-o", "--output", help="CSV for the summary of every rule and trade base")
+    parser.add_argument("--entries", help="CSV for the exit of every entry under every rule")
+    args = parser.parse_args()
+
+    max_days = [None if days is None else int(days) for days in args.max_days]
+    rules = rule_grid(args.targets, args.stops, args.trailing, max_days)
+    df = open_journal_store(args.journal).load()
+    # Only history() is used, so the store's fetcher is never called
+    results, info = run_sweep(df, rules, PriceStore(args.prices), args.horizon,
+                              None if args.no_cache else args.cache_dir, args.workers)
+    summary = summarize(results)
+
+    print(f"{len(rules)} rule(s) over {info['entries']} entries, {info['horizon']} trading days each: "
+          f"{info['computed_rules']} computed, {info['cached_rules']} cached")
+    if info["missing_symbols"]:
+        print(f"No stored prices for {len(info['missing_symbols'])} symbol(s): {', '.join(info['missing_symbols'])}")
+    actual = journal_summary(df).set_index("trade_base")
+    columns = ["rule", "trades", "win_rate", "avg_return_pct", "total_pl", "avg_days", "still_open"]
+    with pd.option_context("display.width", 200, "display.float_format", "{:,.2f}".format):
+        for base, group in summary.groupby("trade_base", sort=True):
+            best = group.nlargest(args.top, "total_pl")[columns]
+            if base in actual.index:
+                best = pd.concat([best, actual.loc[[base]].reset_index()[columns]])
+            print(f"\n{base}")
+            print(best.to_string(index=False))
+    if args.output:
+        summary.to_csv(args.output, index=False)
+    if args.entries:
+        results.to_csv(args.entries, index=False)
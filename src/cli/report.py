@@ -0,0 +1,209 @@
+"""Trade summaries, period profits and drawdowns of journals, without the app.
+
+    python -m src.cli.report                                   # every journal here, JSON on stdout
+    python -m src.cli.report SKORM_Journal.csv Broker_Journal.parquet --combined -o reports
+    python -m src.cli.report --format html --charts -o reports --timings
+
+Only pandas and numpy are imported for JSON and chart-less HTML reports;
+plotly is imported when --charts asks for figures, and streamlit never is.
+"""
+import time
+
+STARTED = time.perf_counter()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import sys  # noqa: E402
+from pathlib import Path  # noqa: E402
+
+DEFAULT_INITIAL_AMOUNT = 1000000
+COMBINED = "ALL"
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font-family: sans-serif; color: #2c3e50; margin: 2em; }}
+table {{ border-collapse: collapse; margin-bottom: 1.5em; }}
+th, td {{ border: 1px solid #e0e0e0; padding: 4px 8px; text-align: right; }}
+th {{ background: #f5f5f5; }}
+</style></head>
+<body>
+<h1>{title}</h1>
+{body}
+</body></html>
+"""
+
+
+def _tables(report):
+    # (heading, frame) pairs in the order both renderers show them
+    return [
+        ("Trade bases", report["trade_bases"]),
+        ("Top symbols by amount", report["top_by_amount"]),
+        ("Top symbols by percentage", report["top_by_percentage"]),
+        ("Fastest trades", report["fastest"]),
+        ("Slowest trades", report["slowest"]),
+        ("Recently booked trades", report["recent"]),
+        ("Monthly profits", report["monthly_profits"]),
+        ("Quarterly profits", report["quarterly_profits"]),
+        ("Yearly profits", report["yearly_profits"]),
+        ("Trades entered per month", report["monthly_trades"]),
+    ]
+
+
+def build_report(df, initial_amount, metrics=None, cube=None, top=5, index=None, realized_pl=None):
+    """Everything the summaries, profit graph and yearly tabs show, as plain data.
+
+    ``metrics``, ``cube``, ``index`` and ``realized_pl`` are used when already
+    computed (e.g. merged from the partials of a JournalSet); otherwise they
+    are built from ``df``, which isn't needed once all four are given.
+    """
+    from src.trades_analysis.equity_curve import daily_realized_pl, drawdown_stats, equity_curve
+    from src.trades_analysis.period_cube import build_period_cube, period_profits, period_trades, yearly_profits
+    from src.trades_analysis.summary_metrics import SummaryMetrics, summary_totals
+    from src.trades_analysis.trade_index import DURATION_COLUMNS, RECENT_COLUMNS, build_trade_index
+
+    metrics = metrics if metrics is not None else SummaryMetrics.from_frame(df)
+    cube = cube if cube is not None else build_period_cube(df)
+    index = index if index is not None else build_trade_index(df)
+    realized_pl = realized_pl if realized_pl is not None else daily_realized_pl(df)
+    curve = equity_curve(realized_pl, initial_amount)
+    return {
+        "rows": metrics.total_trades,
+        "initial_amount": initial_amount,
+        "summary": summary_totals(metrics, initial_amount),
+        "drawdown": drawdown_stats(curve),
+        "trade_bases": metrics.trade_base_profits().rename_axis("trade_base").reset_index(),
+        "top_by_amount": index.top_symbols(top, "P/L (INR)").reset_index(),
+        "top_by_percentage": index.top_symbols(top, "P/L in %").reset_index(),
+        "fastest": index.fastest(top, DURATION_COLUMNS),
+        "slowest": index.slowest(top, DURATION_COLUMNS),
+        "recent": index.recent(top, RECENT_COLUMNS),
+        "monthly_profits": period_profits(cube, "month"),
+        "quarterly_profits": period_profits(cube, "quarter"),
+        "yearly_profits": yearly_profits(cube),
+        "monthly_trades": period_trades(cube, "month"),
+        "_cube": cube,
+        "_curve": curve,
+    }
+
+
+def to_json(report):
+    # DataFrames as lists of records, dates as ISO strings
+    out = {}
+    for key, value in report.items():
+        if key.startswith("_"):
+            continue
+        if hasattr(value, "to_json"):
+            out[key] = json.loads(value.to_json(orient="records", date_format="iso"))
+        else:
+            out[key] = value
+    return json.loads(json.dumps(out, default=str))
+
+
+def to_html(account, report, charts=False):
+    summary = "".join(f"<tr><th>{key.replace('_', ' ')}</th><td>{value:,.2f}</td></tr>"
+                      for key, value in report["summary"].items())
+    drawdown = "".join(f"<tr><th>{key.replace('_', ' ')}</th><td>{value if value is not None else '–'}</td></tr>"
+                       for key, value in report["drawdown"].items())
+    parts = [f"<h2>Summary</h2><table>{summary}</table>", f"<h2>Drawdown</h2><table>{drawdown}</table>"]
+    figures = {}
+    if charts:
+        # plotly is only imported when figures are asked for
+        from src.trades_analysis.figures import equity_figure, profit_figure, trades_figure, yearly_figure
+
+        figures = {
+            "Monthly profits": profit_figure(report["monthly_profits"]),
+            "Yearly profits": yearly_figure(report["yearly_profits"]),
+            "Trades entered per month": trades_figure(report["monthly_trades"]),
+        }
+        if len(report["_curve"]):
+            parts.append("<h2>Equity curve</h2>" + equity_figure(report["_curve"]).to_html(full_html=False,
+                                                                                          include_plotlyjs="cdn"))
+    for heading, frame in _tables(report):
+        parts.append(f"<h2>{heading}</h2>")
+        if heading in figures:
+            parts.append(figures[heading].to_html(full_html=False, include_plotlyjs="cdn"))
+        parts.append(frame.to_html(index=False, float_format=lambda v: f"{v:,.2f}", na_rep="–"))
+    return HTML_TEMPLATE.format(title=f"{account} trading journal", body="\n".join(parts))
+
+
+def resolve_journals(paths):
+    from src.journal.multi import account_name, discover_journals
+
+    if not paths:
+        return discover_journals(".")
+    return {account_name(path): Path(path) for path in paths}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write trading journal reports without starting the app")
+    parser.add_argument("journals", nargs="*", help="journal CSVs or parquet directories (default: all in .)")
+    parser.add_argument("--format", choices=["json", "html"], default="json")
+    parser.add_argument("-o", "--output", help="directory for one report file per journal (default: stdout, JSON only)")
+    parser.add_argument("--initial-amount", type=float, default=DEFAULT_INITIAL_AMOUNT)
+    parser.add_argument("--top", type=int, default=5, help="rows in each leaderboard")
+    parser.add_argument("--combined", action="store_true", help=f"also report all journals together as {COMBINED}")
+    parser.add_argument("--charts", action="store_true", help="embed plotly charts in HTML reports")
+    parser.add_argument("--timings", action="store_true", help="print how long each step took to stderr")
+    args = parser.parse_args(argv)
+    if args.format == "html" and not args.output:
+        parser.error("--format html needs --output")
+
+    timings = {}
+    mark = time.perf_counter()
+
+    def lap(step):
+        nonlocal mark
+        now = time.perf_counter()
+        timings[step] = now - mark
+        mark = now
+
+    from src.journal.multi import journal_set
+    from src.trades_analysis.equity_curve import daily_realized_pl, merge_daily_pl
+    from src.trades_analysis.trade_index import build_trade_index, merge_trade_indexes
+
+    lap("imports")
+    journals = resolve_journals(args.journals)
+    if not journals:
+        parser.error("no journals found")
+    # Loaded and aggregated per journal, in worker processes when they're large
+    journal_set.refresh(journals)
+    lap("load")
+
+    accounts = list(journals)
+    groups = {account: [account] for account in accounts}
+    if args.combined and len(accounts) > 1:
+        groups[COMBINED] = accounts
+    reports = {}
+    for name, members in groups.items():
+        # Every part of the report is merged from per-journal results
+        reports[name] = build_report(None, args.initial_amount, journal_set.metrics(members),
+                                     journal_set.cube(members), args.top,
+                                     journal_set.derived(members, "trade_index", build_trade_index,
+                                                         merge=merge_trade_indexes),
+                                     journal_set.derived(members, "daily_pl", daily_realized_pl,
+                                                         merge=merge_daily_pl))
+        lap(f"report {name}")
+
+    if args.output:
+        output = Path(args.output)
+        output.mkdir(parents=True, exist_ok=True)
+        for name, report in reports.items():
+            if args.format == "json":
+                text = json.dumps(to_json(report), indent=2)
+            else:
+                text = to_html(name, report, args.charts)
+            (output / f"{name}.{args.format}").write_text(text, encoding="utf-8")
+    else:
+        json.dump({name: to_json(report) for name, report in reports.items()}, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    lap("write")
+
+    if args.timings:
+        for step, seconds in timings.items():
+            print(f"{step:<24} {seconds:8.3f}s", file=sys.stderr)
+        print(f"{'total since start':<24} {time.perf_counter() - STARTED:8.3f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import functools
+import time
+from collections import deque
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from src.instrumentation import spans
+
+PROFILE_DIR = Path("profiles")
+HISTORY = 10
+CAPTURE_KEY = "profile_capture_cprofile"
+# Set once a cProfile was written, so the checkbox captures a single rerun
+CAPTURED_KEY = "profile_captured"
+
+
+def start_rerun_profile(label):
+    # Call at the top of a page, before anything worth timing
+    enabled = st.sidebar.toggle("Profile reruns", key="profile_reruns")
+    if not enabled:
+        spans.end()
+        return None
+    if st.session_state.pop(CAPTURED_KEY, False):
+        # Unticked before the widget is drawn; it can't be changed afterwards
+        st.session_state[CAPTURE_KEY] = False
+    capture = st.sidebar.checkbox("Capture cProfile of the next rerun", key=CAPTURE_KEY)
+    return spans.begin(label, cprofile=capture)
+
+
+def _record(profile):
+    # Keep the rerun for the panel and write its cProfile, if one was taken
+    reruns = st.session_state.setdefault("rerun_profiles", deque(maxlen=HISTORY))
+    reruns.append(profile)
+    if profile.stats is not None:
+        PROFILE_DIR.mkdir(exist_ok=True)
+        profile.dump_cprofile(PROFILE_DIR / f"rerun_{time.time_ns()}.prof")
+        st.session_state[CAPTURED_KEY] = True
+    return reruns
+
+
+def profiled_fragment(label):
+    """Times the reruns of a st.fragment body that skip the rest of the page.
+
+    A full rerun is already being profiled and only gets a span; a
+    fragment-only rerun never reaches start_rerun_profile() and
+    profiling_panel(), so it is profiled on its own and listed in the panel
+    on the next full rerun (fragments can't write to the sidebar).
+    Apply it under @st.fragment.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if spans.current() is not None or not st.session_state.get("profile_reruns"):
+                with spans.span(label):
+                    return func(*args, **kwargs)
+            capture = bool(st.session_state.get(CAPTURE_KEY)) and not st.session_state.get(CAPTURED_KEY)
+            spans.begin(f"{label} (fragment)", cprofile=capture)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(spans.end())
+        return wrapper
+    return decorator
+
+
+def profiling_panel(history=HISTORY):
+    # Call at the bottom of the page: closes the rerun and shows the last reruns
+    profile = spans.end()
+    if profile is None:
+        return
+    reruns = _record(profile)
+
+    with st.sidebar.expander("Rerun timings", expanded=True):
+        rows = []
+        for run in list(reversed(reruns))[:history]:
+            row = {"rerun": pd.Timestamp(run.started, unit="s").strftime("%H:%M:%S"), "scope": run.label,
+                   "total": run.duration}
+            row.update({name: seconds for name, (seconds, _) in run.breakdown(depth=0).items()})
+            rows.append(row)
+        st.dataframe(pd.DataFrame(rows).set_index("rerun").round(4), use_container_width=True)
+
+        st.caption("Nested spans of the last rerun")
+        nested = pd.DataFrame(
+            [(name, seconds, calls) for name, (seconds, calls) in profile.breakdown().items()],
+            columns=["span", "seconds", "calls"],
+        ).sort_values("seconds", ascending=False)
+        st.dataframe(nested.round(4), hide_index=True, use_container_width=True)
+
+        st.download_button("Download trace (chrome://tracing)", profile.chrome_trace(),
+                           file_name="rerun_trace.json", mime="application/json")
+        # The latest capture, whether of this rerun or of a fragment's since
+        captured = next((run for run in reversed(reruns) if getattr(run, "path", None) is not None), None)
+        if captured is not None:
+            st.caption(f"cProfile of the {captured.label} rerun written to {captured.path}")
+            st.download_button("Download cProfile", captured.path.read_bytes(), file_name=captured.path.name)
+            st.code(captured.cprofile_text(limit=25))
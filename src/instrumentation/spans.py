@@ -0,0 +1,146 @@
+import cProfile
+import functools
+import io
+import json
+import pstats
+import threading
+import time
+from contextlib import nullcontext
+
+# Spans are only collected on threads that called begin(); everywhere else
+# span() hands back this shared no-op context and timed() calls straight
+# through, so instrumentation costs a counter check while profiling is off
+_NULL_SPAN = nullcontext()
+_local = threading.local()
+_active = 0
+_active_lock = threading.Lock()
+
+
+class RerunProfile:
+    """Spans recorded during one script run, plus an optional cProfile."""
+
+    def __init__(self, label, cprofile=False):
+        self.label = label
+        self.started = time.time()
+        self.origin = time.perf_counter()
+        self.finished = None
+        self.spans = []
+        self.depth = 0
+        self.profiler = cProfile.Profile() if cprofile else None
+        self.stats = None
+        # Where dump_cprofile() last wrote the stats
+        self.path = None
+
+    def add(self, name, start, duration, depth):
+        self.spans.append((name, start - self.origin, duration, depth))
+
+    @property
+    def duration(self):
+        return (self.finished or time.perf_counter()) - self.origin
+
+    def breakdown(self, depth=None):
+        # Total seconds and calls per span name, optionally at one nesting depth
+        totals = {}
+        for name, _, duration, span_depth in self.spans:
+            if depth is not None and span_depth != depth:
+                continue
+            seconds, calls = totals.get(name, (0.0, 0))
+            totals[name] = (seconds + duration, calls + 1)
+        return totals
+
+    def chrome_trace(self):
+        # Trace Event Format, loadable in chrome://tracing or ui.perfetto.dev
+        events = [{
+            "name": name, "ph": "X", "pid": 1, "tid": depth,
+            "ts": round(start * 1e6, 3), "dur": round(duration * 1e6, 3),
+        } for name, start, duration, depth in self.spans]
+        return json.dumps({"traceEvents": events, "otherData": {"label": self.label, "started": self.started}})
+
+    def cprofile_text(self, limit=40):
+        if self.stats is None:
+            return None
+        out = io.StringIO()
+        self.stats.stream = out
+        self.stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def dump_cprofile(self, path):
+        if self.stats is None:
+            return None
+        self.stats.dump_stats(path)
+        self.path = path
+        return path
+
+
+class _Span:
+    __slots__ = ("profile", "name", "start")
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self.start
+        self.profile.depth -= 1
+        self.profile.add(self.name, self.start, duration, self.profile.depth)
+        return False
+
+
+def current():
+    return getattr(_local, "profile", None) if _active else None
+
+
+def begin(label, cprofile=False):
+    global _active
+    if current() is not None:
+        end()
+    profile = RerunProfile(label, cprofile=cprofile)
+    _local.profile = profile
+    with _active_lock:
+        _active += 1
+    if profile.profiler is not None:
+        profile.profiler.enable()
+    return profile
+
+
+def end():
+    global _active
+    profile = getattr(_local, "profile", None)
+    if profile is None:
+        return None
+    if profile.profiler is not None:
+        profile.profiler.disable()
+        profile.stats = pstats.Stats(profile.profiler)
+        profile.profiler = None
+    profile.finished = time.perf_counter()
+    _local.profile = None
+    with _active_lock:
+        _active -= 1
+    return profile
+
+
+def span(name):
+    profile = current()
+    if profile is None:
+        return _NULL_SPAN
+    return _Span(profile, name)
+
+
+def timed(name=None):
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = current()
+            if profile is None:
+                return func(*args, **kwargs)
+            with _Span(profile, span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
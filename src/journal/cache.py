@@ -0,0 +1,99 @@
+import threading
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+
+@dataclass
+class _Entry:
+    fingerprint: tuple
+    frame: pd.DataFrame
+    derived: dict = field(default_factory=dict)
+
+
+class JournalCache:
+    """Process-wide cache of loaded journals.
+
+    Entries are keyed on the store's identity and the requested columns, and
+    are valid for as long as the store's fingerprint (inode, mtime, size of
+    the journal file) is unchanged. A hit only stats the file, it never reads
+    it. Savers call invalidate() so the next load picks up their write even
+    when the filesystem's mtime resolution would hide it.
+
+    Anything computed from a journal version can be memoized next to it with
+    derived(), so charts and summaries are rebuilt only when the data changes.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _key(self, store, columns):
+        return (store.identity, None if columns is None else tuple(columns))
+
+    def _entry(self, store, columns):
+        key = self._key(store, columns)
+        fingerprint = store.fingerprint()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.fingerprint == fingerprint:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            invalidations = self.invalidations
+        # Read outside the lock, so loading one journal never holds up hits on
+        # the others. The result is only cached if no save landed meanwhile
+        entry = _Entry(fingerprint, store.load(columns))
+        unchanged = store.fingerprint() == fingerprint
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None and current.fingerprint == fingerprint:
+                # Another thread loaded the same version first; share its derived results
+                return current
+            if unchanged and self.invalidations == invalidations:
+                self._entries[key] = entry
+            return entry
+
+    def load(self, store, columns=None):
+        return _read_only_view(self._entry(store, columns).frame)
+
+    def derived(self, store, name, builder, columns=None):
+        entry = self._entry(store, columns)
+        with self._lock:
+            if name not in entry.derived:
+                entry.derived[name] = builder(entry.frame)
+            return entry.derived[name]
+
+    def invalidate(self, store):
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == store.identity]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+            }
+
+
+def _read_only_view(frame):
+    # Under copy-on-write a shallow copy shares the cached data and copies it
+    # only if the caller writes to it; without it, hand out a real copy
+    if pd.options.mode.copy_on_write:
+        return frame.copy(deep=False)
+    return frame.copy()
+
+
+journal_cache = JournalCache()
@@ -0,0 +1,376 @@
+"""Append-only edit log on top of a parquet journal snapshot.
+
+A save appends one line per change set to ``_edits.jsonl`` inside the
+journal directory: the full rows that were edited or added, keyed by their
+stable row ID, and the IDs that were deleted. Loading replays the log on top
+of the snapshot; compaction folds the log into a new snapshot once it grows.
+
+Every record is an idempotent upsert/delete, so replaying a record that is
+already in the snapshot changes nothing. That is what makes the write path
+crash-safe without a multi-file transaction: a crash while appending leaves a
+torn last line that fails its checksum and is ignored, and a crash while
+compacting leaves the old log next to a partly rewritten snapshot, which
+replays to the same journal.
+"""
+import json
+import os
+import threading
+import uuid
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+from src.journal.schema import apply_schema, widen_prices
+from src.journal.store import JOURNAL_COLUMNS, JournalStore, ParquetJournalStore, _stat_fingerprint
+from src.trades_analysis.summary_metrics import _normalize_changes, _rows_frame, changed_rows
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOG_FILE = "_edits.jsonl"
+LOCK_FILE = "_edits.lock"
+# Compact in the background once the log holds this many change sets or bytes
+COMPACT_RECORDS = 200
+COMPACT_BYTES = 4 * 2**20
+# attrs key of a loaded frame: (log generation, byte offset) it was read up
+# to, or the snapshot's generation and 0 when there was no log yet
+BASE_ATTR = "edit_log_base"
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Advisory lock on ``path`` across processes and threads."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            # msvcrt has no shared locks
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def encode_record(body):
+    payload = json.dumps(body, separators=(",", ":"), allow_nan=False)
+    return f"{zlib.crc32(payload.encode()):08x} {payload}\n".encode()
+
+
+def decode_record(line):
+    # None for a torn or corrupted line
+    try:
+        checksum, payload = line.decode().rstrip("\n").split(" ", 1)
+        if int(checksum, 16) != zlib.crc32(payload.encode()):
+            return None
+        return json.loads(payload)
+    except (UnicodeDecodeError, ValueError):
+        return None
+
+
+def read_records(path, offset=0):
+    """Valid records from ``offset`` on, and the offset where they end.
+
+    Reading stops at the first line that is incomplete or fails its
+    checksum; nothing after a torn write is trusted.
+    """
+    records = []
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return records, offset
+    end = offset
+    for line in data.splitlines(keepends=True):
+        record = decode_record(line) if line.endswith(b"\n") else None
+        if record is None:
+            break
+        records.append(record)
+        end += len(line)
+    return records, end
+
+
+def _rows_payload(rows):
+    # Dates as ISO strings, missing values as null
+    payload = json.loads(rows.to_json(orient="split", date_format="iso", date_unit="s"))
+    return {"index": [int(i) for i in rows.index], "columns": payload["columns"], "data": payload["data"]}
+
+
+def replay(snapshot, records):
+    """Apply log records in order; each row ends up as its last upsert or deleted."""
+    latest = {}
+    for record in records:
+        upserts = record.get("upserts")
+        if upserts:
+            columns = upserts["columns"]
+            for row_id, values in zip(upserts["index"], upserts["data"]):
+                latest[row_id] = dict(zip(columns, values))
+        for row_id in record.get("deletes", []):
+            latest[row_id] = None
+    if not latest:
+        return snapshot
+    kept = snapshot[~snapshot.index.isin(list(latest))]
+    rows = {row_id: values for row_id, values in latest.items() if values is not None}
+    if not rows:
+        return kept
+    upserted = pd.DataFrame.from_dict(rows, orient="index").reindex(columns=snapshot.columns)
+    for column in ["date_in", "date_out"]:
+        if column in upserted:
+            upserted[column] = pd.to_datetime(upserted[column], errors="coerce")
+    # Combined with float64 prices, so a float32 column on either side never
+    # leaks its artifacts into the other; the caller casts the result once
+    parts = [widen_prices(part) for part in [kept, apply_schema(upserted, validate=False)] if len(part)]
+    return pd.concat(parts).sort_index(kind="stable")
+
+
+class EditLogJournalStore(JournalStore):
+    """Parquet journal snapshot plus an append-only log of change sets.
+
+    save_changes() appends only the rows a data editor change set touched,
+    under a file lock, so its cost follows the size of the edit and two
+    sessions saving different rows both keep their changes. Rows saved by
+    another session since this one loaded are reported as conflicts; the
+    later save wins for those rows. load() replays the log on the snapshot,
+    and compaction, run in the background once the log is large, keeps that
+    replay short.
+    """
+
+    _compacting = set()
+    _compacting_lock = threading.Lock()
+
+    def __init__(self, path, compact_records=COMPACT_RECORDS, compact_bytes=COMPACT_BYTES):
+        self.path = Path(path)
+        self.snapshot = ParquetJournalStore(path)
+        self.log_path = self.path / LOG_FILE
+        self.lock_path = self.path / LOCK_FILE
+        self.compact_records = compact_records
+        self.compact_bytes = compact_bytes
+
+    def exists(self):
+        return self.snapshot.exists() or self.log_path.exists()
+
+    def fingerprint(self):
+        snapshot = self.snapshot.fingerprint()
+        log = _stat_fingerprint(self.log_path)
+        return None if snapshot is None and log is None else (snapshot, log)
+
+    @contextmanager
+    def _locked(self, shared=False):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.lock_path, shared):
+            yield
+
+    def _read(self):
+        # Header (generation, next row ID), change sets, and where they end
+        records, end = read_records(self.log_path)
+        if not records or "generation" not in records[0]:
+            return None, [], 0
+        return records[0], records[1:], end
+
+    def _materialize(self, columns=None):
+        header, records, end = self._read()
+        frame = self.snapshot.load(None if columns is None else list(columns))
+        frame = replay(frame, records)
+        frame = apply_schema(frame if columns is None else frame[list(columns)],
+                             required=columns or JOURNAL_COLUMNS)
+        frame.attrs[BASE_ATTR] = (header["generation"], end) if header else (self.snapshot.generation(), 0)
+        return frame, header, records
+
+    def load(self, columns=None):
+        if not self.exists():
+            return self._empty(columns)
+        # Shared lock: compaction never rewrites the snapshot under a reader
+        with self._locked(shared=True):
+            return self._materialize(columns)[0]
+
+    def _write_header(self, next_row):
+        # A new generation tells sessions that loaded before it that the byte
+        # offsets they remember no longer point into this log; the snapshot's
+        # tells those that loaded it before the log was started
+        header = {"generation": uuid.uuid4().hex, "snapshot": self.snapshot.generation(),
+                  "next_row": int(next_row), "seq": 0}
+        tmp = self.log_path.with_name(LOG_FILE + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(encode_record(header))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.log_path)
+        return header
+
+    def _replace_snapshot(self, df, next_row=0):
+        # Snapshot first, then a fresh log: a crash in between replays the
+        # old log on the new snapshot, which is the same journal. Row IDs
+        # keep counting up so a deleted row's ID is never handed out again
+        self.snapshot.save(df)
+        self._write_header(max(next_row, int(df.index.max()) + 1 if len(df) else 0))
+
+    def save(self, df):
+        # Full rewrite, for whole-journal writers like the tradebook import
+        with self._locked():
+            header, records, _ = self._read()
+            self._replace_snapshot(df, max([r["next_row"] for r in [header or {"next_row": 0}] + records]))
+
+    def _header(self):
+        # The log's header, writing one first for a snapshot that has no log yet
+        header, records, end = self._read()
+        if header is None:
+            ids = self.snapshot.load(["script_name"]).index if self.snapshot.exists() else []
+            header = self._write_header(int(max(ids)) + 1 if len(ids) else 0)
+            records, end = [], len(encode_record(header))
+        return header, records, end
+
+    def _tail(self):
+        # Last record of the log, read from the end; truncates a torn tail so
+        # the next append starts on a line of its own
+        with open(self.log_path, "r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            window = min(size, 1 << 16)
+            while True:
+                f.seek(size - window)
+                data = f.read(window)
+                lines = data.splitlines(keepends=True)
+                if len(lines) > 1 or window == size:
+                    break
+                window = min(size, window * 4)
+            while lines:
+                record = decode_record(lines[-1]) if lines[-1].endswith(b"\n") else None
+                if record is not None:
+                    return record
+                size -= len(lines.pop())
+                f.truncate(size)
+        return None
+
+    def save_changes(self, df, changes):
+        """Append one data editor change set made on ``df``.
+
+        ``df`` is the frame the editor was shown (as loaded from this store),
+        ``changes`` the editor's edited/added/deleted rows by position.
+        Returns the rows that were saved and the row IDs another session
+        saved since ``df`` was loaded. Those are read from the log after the
+        point ``df`` was loaded at; once that part of the log has been
+        compacted away, they are the rows stored differently than in ``df``.
+        """
+        changes = _normalize_changes(changes)
+        deleted = set(changes["deleted_rows"])
+        edited = [pos for pos in sorted(changes["edited_rows"]) if pos not in deleted]
+        upserts = changed_rows(df, edited, changes["edited_rows"])
+        upserts.index = df.index[edited]
+        added = _rows_frame(changes["added_rows"], df.columns)
+        deletes = [int(i) for i in df.index[sorted(deleted)]]
+        if not (len(upserts) or len(added) or deletes):
+            return {"upserted": 0, "deleted": 0, "conflicts": []}
+
+        with self._locked():
+            header, _, _ = self._header()
+            touched = set(int(i) for i in upserts.index) | set(deletes)
+            generation, offset = df.attrs.get(BASE_ATTR, (None, 0))
+            if generation is not None and generation == header["generation"]:
+                others = read_records(self.log_path, offset)[0]
+            elif generation is not None and generation == header.get("snapshot") and offset == 0:
+                # Loaded before this log was started: all of it came later
+                others = read_records(self.log_path)[0][1:]
+            else:
+                others = None
+            if others is None:
+                conflicts = self._changed_rows(df, touched)
+            else:
+                conflicts = []
+                for other in others:
+                    saved = set(other.get("upserts", {}).get("index", [])) | set(other.get("deletes", []))
+                    conflicts.extend(sorted(touched & saved))
+            self._append(header, upserts, added, deletes, df.columns)
+        return {"upserted": len(upserts) + len(added), "deleted": len(deletes), "conflicts": sorted(set(conflicts))}
+
+    def _changed_rows(self, df, ids):
+        # Called under the lock: rows among ``ids`` stored differently from
+        # how ``df`` has them, or deleted since
+        if not ids:
+            return []
+        current = self._materialize(list(df.columns))[0]
+        ids = sorted(ids)
+        kept = [i for i in ids if i in current.index]
+        before = df.loc[kept].astype(object)
+        now = current.loc[kept, list(df.columns)].astype(object)
+        same = ((before == now) | (before.isna() & now.isna())).all(axis=1)
+        return sorted(set(ids) - set(kept)) + [int(i) for i in same.index[~same.to_numpy()]]
+
+    def upsert(self, rows, added):
+        """Append ``rows`` over the rows with the same IDs, and ``added`` as new rows.
+
+        For writers that keep track of rows by ID rather than by editor
+        position, like the tradebook import. Returns the IDs given to the
+        added rows, in their order.
+        """
+        if not (len(rows) or len(added)):
+            return pd.RangeIndex(0)
+        with self._locked():
+            header, _, _ = self._header()
+            _, ids = self._append(header, rows, added, [], rows.columns if len(rows) else added.columns)
+        return ids
+
+    def _append(self, header, upserts, added, deletes, columns):
+        # Called under the lock: one change set, the added rows numbered from
+        # the log's next row ID. Compacts in the background once the log is large
+        last = self._tail() or header
+        added = added.set_axis(pd.RangeIndex(last["next_row"], last["next_row"] + len(added)))
+        rows = pd.concat([part for part in [upserts, added] if len(part)] or [upserts])
+        record = {"seq": last["seq"] + 1, "next_row": last["next_row"] + len(added), "deletes": deletes}
+        if len(rows):
+            record["upserts"] = _rows_payload(rows[list(columns)])
+        with open(self.log_path, "ab") as f:
+            f.write(encode_record(record))
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        if record["seq"] >= self.compact_records or size >= self.compact_bytes:
+            self.compact_in_background()
+        return record, added.index
+
+    def compact(self):
+        # Fold the log into a new snapshot; returns the change sets folded in
+        with self._locked():
+            header, records, _ = self._read()
+            if not records:
+                return 0
+            frame = replay(self.snapshot.load(), records)
+            self._replace_snapshot(apply_schema(frame, validate=False), max(r["next_row"] for r in [header] + records))
+            return len(records)
+
+    def compact_in_background(self):
+        key = str(self.path.resolve())
+        with self._compacting_lock:
+            if key in self._compacting:
+                return None
+            self._compacting.add(key)
+
+        def run():
+            try:
+                self.compact()
+            finally:
+                with self._compacting_lock:
+                    self._compacting.discard(key)
+
+        thread = threading.Thread(target=run, name=f"compact-{self.path.name}", daemon=True)
+        thread.start()
+        return thread
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fold the edit log of parquet journals into their snapshot")
+    parser.add_argument("journals", nargs="+")
+    args = parser.parse_args()
+    for journal in args.journals:
+        print(f"{journal}: {EditLogJournalStore(journal).compact()} change set(s) compacted")
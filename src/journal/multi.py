@@ -0,0 +1,183 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+from src.journal.cache import _read_only_view
+from src.journal.schema import apply_schema
+from src.journal.store import JOURNAL_COLUMNS, MANIFEST_FILE, open_journal_store
+from src.trades_analysis.period_cube import build_period_cube, merge_period_cubes
+from src.trades_analysis.summary_metrics import SummaryMetrics
+
+ACCOUNT_COLUMN = "account"
+JOURNAL_SUFFIX = "_Journal"
+# Below this much journal data on disk, starting worker processes costs more
+# than loading the journals one after another
+PARALLEL_MIN_BYTES = 8 * 2**20
+
+
+def account_name(path):
+    # SKORM_Journal.csv -> SKORM; anything else keeps its file name
+    stem = Path(path).stem
+    return stem[:-len(JOURNAL_SUFFIX)] if stem.endswith(JOURNAL_SUFFIX) else stem
+
+
+def _is_csv_journal(path):
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        header = f.readline().strip().split(",")
+    return all(column in header for column in JOURNAL_COLUMNS)
+
+
+def discover_journals(root="."):
+    """Journals directly under ``root`` keyed by account name.
+
+    A CSV counts when its header has every journal column, a directory when
+    it holds a parquet journal manifest. Where an account has both, the
+    parquet journal wins, like on the single-journal page.
+    """
+    root = Path(root)
+    journals = {}
+    for path in sorted(root.glob("*.csv")):
+        if _is_csv_journal(path):
+            journals[account_name(path)] = path
+    for path in sorted(root.glob("*.parquet")):
+        if (path / MANIFEST_FILE).exists():
+            journals[account_name(path)] = path
+    return journals
+
+
+def _journal_bytes(path):
+    path = Path(path)
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size if path.exists() else 0
+
+
+@dataclass
+class JournalPartial:
+    """One account's journal and the aggregates computed from it."""
+
+    account: str
+    fingerprint: tuple
+    frame: pd.DataFrame
+    metrics: SummaryMetrics
+    cube: object
+
+
+def load_partial(account, path, columns=None):
+    # Runs in a worker process: load, tag and aggregate one journal, so only
+    # the finished partial travels back to the app
+    store = open_journal_store(path)
+    fingerprint = store.fingerprint()
+    frame = store.load(columns or JOURNAL_COLUMNS)
+    frame[ACCOUNT_COLUMN] = pd.Categorical([account] * len(frame))
+    return JournalPartial(account, fingerprint, frame, SummaryMetrics.from_frame(frame), build_period_cube(frame))
+
+
+class JournalSet:
+    """Partials of many journals, reloaded only when their file changes.
+
+    Journals that need loading are read in parallel in a process pool once
+    there is enough of them to pay for starting the workers. A
+    view over any subset of accounts adds up their metrics and period cubes,
+    and derived() merges anything else built per journal the same way; the
+    row-level frames are concatenated only when frame() is asked for.
+    """
+
+    def __init__(self, max_workers=None, parallel_min_bytes=PARALLEL_MIN_BYTES):
+        self.max_workers = max_workers
+        self.parallel_min_bytes = parallel_min_bytes
+        self._partials = {}
+        self._frames = {}
+        self._derived = {}
+        self._partial_derived = {}
+        self._lock = threading.RLock()
+
+    def _stale(self, journals):
+        stale = {}
+        for account, path in journals.items():
+            partial = self._partials.get(account)
+            fingerprint = open_journal_store(path).fingerprint()
+            if partial is None or partial.fingerprint != fingerprint:
+                stale[account] = path
+        return stale
+
+    def refresh(self, journals, columns=None):
+        # Returns the accounts that were (re)loaded
+        with self._lock:
+            stale = self._stale(journals)
+            if not stale:
+                return []
+            workers = min(len(stale), self.max_workers or os.cpu_count() or 1)
+            if workers > 1 and sum(_journal_bytes(p) for p in stale.values()) >= self.parallel_min_bytes:
+                # Spawned workers: forking a process that runs server threads is unsafe
+                with ProcessPoolExecutor(max_workers=workers,
+                                         mp_context=multiprocessing.get_context("spawn")) as pool:
+                    futures = {account: pool.submit(load_partial, account, str(path), columns)
+                               for account, path in stale.items()}
+                    loaded = {account: future.result() for account, future in futures.items()}
+            else:
+                loaded = {account: load_partial(account, path, columns) for account, path in stale.items()}
+            self._partials.update(loaded)
+            self._frames.clear()
+            self._derived.clear()
+            # Per-journal results of the journals that didn't change are kept
+            for key in [key for key in self._partial_derived if key[0] in loaded]:
+                del self._partial_derived[key]
+            return list(loaded)
+
+    def partial(self, account):
+        return self._partials[account]
+
+    def metrics(self, accounts):
+        # No accounts add up to no trades
+        return sum((self._partials[a].metrics for a in accounts), SummaryMetrics())
+
+    def cube(self, accounts):
+        if not accounts:
+            return build_period_cube(pd.DataFrame(columns=JOURNAL_COLUMNS))
+        return merge_period_cubes(self._partials[a].cube for a in accounts)
+
+    def _frame(self, accounts):
+        key = tuple(accounts)
+        with self._lock:
+            if key not in self._frames:
+                frame = pd.concat([self._partials[a].frame for a in accounts], ignore_index=True)
+                # Category columns of different journals concatenate to object;
+                # cast the combined frame back without revalidating it
+                self._frames[key] = apply_schema(frame, validate=False)
+            return self._frames[key]
+
+    def frame(self, accounts):
+        return _read_only_view(self._frame(accounts))
+
+    def partial_derived(self, account, name, builder):
+        # Like JournalCache.derived, for one account's journal
+        key = (account, name)
+        with self._lock:
+            if key not in self._partial_derived:
+                self._partial_derived[key] = builder(self._partials[account].frame)
+            return self._partial_derived[key]
+
+    def derived(self, accounts, name, builder, merge=None):
+        """Like JournalCache.derived, for these accounts together.
+
+        With ``merge``, ``builder`` runs on each journal once per version and
+        ``merge`` combines the per-journal results in account order, so the
+        frames are never concatenated; without it ``builder`` gets frame().
+        """
+        key = (tuple(accounts), name)
+        with self._lock:
+            if key not in self._derived:
+                if merge is None:
+                    self._derived[key] = builder(self._frame(accounts))
+                else:
+                    self._derived[key] = merge([self.partial_derived(a, name, builder) for a in accounts])
+            return self._derived[key]
+
+
+journal_set = JournalSet()
@@ -0,0 +1,147 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Declared dtypes of a loaded journal. Symbols and bases repeat a handful of
+# values, quantities and days are whole numbers that may be missing on rows
+# still being typed in, and prices fit float32 at the precision they're quoted.
+JOURNAL_SCHEMA = {
+    "script_name": "category",
+    "trade_base": "category",
+    "price_in": "float32",
+    "quantity_in": "Int32",
+    "quantity_left": "Int32",
+    "date_in": "datetime64[ns]",
+    "amount_in": "float64",
+    "balance_left": "float64",
+    "date_out": "datetime64[ns]",
+    "price_out": "float32",
+    "P/L (INR)": "float64",
+    "P/L in %": "float64",
+    "days_taken": "Int32",
+    # Source account, present on frames consolidated from several journals
+    "account": "category",
+}
+CATEGORY_COLUMNS = [c for c, dtype in JOURNAL_SCHEMA.items() if dtype == "category"]
+# Prices are quoted to the paisa; they are stored as float32 only when every
+# value round-trips at this many decimals
+PRICE_DECIMALS = 2
+
+
+def _default_memory(values):
+    # Bytes the column would take with pandas' default dtypes, so the report
+    # stays honest when the loader already read it as a categorical
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        counts = values.value_counts(sort=False).reindex(values.cat.categories, fill_value=0).to_numpy()
+        sizes = np.fromiter((sys.getsizeof(v) for v in values.cat.categories), dtype="int64", count=len(counts))
+        return 8 * len(values) + int((counts * sizes).sum())
+    return int(values.memory_usage(deep=True, index=False))
+
+
+def _compact_float(values, notes, column):
+    f32 = values.astype("float32")
+    restored = np.round(f32.astype("float64"), PRICE_DECIMALS)
+    original = values.to_numpy(dtype="float64", na_value=np.nan)
+    lossless = (restored.to_numpy() == original) | np.isnan(original)
+    if lossless.all():
+        return f32
+    notes.append(f"{column}: {int((~lossless).sum())} value(s) need more than {PRICE_DECIMALS} decimals, kept as float64")
+    return values
+
+
+def _compact_int(values, dtype, notes, column):
+    integral = values.isna() | (values == np.round(values))
+    bounds = np.iinfo(dtype.lower())
+    in_range = values.isna() | values.between(bounds.min, bounds.max)
+    if integral.all() and in_range.all():
+        return values.astype(dtype)
+    if not integral.all():
+        notes.append(f"{column}: {int((~integral).sum())} value(s) are not whole numbers, kept as float64")
+    if not in_range.all():
+        notes.append(f"{column}: {int((~in_range).sum())} value(s) don't fit {dtype}, kept as float64")
+    return values
+
+
+def apply_schema(df, validate=True, required=()):
+    """Cast a journal frame to JOURNAL_SCHEMA and validate it.
+
+    Returns a new frame. Columns that can't take their compact dtype without
+    losing information keep float64 and are reported, columns outside the
+    schema pass through untouched. The report (memory before/after, columns
+    kept wide, validation issues) is attached as ``df.attrs["schema_report"]``.
+    """
+    memory_before = sum(_default_memory(df[column]) for column in df.columns)
+    notes = []
+    typed = {}
+    for column in df.columns:
+        dtype = JOURNAL_SCHEMA.get(column)
+        values = df[column]
+        if dtype is None or str(values.dtype) == dtype:
+            typed[column] = values
+        elif dtype == "category":
+            typed[column] = values.astype("category")
+        elif dtype.startswith("datetime64"):
+            typed[column] = pd.to_datetime(values, errors="coerce").astype(dtype)
+        elif dtype == "float32":
+            typed[column] = _compact_float(pd.to_numeric(values, errors="coerce").astype("float64"), notes, column)
+        elif dtype.startswith("Int"):
+            typed[column] = _compact_int(pd.to_numeric(values, errors="coerce").astype("float64"), dtype, notes, column)
+        else:
+            typed[column] = pd.to_numeric(values, errors="coerce").astype(dtype)
+    result = pd.DataFrame(typed, index=df.index)
+
+    memory_after = int(result.memory_usage(deep=True, index=False).sum())
+    result.attrs["schema_report"] = {
+        "rows": len(result),
+        "memory_before": memory_before,
+        "memory_after": memory_after,
+        "kept_wide": notes,
+        "issues": validate_journal(result, required) if validate else [],
+    }
+    return result
+
+
+def validate_journal(df, required=()):
+    # Returns human readable issues instead of raising, so a journal with a few
+    # bad rows still opens
+    issues = []
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        issues.append(f"missing column(s): {', '.join(missing)}")
+
+    def check(column_names, mask, message):
+        if all(c in df.columns for c in column_names):
+            count = int(np.asarray(mask(), dtype=bool).sum())
+            if count:
+                issues.append(f"{count} row(s) {message}")
+
+    check(["quantity_in"], lambda: (df["quantity_in"] < 0).fillna(False), "have a negative quantity_in")
+    check(["quantity_left"], lambda: (df["quantity_left"] < 0).fillna(False), "have a negative quantity_left")
+    check(["quantity_in", "quantity_left"], lambda: (df["quantity_left"] > df["quantity_in"]).fillna(False),
+          "have more quantity_left than quantity_in")
+    check(["price_in"], lambda: (df["price_in"] <= 0).fillna(False), "have a price_in of zero or less")
+    check(["date_in", "date_out"], lambda: (df["date_out"] < df["date_in"]).fillna(False),
+          "were booked before they were entered")
+    check(["script_name"], lambda: df["script_name"].isna(), "have no script_name")
+    return issues
+
+
+def schema_report(df):
+    return df.attrs.get("schema_report")
+
+
+def widen_prices(df):
+    # float32 price columns back to float64 at the decimals they were quoted
+    # at; mixing float32 with float64 rows (edited or added ones) would
+    # otherwise keep float32 artifacts like 345.1400146484375
+    columns = [c for c in df.columns if JOURNAL_SCHEMA.get(c) == "float32" and df[c].dtype == "float32"]
+    if not columns:
+        return df
+    return df.assign(**{c: np.round(df[c].astype("float64"), PRICE_DECIMALS) for c in columns})
+
+
+def editable_frame(df):
+    # st.data_editor turns categoricals into dropdowns of the existing values;
+    # hand it plain strings so new symbols and bases can be typed in
+    return df.astype({c: object for c in CATEGORY_COLUMNS if c in df.columns and isinstance(df[c].dtype, pd.CategoricalDtype)})
@@ -0,0 +1,225 @@
+import json
+import os
+import shutil
+import uuid
+import zlib
+from pathlib import Path
+
+import pandas as pd
+
+from src.journal.schema import CATEGORY_COLUMNS, apply_schema
+
+JOURNAL_COLUMNS = [
+    "script_name", "trade_base", "price_in", "quantity_in", "quantity_left", "date_in",
+    "amount_in", "balance_left", "date_out", "price_out",
+    "P/L (INR)", "P/L in %", "days_taken"
+]
+DATE_COLUMNS = ["date_in", "date_out"]
+
+# Column holding the DataFrame index inside parquet partitions, so rows come
+# back in journal order no matter which year partition they live in
+ROW_COLUMN = "_row"
+MANIFEST_FILE = "_manifest.json"
+UNKNOWN_YEAR = "unknown"
+
+
+class JournalStore:
+    """Base class for journal backends: load a frame, save a frame."""
+
+    path = None
+
+    @property
+    def identity(self):
+        return str(Path(self.path).resolve())
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def fingerprint(self):
+        # Changes whenever a save lands: inode, mtime and size of the file that
+        # is replaced last on every save. None while the journal doesn't exist.
+        return _stat_fingerprint(self.path)
+
+    def load(self, columns=None):
+        raise NotImplementedError
+
+    def save(self, df):
+        raise NotImplementedError
+
+    def _empty(self, columns):
+        return apply_schema(pd.DataFrame(columns=columns or JOURNAL_COLUMNS))
+
+
+class CsvJournalStore(JournalStore):
+    """The original single-file CSV journal. Every save rewrites the file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def load(self, columns=None):
+        if not self.exists():
+            return self._empty(columns)
+        usecols = None if columns is None else list(columns)
+        parse_dates = [c for c in DATE_COLUMNS if usecols is None or c in usecols]
+        # Read symbols and bases straight into categoricals, the rest is typed after parsing
+        dtype = {c: "category" for c in CATEGORY_COLUMNS if usecols is None or c in usecols}
+        df = pd.read_csv(self.path, usecols=usecols, parse_dates=parse_dates, dtype=dtype)
+        df = df if usecols is None else df[usecols]
+        return apply_schema(df, required=usecols or JOURNAL_COLUMNS)
+
+    def save(self, df):
+        # Written next to the journal, synced and renamed over it, so a crash
+        # mid-write never leaves a truncated journal behind. The lock keeps two
+        # sessions saving at once from writing the same temporary file
+        from src.journal.edit_log import file_lock
+
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with file_lock(self.path.with_name(self.path.name + ".lock")):
+            with open(tmp, "w", newline="", encoding="utf-8") as f:
+                df.to_csv(f, index=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+
+
+class ParquetJournalStore(JournalStore):
+    """Directory of parquet files partitioned by the year of ``date_in``.
+
+    A manifest keeps a content hash per partition, so a save only rewrites the
+    years whose rows actually changed, and a load only reads the requested
+    columns. Every save gives the manifest a new generation.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    @property
+    def manifest_path(self):
+        return self.path / MANIFEST_FILE
+
+    def exists(self):
+        return self.manifest_path.exists()
+
+    def fingerprint(self):
+        return _stat_fingerprint(self.manifest_path)
+
+    def generation(self):
+        return self.read_manifest().get("generation")
+
+    def read_manifest(self):
+        if not self.exists():
+            return {"partitions": {}}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _partition_file(self, key):
+        return self.path / f"year={key}" / "part.parquet"
+
+    def load(self, columns=None):
+        if not self.exists():
+            return self._empty(columns)
+        import pyarrow.parquet as pq
+
+        partitions = self.read_manifest()["partitions"]
+        read_columns = None if columns is None else list(columns) + [ROW_COLUMN]
+        tables = [pq.read_table(self._partition_file(key), columns=read_columns) for key in sorted(partitions)]
+        if not tables:
+            return self._empty(columns)
+        df = pd.concat([t.to_pandas() for t in tables], ignore_index=True)
+        df = df.sort_values(ROW_COLUMN, kind="stable").set_index(ROW_COLUMN)
+        df.index.name = None
+        df = df if columns is None else df[list(columns)]
+        return apply_schema(df, required=columns or JOURNAL_COLUMNS)
+
+    def save(self, df):
+        self.path.mkdir(parents=True, exist_ok=True)
+        manifest = self.read_manifest()
+        old = manifest["partitions"]
+        new = {}
+
+        frame = df.copy()
+        frame[ROW_COLUMN] = frame.index.astype("int64")
+        frame = frame.reset_index(drop=True)
+        for key, part in frame.groupby(partition_keys(frame), sort=True):
+            part = part.reset_index(drop=True)
+            digest = _frame_digest(part)
+            new[key] = {"rows": len(part), "hash": digest}
+            if old.get(key, {}).get("hash") != digest:
+                _atomic_parquet(part, self._partition_file(key))
+
+        manifest = {"columns": list(df.columns), "partitions": new, "generation": uuid.uuid4().hex}
+        tmp = self.manifest_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.manifest_path)
+        # Years left without rows go only once the manifest no longer lists
+        # them, so a crash in between never leaves it pointing at a missing file
+        for key in set(old) - set(new):
+            shutil.rmtree(self._partition_file(key).parent, ignore_errors=True)
+        return sorted(k for k in new if old.get(k, {}).get("hash") != new[k]["hash"])
+
+
+def _stat_fingerprint(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def partition_keys(df):
+    years = pd.to_datetime(df["date_in"], errors="coerce").dt.year
+    return years.astype("Int64").astype(str).where(years.notna(), UNKNOWN_YEAR).to_numpy()
+
+
+def _frame_digest(df):
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    # Order-sensitive combination of the per-row hashes
+    weights = pd.RangeIndex(1, len(hashed) + 1).to_numpy().astype("uint64")
+    columns = zlib.crc32("\x1f".join(map(str, df.columns)).encode())
+    return f"{len(df)}-{int((hashed * weights).sum()):x}-{columns:x}"
+
+
+def _atomic_parquet(df, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    df.to_parquet(tmp, index=False, engine="pyarrow")
+    os.replace(tmp, path)
+
+
+def open_journal_store(path):
+    if isinstance(path, JournalStore):
+        return path
+    path = Path(path)
+    if path.suffix == ".csv":
+        return CsvJournalStore(path)
+    # Parquet journals are read and written through their edit log
+    from src.journal.edit_log import EditLogJournalStore
+
+    return EditLogJournalStore(path)
+
+
+def migrate_csv_to_parquet(csv_file, parquet_dir=None, overwrite=False):
+    source = CsvJournalStore(csv_file)
+    target = ParquetJournalStore(parquet_dir or Path(csv_file).with_suffix(".parquet"))
+    if target.exists() and not overwrite:
+        raise FileExistsError(f"{target.path} already exists, pass overwrite=True to replace it")
+    if target.exists():
+        shutil.rmtree(target.path)
+    df = source.load()
+    target.save(df)
+    return target
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migrate CSV journals to the partitioned parquet store")
+    parser.add_argument("csv_files", nargs="+")
+    parser.add_argument("--overwrite", action="store_true")
+    args = parser.parse_args()
+    for csv_file in args.csv_files:
+        target = migrate_csv_to_parquet(csv_file, overwrite=args.overwrite)
+        print(f"{csv_file} -> {target.path}")
@@ -0,0 +1,395 @@
+"""Import broker tradebook exports into a journal, matching sells to buys FIFO.
+
+    python -m src.journal.tradebook_import tradebook-2023.csv tradebook-2024.csv --journal Broker_Journal.parquet
+
+Every buy fill (or every buy order, when the export has order IDs) opens a
+lot, which is one journal row indexed by its lot ID. Sells close the oldest
+open lots of their symbol first, filling in quantity_left, the
+quantity-weighted price_out and date_out of each lot they touch. Only the
+lots an import opened or touched are written, as change sets of the
+journal's edit log, every FLUSH_LOTS lots. Trade IDs already imported are
+remembered next to the journal, so importing an overlapping export again
+only adds the fills that are new.
+"""
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.journal.edit_log import EditLogJournalStore
+from src.journal.store import JOURNAL_COLUMNS, open_journal_store
+from src.trades_analysis.derived_columns import calculate_derived_columns
+
+# Header spellings seen in broker exports, after lower-casing and replacing
+# spaces with underscores
+COLUMN_ALIASES = {
+    "symbol": ["symbol", "tradingsymbol", "scrip", "scrip_name", "stock"],
+    "trade_date": ["trade_date", "date", "order_date"],
+    "trade_time": ["order_execution_time", "trade_time", "execution_time", "time"],
+    "side": ["trade_type", "buy/sell", "side", "transaction_type", "action"],
+    "quantity": ["quantity", "qty", "filled_quantity"],
+    "price": ["price", "rate", "trade_price", "average_price"],
+    "trade_id": ["trade_id", "trade_no", "trade_number"],
+    "order_id": ["order_id", "order_no", "order_number"],
+}
+REQUIRED_FIELDS = ["symbol", "trade_date", "side", "quantity", "price", "trade_id"]
+STATE_FILE = "_imported_trades.npy"
+DEFAULT_CHUNKSIZE = 100_000
+# Touched lots held before they're written out, checked after every chunk
+FLUSH_LOTS = 50_000
+# Journal columns the FIFO queues are rebuilt from
+RESUME_COLUMNS = ["script_name", "trade_base", "price_in", "quantity_in", "quantity_left", "date_in", "date_out",
+                  "price_out"]
+# Lot ID of a lot opened by this import until the journal numbers it
+NEW_LOT = -1
+LOT_FIELDS = ["symbol", "trade_base", "price_in", "quantity_in", "quantity_left", "date_in", "sold_value",
+              "date_out", "lot_id"]
+
+
+class TradebookError(ValueError):
+    pass
+
+
+def _normalize(name):
+    return str(name).strip().lower().replace(" ", "_")
+
+
+def resolve_columns(header):
+    # Map our field names to the export's own column names
+    by_name = {_normalize(column): column for column in header}
+    resolved = {}
+    for name, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in by_name:
+                resolved[name] = by_name[alias]
+                break
+    missing = [name for name in REQUIRED_FIELDS if name not in resolved]
+    if missing:
+        raise TradebookError(f"tradebook is missing column(s) for: {', '.join(missing)}")
+    return resolved
+
+
+def trade_id_hashes(values):
+    return pd.util.hash_array(pd.Series(values).astype(str).to_numpy(dtype=object))
+
+
+@dataclass
+class ImportReport:
+    files: int = 0
+    fills: int = 0
+    duplicates: int = 0
+    buys: int = 0
+    sells: int = 0
+    lots_opened: int = 0
+    lots_closed: int = 0
+    out_of_order: int = 0
+    unmatched: dict = field(default_factory=dict)
+
+    def summary(self):
+        text = (f"{self.fills} fills from {self.files} file(s): {self.duplicates} already imported, "
+                f"{self.buys} buys, {self.sells} sells; {self.lots_opened} lots opened, {self.lots_closed} closed")
+        if self.out_of_order:
+            text += f"; {self.out_of_order} fill(s) older than ones already imported for their symbol"
+        if self.unmatched:
+            text += f"; sold without a matching buy: {', '.join(f'{s} ({q:g})' for s, q in self.unmatched.items())}"
+        return text
+
+
+class _LotBook:
+    """Lots as growable column arrays plus a FIFO queue of open lots per symbol."""
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.symbol = np.empty(capacity, dtype=object)
+        self.trade_base = np.empty(capacity, dtype=object)
+        self.price_in = np.empty(capacity)
+        self.quantity_in = np.empty(capacity)
+        self.quantity_left = np.empty(capacity)
+        self.date_in = np.empty(capacity, dtype="datetime64[ns]")
+        self.sold_value = np.empty(capacity)
+        self.date_out = np.empty(capacity, dtype="datetime64[ns]")
+        self.lot_id = np.empty(capacity, dtype="int64")
+        self.queues = defaultdict(deque)
+        self.last_fill = {}
+        self.touched = set()
+
+    def _reserve(self, size):
+        capacity = len(self.lot_id)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name in LOT_FIELDS:
+            values = getattr(self, name)
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[:self.size] = values[:self.size]
+            setattr(self, name, grown)
+
+    def extend(self, lots):
+        # Open lots of the journal, in the order they were opened; one slice
+        # assignment per field rather than a row at a time
+        start, end = self.size, self.size + len(lots["lot_id"])
+        self._reserve(end)
+        for name in LOT_FIELDS:
+            getattr(self, name)[start:end] = lots[name]
+        self.size = end
+        for symbol, positions in pd.Series(lots["symbol"]).groupby(lots["symbol"], sort=False).indices.items():
+            self.queues[symbol].extend((start + positions).tolist())
+
+    def add(self, symbol, trade_base, price_in, quantity):
+        self._reserve(self.size + 1)
+        slot = self.size
+        self.size += 1
+        self.lot_id[slot] = NEW_LOT
+        self.symbol[slot] = symbol
+        self.trade_base[slot] = trade_base
+        self.price_in[slot] = price_in
+        self.quantity_in[slot] = quantity
+        self.quantity_left[slot] = quantity
+        self.sold_value[slot] = 0.0
+        self.date_out[slot] = np.datetime64("NaT")
+        self.queues[symbol].append(slot)
+        return slot
+
+    def buy(self, symbol, quantity, price, when, order_lot=None, trade_base=None):
+        # Fills of one order make one lot as long as nothing was sold from it yet
+        if order_lot is not None and self.quantity_left[order_lot] == self.quantity_in[order_lot]:
+            total = self.quantity_in[order_lot] + quantity
+            self.price_in[order_lot] = (self.price_in[order_lot] * self.quantity_in[order_lot] + price * quantity) / total
+            self.quantity_in[order_lot] = total
+            self.quantity_left[order_lot] = total
+            self.touched.add(order_lot)
+            return order_lot, False
+        slot = self.add(symbol, trade_base, price, quantity)
+        self.date_in[slot] = when
+        self.touched.add(slot)
+        return slot, True
+
+    def sell(self, symbol, quantity, price, when):
+        # Returns (lots closed, quantity left unmatched)
+        queue = self.queues[symbol]
+        closed = 0
+        while quantity > 0 and queue:
+            slot = queue[0]
+            taken = min(quantity, self.quantity_left[slot])
+            self.quantity_left[slot] -= taken
+            self.sold_value[slot] += taken * price
+            self.date_out[slot] = when
+            self.touched.add(slot)
+            quantity -= taken
+            if self.quantity_left[slot] <= 0:
+                queue.popleft()
+                closed += 1
+        return closed, quantity
+
+    def frame(self, slots):
+        sold = self.quantity_in[slots] - self.quantity_left[slots]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            price_out = np.where(sold > 0, self.sold_value[slots] / sold, np.nan)
+        return pd.DataFrame({
+            "script_name": self.symbol[slots],
+            "trade_base": self.trade_base[slots],
+            "price_in": self.price_in[slots],
+            "quantity_in": self.quantity_in[slots],
+            "quantity_left": self.quantity_left[slots],
+            "date_in": self.date_in[slots],
+            "date_out": self.date_out[slots],
+            "price_out": price_out,
+        }, index=self.lot_id[slots])
+
+    def keep_open(self):
+        # Once saved, closed lots are never touched again; only the open ones
+        # stay in memory, so it follows the open positions, not the journal.
+        # Returns the new slot of each lot that was kept
+        keep = np.flatnonzero(self.quantity_left[:self.size] > 0)
+        moved = dict(zip(keep.tolist(), range(len(keep))))
+        for name in LOT_FIELDS:
+            values = getattr(self, name)
+            values[:len(keep)] = values[keep]
+        self.size = len(keep)
+        self.queues = defaultdict(deque, {symbol: deque(moved[slot] for slot in queue)
+                                          for symbol, queue in self.queues.items() if queue})
+        self.touched = set()
+        return moved
+
+
+class TradebookImporter:
+    """Streams tradebook CSVs into an importer-owned parquet journal.
+
+    Only open lots, the lots touched since the last flush and the hashes of
+    imported trade IDs are kept between chunks, so memory grows with the open
+    positions, not with the journal or the size of the export. The journal
+    can still be edited in the app; columns the importer doesn't own, like
+    trade_base, are kept on re-import.
+    """
+
+    def __init__(self, journal, chunksize=DEFAULT_CHUNKSIZE, trade_base=None, flush_lots=FLUSH_LOTS):
+        self.store = open_journal_store(journal)
+        if not isinstance(self.store, EditLogJournalStore):
+            raise TradebookError(f"{self.store.path}: tradebooks import into a parquet journal directory, "
+                                 f"not a {type(self.store).__name__}")
+        self.chunksize = chunksize
+        self.trade_base = trade_base
+        self.flush_lots = flush_lots
+        self.state_path = self.store.path / STATE_FILE
+        self.seen = np.load(self.state_path) if self.state_path.exists() else np.empty(0, dtype="uint64")
+        self.book = _LotBook()
+        self.order_lots = {}
+        self.file_last = {}
+        if self.store.exists():
+            self._resume(self.store.load(RESUME_COLUMNS))
+
+    def _resume(self, journal):
+        # Rebuild the FIFO queues from the journal itself: open lots in the
+        # order they were opened. The journal frame isn't kept
+        symbols = journal["script_name"].astype(str).to_numpy(dtype=object)
+        quantity_in = pd.to_numeric(journal["quantity_in"], errors="coerce").fillna(0).to_numpy(dtype="float64")
+        quantity_left = pd.to_numeric(journal["quantity_left"], errors="coerce").fillna(0).to_numpy(dtype="float64")
+        price_out = pd.to_numeric(journal["price_out"], errors="coerce").fillna(0).to_numpy(dtype="float64")
+        date_in = pd.to_datetime(journal["date_in"]).to_numpy(dtype="datetime64[ns]")
+        date_out = pd.to_datetime(journal["date_out"]).to_numpy(dtype="datetime64[ns]")
+        last = pd.Series(np.where(np.isnat(date_out), date_in, np.maximum(date_in, date_out)))
+        self.book.last_fill = last.groupby(symbols).max().to_dict()
+
+        open_lots = np.flatnonzero(quantity_left > 0)
+        open_lots = open_lots[np.lexsort((journal.index.to_numpy()[open_lots], date_in[open_lots]))]
+        trade_base = journal["trade_base"].astype(object)
+        self.book.extend({
+            "symbol": symbols[open_lots],
+            "trade_base": trade_base.where(trade_base.notna(), None).to_numpy(dtype=object)[open_lots],
+            "price_in": pd.to_numeric(journal["price_in"], errors="coerce").to_numpy(dtype="float64")[open_lots],
+            "quantity_in": quantity_in[open_lots],
+            "quantity_left": quantity_left[open_lots],
+            "date_in": date_in[open_lots],
+            "sold_value": (price_out * (quantity_in - quantity_left))[open_lots],
+            "date_out": date_out[open_lots],
+            "lot_id": journal.index.to_numpy(dtype="int64")[open_lots],
+        })
+
+    def _chunk_fills(self, chunk, columns, report, source):
+        fills = pd.DataFrame({name: chunk[column] for name, column in columns.items()})
+        fills["trade_id"] = fills["trade_id"].astype(str).str.strip()
+        hashes = trade_id_hashes(fills["trade_id"])
+        known = np.zeros(len(fills), dtype=bool)
+        if len(self.seen):
+            slots = np.minimum(np.searchsorted(self.seen, hashes), len(self.seen) - 1)
+            known = self.seen[slots] == hashes
+        # Repeated rows inside one export count once
+        known |= pd.Series(hashes).duplicated().to_numpy()
+        report.duplicates += int(known.sum())
+        fills = fills[~known]
+        self.seen = np.union1d(self.seen, hashes[~known])
+
+        when = pd.to_datetime(fills["trade_date"], format="mixed", dayfirst=True, errors="coerce")
+        if "trade_time" in fills:
+            # Execution time orders fills within a day; the journal keeps the date
+            fills["_at"] = pd.to_datetime(fills["trade_time"], format="mixed", dayfirst=True, errors="coerce").fillna(when)
+        else:
+            fills["_at"] = when
+        fills["trade_date"] = when.dt.normalize()
+        fills["side"] = fills["side"].astype(str).str.strip().str.lower().str[0]
+        fills["quantity"] = pd.to_numeric(fills["quantity"], errors="coerce").abs()
+        fills["price"] = pd.to_numeric(fills["price"], errors="coerce")
+        fills["symbol"] = fills["symbol"].astype(str).str.strip()
+        fills = fills.dropna(subset=["trade_date", "quantity", "price"])
+        fills = fills.sort_values("_at", kind="stable")
+
+        # Each chunk is sorted on its own, so a symbol's fills must not go
+        # back in time from one chunk to the next or FIFO would match them
+        # out of order
+        first = fills.groupby("symbol", sort=False)["_at"].min()
+        earlier = pd.Series(self.file_last, dtype="datetime64[ns]").reindex(first.index)
+        backwards = first[first < earlier]
+        if len(backwards):
+            raise TradebookError(f"{source}: fills of {', '.join(backwards.index[:5])} go back in time across "
+                                 f"chunks; sort the export by time or import it with a larger chunk size")
+        self.file_last.update(fills.groupby("symbol", sort=False)["_at"].max().to_dict())
+        return fills
+
+    def _apply(self, fills, report):
+        book = self.book
+        order_ids = fills["order_id"].astype(str).to_numpy() if "order_id" in fills else [None] * len(fills)
+        for symbol, side, quantity, price, day, at, order_id in zip(
+                fills["symbol"].to_numpy(), fills["side"].to_numpy(), fills["quantity"].to_numpy(dtype="float64"),
+                fills["price"].to_numpy(dtype="float64"), fills["trade_date"].to_numpy(dtype="datetime64[ns]"),
+                fills["_at"].to_numpy(dtype="datetime64[ns]"), order_ids):
+            last = book.last_fill.get(symbol)
+            if last is not None and day < last:
+                report.out_of_order += 1
+            book.last_fill[symbol] = day if last is None else max(last, day)
+            if side == "b":
+                report.buys += 1
+                key = (symbol, order_id) if order_id is not None else None
+                slot, opened = book.buy(symbol, quantity, price, day, self.order_lots.get(key), self.trade_base)
+                if key is not None:
+                    self.order_lots[key] = slot
+                report.lots_opened += opened
+            elif side == "s":
+                report.sells += 1
+                closed, unmatched = book.sell(symbol, quantity, price, day)
+                report.lots_closed += closed
+                if unmatched > 0:
+                    report.unmatched[symbol] = report.unmatched.get(symbol, 0) + unmatched
+
+    def import_files(self, sources):
+        """Import ``sources`` in order and save the lots they opened or touched.
+
+        Lots are written once ``flush_lots`` of them were touched, always
+        between chunks, together with the trade IDs read so far. A
+        TradebookError (a missing column, fills going back in time across
+        chunks) stops the import there; what was written before stays, and
+        importing again carries on after it.
+        """
+        report = ImportReport()
+        for source in sources:
+            report.files += 1
+            # The order ID only joins fills of one order within one export
+            self.order_lots = {}
+            self.file_last = {}
+            reader = pd.read_csv(source, chunksize=self.chunksize, dtype=str, skipinitialspace=True)
+            columns = None
+            for chunk in reader:
+                columns = columns or resolve_columns(chunk.columns)
+                report.fills += len(chunk)
+                self._apply(self._chunk_fills(chunk, columns, report, source), report)
+                if len(self.book.touched) >= self.flush_lots:
+                    self._save()
+        if self.book.touched:
+            self._save()
+        return report
+
+    def _save(self):
+        # New and changed lots only, appended to the edit log as one change set
+        book = self.book
+        slots = np.array(sorted(book.touched), dtype="int64")
+        lots = calculate_derived_columns(book.frame(slots).reindex(columns=JOURNAL_COLUMNS))
+        new = book.lot_id[slots] == NEW_LOT
+        book.lot_id[slots[new]] = self.store.upsert(lots[~new], lots[new])
+        moved = book.keep_open()
+        # Later fills of an order still open go to the lot's new slot
+        self.order_lots = {key: moved[slot] for key, slot in self.order_lots.items() if slot in moved}
+        # The IDs are recorded after the journal, so a crash in between means
+        # re-importing those fills rather than losing them
+        tmp = self.state_path.with_name(STATE_FILE + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, self.seen)
+        tmp.replace(self.state_path)
+
+
+def import_tradebooks(sources, journal, chunksize=DEFAULT_CHUNKSIZE, trade_base=None, flush_lots=FLUSH_LOTS):
+    return TradebookImporter(journal, chunksize, trade_base, flush_lots).import_files(sources)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import broker tradebook CSVs into a parquet journal")
+    parser.add_argument("tradebooks", nargs="+")
+    parser.add_argument("--journal", default="Broker_Journal.parquet")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--trade-base", help="trade_base given to newly imported lots")
+    args = parser.parse_args()
+    report = import_tradebooks([Path(p) for p in args.tradebooks], args.journal, args.chunksize, args.trade_base)
+    print(report.summary())
@@ -0,0 +1,195 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from tenacity import RetryError, Retrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+from src.live_data.price_store import PRICE_COLUMNS
+
+
+class FetchTimeout(Exception):
+    pass
+
+
+class TokenBucket:
+    """Blocking token bucket: ``rate`` requests per second, bursts up to ``capacity``."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# One bucket per upstream and limit for the whole process, so every session
+# and every BulkFetcher draws from the same allowance
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def shared_bucket(name, rate, capacity=None):
+    key = (name, float(rate), capacity)
+    with _buckets_lock:
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(rate, capacity)
+        return _buckets[key]
+
+
+class SimulatedFetcher:
+    """Fake fetcher with latency and failures, for exercising the pipeline offline.
+
+    Returns a random walk of daily bars unless an ``inner`` fetcher is given.
+    Symbols in ``fail_symbols`` always raise; others raise with probability
+    ``failure_rate`` and sleep ``hang`` seconds with probability ``hang_rate``.
+    """
+
+    name = "simulated"
+
+    def __init__(self, latency=0.2, jitter=0.1, failure_rate=0.0, hang_rate=0.0, hang=30.0,
+                 fail_symbols=(), inner=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.hang_rate = hang_rate
+        self.hang = hang
+        self.fail_symbols = set(fail_symbols)
+        self.inner = inner
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = []
+
+    def fetch(self, symbol, start, end):
+        with self._lock:
+            self.calls.append((symbol, start, end))
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fails = symbol in self.fail_symbols or self._random.random() < self.failure_rate
+            hangs = self._random.random() < self.hang_rate
+        time.sleep(self.hang if hangs else delay)
+        if fails:
+            raise ConnectionError(f"simulated failure fetching {symbol}")
+        if self.inner is not None:
+            return self.inner.fetch(symbol, start, end)
+        days = pd.bdate_range(start, end)
+        seed = sum(map(ord, symbol))
+        close = 100 + np.random.default_rng(seed).normal(0, 1, len(days)).cumsum()
+        return pd.DataFrame(dict(zip(PRICE_COLUMNS, [days.date, close, close + 1, close - 1, close, 1000])))
+
+
+@dataclass
+class FetchResult:
+    symbol: str
+    ok: bool
+    fetched: list = field(default_factory=list)
+    attempts: int = 0
+    seconds: float = 0.0
+    error: str = None
+
+
+class BulkFetcher:
+    """Brings the price store up to date for many symbols at once.
+
+    Symbols are fetched on a bounded thread pool; every request to the
+    fetcher first takes a token from a bucket shared by every fetcher of the
+    same upstream in this process, is retried up to ``retries`` times with
+    exponential backoff and jitter, and is abandoned after ``timeout``
+    seconds. A symbol that fails for any reason is reported in its result
+    instead of stopping the others.
+    """
+
+    def __init__(self, store, fetcher=None, max_workers=8, rate=4.0, burst=None,
+                 retries=3, timeout=20.0, backoff=0.5, bucket=None):
+        self.store = store
+        self.fetcher = fetcher or store.fetcher
+        self.max_workers = max_workers
+        self.bucket = bucket or shared_bucket(getattr(self.fetcher, "name", type(self.fetcher).__name__), rate, burst)
+        self.retries = retries
+        self.timeout = timeout
+        self.backoff = backoff
+        # Requests run here so a hung one can be given up on; its thread is
+        # left to finish in the background and its bars are never stored
+        self._requests = ThreadPoolExecutor(max_workers=max_workers * 2, thread_name_prefix="price-request")
+
+    def _request(self, symbol, start, end):
+        self.bucket.acquire()
+        future = self._requests.submit(self.fetcher.fetch, symbol, start, end)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise FetchTimeout(f"{symbol}: no response after {self.timeout:g}s") from None
+
+    def fetch_symbol(self, symbol, start, end=None):
+        began = time.perf_counter()
+        end = end or date.today()
+        attempts = 0
+        fetched = []
+        try:
+            for gap_start, gap_end in self.store.missing(symbol, start, end):
+                retrying = Retrying(
+                    # The first attempt plus `retries` more
+                    stop=stop_after_attempt(self.retries + 1),
+                    wait=wait_exponential_jitter(multiplier=self.backoff, max=self.backoff * 16),
+                    retry=retry_if_exception_type(Exception),
+                )
+                for attempt in retrying:
+                    with attempt:
+                        attempts += 1
+                        bars = self._request(symbol, gap_start, gap_end)
+                self.store.append(symbol, bars, gap_start, gap_end)
+                fetched.append((gap_start, gap_end))
+        except RetryError as error:
+            cause = error.last_attempt.exception()
+            return FetchResult(symbol, False, fetched, attempts, time.perf_counter() - began,
+                               f"{type(cause).__name__}: {cause}")
+        except Exception as error:
+            # Storing the bars (a malformed frame, a full disk) fails outside
+            # the retries; it still only fails this symbol
+            return FetchResult(symbol, False, fetched, attempts, time.perf_counter() - began,
+                               f"{type(error).__name__}: {error}")
+        return FetchResult(symbol, True, fetched, attempts, time.perf_counter() - began)
+
+    def run(self, symbols, start, end=None):
+        # Yields one FetchResult per distinct symbol, in completion order
+        symbols = list(dict.fromkeys(symbols))
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="price-symbol") as pool:
+            futures = [pool.submit(self.fetch_symbol, symbol, start, end) for symbol in symbols]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def close(self):
+        self._requests.shutdown(wait=False, cancel_futures=True)
+
+
+def refresh_latest_prices(store, symbols, lookback_days=10, on_result=None, **options):
+    # Bring the last few sessions of every symbol up to date concurrently and
+    # read their latest closes. on_result is called as each symbol finishes;
+    # symbols that fail keep whatever close is already stored.
+    start = date.today() - timedelta(days=lookback_days)
+    fetcher = BulkFetcher(store, **options)
+    failed = {}
+    try:
+        for result in fetcher.run(symbols, start):
+            if not result.ok:
+                failed[result.symbol] = result.error
+            if on_result is not None:
+                on_result(result)
+    finally:
+        fetcher.close()
+    return store.latest_close(symbols), failed
@@ -1,7 +1,14 @@
+import sys
+from datetime import date, timedelta
 
-from jugaad_data.nse import stock_df
-from datetime import date
+from src.live_data.price_store import open_price_store
 
-df = stock_df(symbol="SBIN", from_date=date(2024,9,23),
-            to_date=date(2024,9,27), series="EQ")
-print(df.head())
\ No newline at end of file
+# Fetches any missing daily bars for a symbol into the local price store and
+# prints them: python -m src.live_data.live_trading_data SBIN 30
+if __name__ == "__main__":
+    symbol = sys.argv[1] if len(sys.argv) > 1 else "SBIN"
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    store = open_price_store()
+    fetched = store.ensure(symbol, date.today() - timedelta(days=days))
+    print(f"fetched {len(fetched)} missing range(s)")
+    print(store.history(symbol, start=date.today() - timedelta(days=days)).tail(days))
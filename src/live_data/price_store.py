@@ -0,0 +1,242 @@
+import json
+import os
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.journal.edit_log import file_lock
+
+PRICE_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+PRICE_SCHEMA = pa.schema([
+    ("date", pa.date32()),
+    ("open", pa.float64()),
+    ("high", pa.float64()),
+    ("low", pa.float64()),
+    ("close", pa.float64()),
+    ("volume", pa.int64()),
+])
+DEFAULT_PRICE_DIR = Path("prices")
+MANIFEST_NAME = "_coverage.json"
+LOCK_NAME = "_coverage.lock"
+# A symbol refreshed every few minutes gains a segment each time; past this
+# many they're folded into one on the next append
+COMPACT_SEGMENTS = 16
+
+
+class JugaadFetcher:
+    """Daily OHLC from NSE through jugaad_data, imported on first use."""
+
+    name = "jugaad"
+
+    def __init__(self, series="EQ"):
+        self.series = series
+
+    def fetch(self, symbol, start, end):
+        from jugaad_data.nse import stock_df
+
+        raw = stock_df(symbol=symbol, from_date=start, to_date=end, series=self.series)
+        df = pd.DataFrame({
+            "date": pd.to_datetime(raw["DATE"]).dt.date,
+            "open": raw["OPEN"], "high": raw["HIGH"], "low": raw["LOW"], "close": raw["CLOSE"],
+            "volume": raw["VOLUME"],
+        })
+        return df
+
+
+class LocalFixtureFetcher:
+    """Reads <root>/<SYMBOL>.csv files with PRICE_COLUMNS, for offline use and tests.
+
+    Every call is recorded in ``calls`` so a caller can check which ranges
+    were actually requested.
+    """
+
+    name = "fixture"
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.calls = []
+
+    def fetch(self, symbol, start, end):
+        self.calls.append((symbol, start, end))
+        path = self.root / f"{symbol}.csv"
+        if not path.exists():
+            return pd.DataFrame(columns=PRICE_COLUMNS)
+        df = pd.read_csv(path, parse_dates=["date"])
+        df["date"] = df["date"].dt.date
+        return df[(df["date"] >= start) & (df["date"] <= end)]
+
+
+def _ordinal(value):
+    return pd.Timestamp(value).date().toordinal()
+
+
+def merge_ranges(ranges):
+    # Inclusive [start, end] ordinals; touching or overlapping ranges are joined
+    merged = []
+    for start, end in sorted(tuple(r) for r in ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+def missing_ranges(covered, start, end):
+    # Parts of [start, end] not inside any covered range
+    gaps = []
+    cursor = start
+    for lo, hi in merge_ranges(covered):
+        if hi < cursor:
+            continue
+        if lo > end:
+            break
+        if lo > cursor:
+            gaps.append((cursor, lo - 1))
+        cursor = max(cursor, hi + 1)
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class PriceStore:
+    """Append-only store of daily OHLC bars, one directory per symbol.
+
+    Each fetch is written as a new Arrow IPC segment next to a manifest of
+    the date ranges already fetched, whether or not they had any trading
+    days. Reads memory-map the segments, so only the columns asked for are
+    paged in, and later segments win where two overlap. Today is never marked
+    as covered, since its bar can still change.
+    """
+
+    def __init__(self, root=DEFAULT_PRICE_DIR, fetcher=None):
+        self.root = Path(root)
+        self.fetcher = fetcher or JugaadFetcher()
+
+    def _dir(self, symbol):
+        return self.root / symbol
+
+    def _manifest(self, symbol):
+        path = self._dir(symbol) / MANIFEST_NAME
+        if not path.exists():
+            return {"segments": [], "covered": [], "next_segment": 0}
+        return json.loads(path.read_text())
+
+    def _write_manifest(self, symbol, manifest):
+        path = self._dir(symbol) / MANIFEST_NAME
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, path)
+
+    def symbols(self):
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if (p / MANIFEST_NAME).exists())
+
+    def coverage(self, symbol):
+        return [(date.fromordinal(lo), date.fromordinal(hi)) for lo, hi in self._manifest(symbol)["covered"]]
+
+    def missing(self, symbol, start, end):
+        covered = self._manifest(symbol)["covered"]
+        return [(date.fromordinal(lo), date.fromordinal(hi))
+                for lo, hi in missing_ranges(covered, _ordinal(start), _ordinal(end))]
+
+    def _write_segment(self, symbol, manifest, bars):
+        # Segments are never rewritten; the manifest only ever points at
+        # complete files
+        bars = pd.DataFrame(bars)[PRICE_COLUMNS]
+        bars["date"] = pd.to_datetime(bars["date"]).dt.date
+        table = pa.Table.from_pandas(bars, schema=PRICE_SCHEMA, preserve_index=False)
+        name = f"segment-{manifest['next_segment']:05d}.arrow"
+        manifest["next_segment"] += 1
+        tmp = self._dir(symbol) / (name + ".tmp")
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, PRICE_SCHEMA) as writer:
+            writer.write_table(table)
+        os.replace(tmp, self._dir(symbol) / name)
+        return name
+
+    def _locked(self, symbol):
+        # Manifest read-modify-writes of one symbol take turns across sessions
+        # and processes, so two refreshes never claim the same segment name
+        self._dir(symbol).mkdir(parents=True, exist_ok=True)
+        return file_lock(self._dir(symbol) / LOCK_NAME)
+
+    def append(self, symbol, bars, start, end):
+        # Write one segment of bars and mark [start, end] as fetched, capped at
+        # yesterday so the current session is fetched again next time
+        with self._locked(symbol):
+            manifest = self._manifest(symbol)
+            if len(bars):
+                manifest["segments"].append(self._write_segment(symbol, manifest, bars))
+            last_final = min(_ordinal(end), date.today().toordinal() - 1)
+            if _ordinal(start) <= last_final:
+                manifest["covered"] = merge_ranges(manifest["covered"] + [(_ordinal(start), last_final)])
+            self._write_manifest(symbol, manifest)
+            if len(manifest["segments"]) > COMPACT_SEGMENTS:
+                self._fold(symbol, manifest)
+
+    def ensure(self, symbol, start, end=None):
+        # Fetch only the parts of [start, end] that haven't been fetched yet;
+        # returns the ranges that were requested from the fetcher
+        end = end or date.today()
+        gaps = self.missing(symbol, start, end)
+        for gap_start, gap_end in gaps:
+            self.append(symbol, self.fetcher.fetch(symbol, gap_start, gap_end), gap_start, gap_end)
+        return gaps
+
+    def _table(self, symbol, columns):
+        tables = []
+        for name in self._manifest(symbol)["segments"]:
+            source = pa.memory_map(str(self._dir(symbol) / name), "r")
+            tables.append(pa.ipc.open_file(source).read_all().select(columns))
+        if not tables:
+            return PRICE_SCHEMA.empty_table().select(columns)
+        return pa.concat_tables(tables)
+
+    def history(self, symbol, start=None, end=None, columns=None):
+        columns = list(columns or PRICE_COLUMNS)
+        read = columns if "date" in columns else ["date"] + columns
+        df = self._table(symbol, read).to_pandas(date_as_object=False)
+        # Later segments overwrite earlier ones for the same day
+        df = df.drop_duplicates("date", keep="last").sort_values("date", kind="stable")
+        if start is not None:
+            df = df[df["date"] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df["date"] <= pd.Timestamp(end)]
+        return df[columns].reset_index(drop=True)
+
+    def latest_close(self, symbols, as_of=None):
+        # Last close on or before as_of per symbol; symbols with no bars are NaN
+        closes = {}
+        for symbol in symbols:
+            bars = self.history(symbol, end=as_of, columns=["date", "close"])
+            closes[symbol] = bars["close"].iloc[-1] if len(bars) else np.nan
+        return pd.Series(closes, dtype="float64", name="close")
+
+    def _fold(self, symbol, manifest):
+        # Fold all segments into one, under the symbol's lock; the old ones are
+        # removed only after the manifest points at the new segment
+        old = manifest["segments"]
+        manifest["segments"] = [self._write_segment(symbol, manifest, self.history(symbol))]
+        self._write_manifest(symbol, manifest)
+        for name in old:
+            (self._dir(symbol) / name).unlink(missing_ok=True)
+
+    def compact(self, symbol):
+        with self._locked(symbol):
+            manifest = self._manifest(symbol)
+            if len(manifest["segments"]) >= 2:
+                self._fold(symbol, manifest)
+
+
+def default_fetcher():
+    # PRICE_FIXTURE_DIR points the app at local CSV fixtures instead of NSE
+    fixtures = os.environ.get("PRICE_FIXTURE_DIR")
+    return LocalFixtureFetcher(fixtures) if fixtures else JugaadFetcher()
+
+
+def open_price_store(root=DEFAULT_PRICE_DIR, fetcher=None):
+    return PriceStore(root, fetcher or default_fetcher())
+
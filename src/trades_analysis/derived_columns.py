@@ -0,0 +1,69 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from src.journal.schema import PRICE_DECIMALS
+
+# Columns calculate_derived_columns fills in from the ones typed into the journal
+DERIVED_COLUMNS = ["amount_in", "balance_left", "P/L (INR)", "P/L in %", "days_taken"]
+
+
+@lru_cache(maxsize=65536)
+def _parse_date_value(value):
+    # ISO dates are what the journal and st.data_editor produce; anything else
+    # is read day-first (23/02/2024) like the dates typed in the old sheets
+    parsed = pd.to_datetime(value, format="ISO8601", errors="coerce")
+    if pd.isna(parsed):
+        parsed = pd.to_datetime(value, dayfirst=True, errors="coerce")
+    return parsed
+
+
+def parse_dates(values):
+    values = pd.Series(values, copy=False)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    # Parse each distinct value once; journals repeat the same few hundred dates
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    parsed = pd.DatetimeIndex([_parse_date_value(str(v)) if not isinstance(v, pd.Timestamp) else v for v in uniques])
+    dates = parsed.take(codes, allow_fill=True, fill_value=pd.NaT) if len(parsed) else pd.DatetimeIndex([pd.NaT] * len(codes))
+    return pd.Series(dates, index=values.index, name=values.name)
+
+
+def _float_values(series):
+    values = pd.to_numeric(series, errors="coerce")
+    if values.dtype == "float32":
+        # Compact float32 prices go back to the decimals they were quoted at
+        return np.round(values.to_numpy(dtype="float64"), PRICE_DECIMALS)
+    return values.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def derived_values(price_in, quantity_in, quantity_left, price_out, date_in, date_out):
+    price_in = _float_values(price_in)
+    quantity_in = _float_values(quantity_in)
+    quantity_left = _float_values(quantity_left)
+    price_out = _float_values(price_out)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pl_percent = np.where(np.isnan(price_out), 0.0, (price_out - price_in) / price_in * 100)
+
+    days = (parse_dates(date_out) - parse_dates(date_in)).dt.days
+    return {
+        "amount_in": price_in * quantity_in,
+        "balance_left": price_in * quantity_left,
+        "P/L (INR)": (price_out - price_in) * (quantity_in - quantity_left),
+        "P/L in %": pl_percent,
+        "days_taken": days.fillna(0).to_numpy(dtype="int64"),
+    }
+
+
+def calculate_derived_columns(df):
+    # Whole-column replacement for the row-wise apply() the Save button used to run.
+    # Fills the columns in place and returns df, like the original helper.
+    df["date_in"] = parse_dates(df["date_in"])
+    df["date_out"] = parse_dates(df["date_out"])
+    values = derived_values(df["price_in"], df["quantity_in"], df["quantity_left"],
+                            df["price_out"], df["date_in"], df["date_out"])
+    for column, column_values in values.items():
+        df[column] = column_values
+    return df
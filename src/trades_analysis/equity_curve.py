@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+
+from src.trades_analysis.derived_columns import parse_dates
+
+# Points drawn per equity/drawdown trace; a decade of days is ~3650
+MAX_CHART_POINTS = 1500
+
+
+def _numbers(values):
+    return pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _day_offsets(dates, start):
+    return ((dates - start) // np.timedelta64(1, "D")).astype("int64")
+
+
+def daily_realized_pl(df, end=None):
+    """Realized P/L booked on every calendar day of the journal.
+
+    Spans the first entry to ``end`` (default: the last entry or exit). Each
+    booked row adds its "P/L (INR)" to its date_out, bucketed with one
+    bincount rather than a groupby.
+    """
+    date_in = parse_dates(df["date_in"]).to_numpy(dtype="datetime64[D]")
+    date_out = parse_dates(df["date_out"]).to_numpy(dtype="datetime64[D]")
+    pl = _numbers(df["P/L (INR)"])
+    booked = ~np.isnat(date_out) & ~np.isnan(pl)
+
+    known = np.concatenate([date_in[~np.isnat(date_in)], date_out[booked]])
+    if not len(known):
+        return pd.Series(dtype="float64", index=pd.DatetimeIndex([], name="date"), name="realized_pl")
+    start = known.min()
+    end = np.datetime64(pd.Timestamp(end), "D") if end is not None else known.max()
+    end = max(end, start)
+    days = np.arange(start, end + 1)
+
+    offsets = _day_offsets(date_out[booked], start)
+    kept = offsets <= len(days) - 1
+    pl_by_day = np.bincount(offsets[kept], weights=pl[booked][kept], minlength=len(days))
+    return pd.Series(pl_by_day, index=pd.DatetimeIndex(days, name="date"), name="realized_pl")
+
+
+def merge_daily_pl(parts):
+    # Daily P/L of several journals on one calendar; a day outside one
+    # journal's span counts as zero for it
+    parts = [part for part in parts if len(part)]
+    if not parts:
+        return pd.Series(dtype="float64", index=pd.DatetimeIndex([], name="date"), name="realized_pl")
+    start = min(np.datetime64(part.index[0], "D") for part in parts)
+    end = max(np.datetime64(part.index[-1], "D") for part in parts)
+    days = pd.DatetimeIndex(np.arange(start, end + 1), name="date")
+    return sum(part.reindex(days, fill_value=0.0) for part in parts).rename(parts[0].name)
+
+
+def _held_quantities(df):
+    # Per row: shares held from date_in to date_out (the ones sold) and from
+    # date_in on (the ones left). A sold quantity without a date_out is never counted
+    quantity_in = np.nan_to_num(_numbers(df["quantity_in"]))
+    quantity_left = np.clip(np.nan_to_num(_numbers(df["quantity_left"])), 0, quantity_in)
+    date_in = parse_dates(df["date_in"]).to_numpy(dtype="datetime64[D]")
+    date_out = parse_dates(df["date_out"]).to_numpy(dtype="datetime64[D]")
+    return quantity_in - quantity_left, quantity_left, date_in, date_out
+
+
+def held_symbols(df, start):
+    """Symbols with shares held on some day from ``start`` on, open or since sold."""
+    sold, left, date_in, date_out = _held_quantities(df)
+    start = np.datetime64(pd.Timestamp(start), "D")
+    held = ~np.isnat(date_in) & ((left > 0) | ((sold > 0) & (date_out > start)))
+    return sorted({str(s) for s in df.loc[held, "script_name"].dropna()})
+
+
+def daily_unrealized_pl(df, days, closes):
+    """Unrealized P/L of the shares held on each day, valued at that day's close.
+
+    ``closes`` maps script_name to a Series of closes indexed by date. Every
+    row holds its sold shares from date_in until date_out, when they turn
+    into realized P/L, and the shares still left from date_in on, so past
+    days value the trades open then rather than only today's. Held quantity
+    and cost per symbol are running sums of those entries and exits, a few
+    cumulative sums over a symbols x days matrix. Days before a symbol's
+    first stored close count the position at cost.
+    """
+    sold, left, date_in, date_out = _held_quantities(df)
+    start = days.to_numpy(dtype="datetime64[D]")[0] if len(days) else None
+    rows = ~np.isnat(date_in) & ((left > 0) | ((sold > 0) & ~np.isnat(date_out)))
+    if start is not None:
+        # Sold before the first day: never held on any of them
+        rows &= (left > 0) | (date_out > start)
+    symbols = df["script_name"].astype(str).to_numpy()[rows]
+    names, codes = np.unique(symbols, return_inverse=True)
+    if not len(names) or start is None:
+        return pd.Series(0.0, index=days, name="unrealized_pl")
+
+    price_in = _numbers(df["price_in"])[rows]
+    sold, left, date_in, date_out = sold[rows], left[rows], date_in[rows], date_out[rows]
+    # Shares and cost entering each (symbol, day) on date_in, and leaving on
+    # date_out for the sold ones; held from then on is the running sum
+    entries = np.clip(_day_offsets(date_in, start), 0, len(days) - 1)
+    exited = (sold > 0) & ~np.isnat(date_out)
+    exits = _day_offsets(date_out[exited], start)
+    in_range = exits <= len(days) - 1
+    cell = np.concatenate([codes * len(days) + entries, (codes[exited] * len(days) + np.maximum(exits, 0))[in_range]])
+    quantity = np.concatenate([sold * exited + left, -sold[exited][in_range]])
+    cost = quantity * np.concatenate([price_in, price_in[exited][in_range]])
+    size = len(names) * len(days)
+    held_quantity = np.bincount(cell, weights=quantity, minlength=size).reshape(len(names), -1).cumsum(axis=1)
+    held_cost = np.bincount(cell, weights=cost, minlength=size).reshape(len(names), -1).cumsum(axis=1)
+
+    close = np.full((len(names), len(days)), np.nan)
+    for row, name in enumerate(names):
+        series = closes.get(name)
+        if series is not None and len(series):
+            series = pd.Series(series, copy=False)
+            series.index = pd.DatetimeIndex(series.index).normalize()
+            close[row] = series[~series.index.duplicated(keep="last")].reindex(days, method="ffill").to_numpy()
+    value = np.where(np.isnan(close), held_cost, held_quantity * close)
+    return pd.Series((value - held_cost).sum(axis=0), index=days, name="unrealized_pl")
+
+
+def equity_curve(realized_pl, initial_amount, unrealized_pl=None):
+    """Daily equity with its running peak and drawdown.
+
+    ``realized_pl`` is the output of daily_realized_pl; ``unrealized_pl``,
+    aligned to the same days, marks open positions to market on top.
+    """
+    equity = initial_amount + realized_pl.to_numpy().cumsum()
+    if unrealized_pl is not None:
+        equity = equity + unrealized_pl.reindex(realized_pl.index, fill_value=0.0).to_numpy()
+    peak = np.maximum.accumulate(equity) if len(equity) else equity
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown_pct = np.where(peak > 0, (equity / peak - 1) * 100, 0.0)
+    return pd.DataFrame({
+        "equity": equity,
+        "peak": peak,
+        "drawdown": equity - peak,
+        "drawdown_pct": drawdown_pct,
+    }, index=realized_pl.index)
+
+
+def drawdown_stats(curve):
+    """Max drawdown with its peak, trough and recovery dates, and the longest time underwater."""
+    if curve.empty:
+        return {}
+    equity = curve["equity"].to_numpy()
+    peak = curve["peak"].to_numpy()
+    dates = curve.index
+    trough = int(np.argmin(curve["drawdown_pct"].to_numpy()))
+    # The peak is the last day the running max was set before the trough
+    at_peak = equity >= peak
+    last_peak = np.maximum.accumulate(np.where(at_peak, np.arange(len(equity)), 0))
+    peak_day = int(last_peak[trough])
+    recovered = np.flatnonzero(equity[trough:] >= peak[trough])
+    recovery_day = trough + int(recovered[0]) if len(recovered) else None
+    underwater = np.arange(len(equity)) - last_peak
+    longest = int(np.argmax(underwater))
+    return {
+        "max_drawdown": float(curve["drawdown"].iat[trough]),
+        "max_drawdown_pct": float(curve["drawdown_pct"].iat[trough]),
+        "peak_date": dates[peak_day],
+        "trough_date": dates[trough],
+        "recovery_date": dates[recovery_day] if recovery_day is not None else None,
+        "recovery_days": (dates[recovery_day] - dates[peak_day]).days if recovery_day is not None else None,
+        "longest_underwater_days": int(underwater[longest]),
+        "underwater_since": dates[last_peak[longest]] if underwater[longest] else None,
+    }
+
+
+def lttb(x, y, threshold=MAX_CHART_POINTS):
+    """Positions of the points kept by largest-triangle-three-buckets downsampling.
+
+    Points between the first and last are split into ``threshold - 2``
+    buckets, and each bucket keeps the point forming the largest triangle
+    with the previous bucket's average and the next bucket's average. Using
+    the previous average instead of the previously kept point makes every
+    bucket independent, so the whole selection is vectorized; peaks and
+    troughs survive the same way they do in the sequential algorithm.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    edges = np.linspace(1, n - 1, threshold - 1).astype("int64")
+    bucket = np.repeat(np.arange(threshold - 2), np.diff(edges))
+    inner = np.arange(1, n - 1)
+    counts = np.bincount(bucket, minlength=threshold - 2)
+    mean_x = np.bincount(bucket, weights=x[inner], minlength=threshold - 2) / counts
+    mean_y = np.bincount(bucket, weights=y[inner], minlength=threshold - 2) / counts
+    # Neighbouring anchors: the first/last point at the ends, bucket averages inside
+    prev_x = np.concatenate([[x[0]], mean_x[:-1]])[bucket]
+    prev_y = np.concatenate([[y[0]], mean_y[:-1]])[bucket]
+    next_x = np.concatenate([mean_x[1:], [x[-1]]])[bucket]
+    next_y = np.concatenate([mean_y[1:], [y[-1]]])[bucket]
+    area = np.abs((prev_x - next_x) * (y[inner] - prev_y) - (prev_x - x[inner]) * (next_y - prev_y))
+    # Buckets are contiguous, so each one's largest area is a reduceat; the
+    # first point reaching it is kept
+    best = np.maximum.reduceat(area, edges[:-1] - 1)
+    candidates = np.flatnonzero(area == best[bucket])
+    keep = candidates[np.r_[True, bucket[candidates][1:] != bucket[candidates][:-1]]]
+    return np.concatenate([[0], inner[keep], [n - 1]])
+
+
+def downsample(curve, column, threshold=MAX_CHART_POINTS):
+    index = lttb(curve.index.asi8, curve[column].to_numpy(), threshold)
+    return curve[column].iloc[index]
@@ -0,0 +1,113 @@
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from src.trades_analysis.equity_curve import downsample
+
+# Plotly figures behind the Profit Graph and Yearly Performance tabs. Nothing
+# here touches streamlit, so the same figures can be written into static
+# reports (python -m src.cli.report --format html --charts).
+LAYOUT = dict(
+    height=650,
+    margin=dict(t=100),
+    plot_bgcolor='rgba(0,0,0,0)',
+    paper_bgcolor='rgba(0,0,0,0)',
+    font=dict(color='#2c3e50', size=18),
+    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+)
+
+
+def _grid(fig):
+    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#e0e0e0')
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#e0e0e0')
+    return fig
+
+
+def profit_figure(profits):
+    # profits: period, P/L (INR), cumulative_profit
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=profits['period'],
+        y=profits['P/L (INR)'],
+        name='P/L',
+        text=profits['P/L (INR)'].apply(lambda x: f'₹{x:.2f}'),
+        textposition='inside',
+        marker_color=profits['P/L (INR)'].apply(lambda x: '#4CAF50' if x >= 0 else '#F44336')
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=profits['period'],
+        y=profits['cumulative_profit'],
+        name='Cumulative P/L',
+        mode='lines+markers+text',
+        line=dict(color='#FFA500', width=3),
+        marker=dict(size=8),
+        text=profits['cumulative_profit'].apply(lambda x: f'₹{x:.2f}'),
+        textposition='top center'
+    ))
+
+    fig.update_layout(xaxis_title='Period', yaxis_title='P/L (INR)', xaxis_tickangle=-45, **LAYOUT)
+    return _grid(fig)
+
+
+def trades_figure(trades):
+    # trades: month_in, total_trades, open_trades, booked_trades
+    fig_trades = go.Figure()
+    fig_trades.add_trace(go.Bar(
+        x=trades['month_in'],
+        y=trades['total_trades'],
+        name='Total Trades',
+        text=trades['total_trades'],
+        textposition='inside',
+        marker_color='#3366cc'
+    ))
+
+    fig_trades.add_trace(go.Bar(
+        x=trades['month_in'],
+        y=trades['open_trades'],
+        name='Open Trades',
+        text=trades['open_trades'],
+        textposition='inside',
+        marker_color='#FF6347'
+    ))
+
+    fig_trades.add_trace(go.Bar(
+        x=trades['month_in'],
+        y=trades['booked_trades'],
+        name='Booked Trades',
+        text=trades['booked_trades'],
+        textposition='inside',
+        marker_color='#4CAF50'
+    ))
+
+    fig_trades.update_layout(xaxis_title='Month', yaxis_title='Number of Trades', xaxis_tickangle=-45, **LAYOUT)
+    return _grid(fig_trades)
+
+
+def yearly_figure(yearly_profits):
+    # yearly_profits: year, P/L (INR)
+    fig_yearly = px.bar(yearly_profits, x='year', y='P/L (INR)', text='P/L (INR)')
+    fig_yearly.update_traces(texttemplate='%{text:.2s}', textposition='inside')
+    fig_yearly.update_layout(xaxis_title='Year', yaxis_title='P/L (INR)', xaxis_tickangle=-45, **LAYOUT)
+    return _grid(fig_yearly)
+
+
+def equity_figure(curve):
+    # Daily points are thinned with LTTB and drawn with WebGL traces, so a
+    # decade of days costs about as much as the monthly bars
+    equity = downsample(curve, "equity")
+    drawdown = downsample(curve, "drawdown_pct")
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3], vertical_spacing=0.04)
+    fig.add_trace(go.Scattergl(
+        x=equity.index, y=equity.to_numpy(), name='Equity', mode='lines',
+        line=dict(color='#3366cc', width=2)
+    ), row=1, col=1)
+    fig.add_trace(go.Scattergl(
+        x=drawdown.index, y=drawdown.to_numpy(), name='Drawdown %', mode='lines',
+        line=dict(color='#F44336', width=1), fill='tozeroy'
+    ), row=2, col=1)
+
+    fig.update_layout(**LAYOUT)
+    fig.update_yaxes(title_text='Equity (INR)', row=1, col=1)
+    fig.update_yaxes(title_text='Drawdown %', row=2, col=1)
+    return _grid(fig)
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+
+def _numbers(values):
+    return pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def open_positions(df):
+    # Rows with shares still held
+    return (pd.to_numeric(df["quantity_left"], errors="coerce") > 0).fillna(False).to_numpy()
+
+
+def open_position_rows(df):
+    return df.loc[open_positions(df)]
+
+
+def open_symbols(df):
+    return sorted({str(s) for s in df.loc[open_positions(df), "script_name"].dropna()})
+
+
+def mark_to_market(df, latest_prices):
+    """Value every open position at the latest close.
+
+    ``latest_prices`` maps script_name to a close price. Returns one row per
+    open trade with the close used, the market value of ``quantity_left`` and
+    the unrealized P/L against ``balance_left``; trades without a price get
+    NaN so they can be reported rather than counted as zero.
+    """
+    held = open_positions(df)
+    positions = df.loc[held, ["script_name", "trade_base", "quantity_left", "balance_left"]]
+    prices = pd.Series(latest_prices, dtype="float64")
+    symbols = positions["script_name"].astype(str).to_numpy()
+    lookup = prices.index.astype(str).get_indexer(symbols)
+    close = np.where(lookup >= 0, prices.to_numpy()[lookup], np.nan)
+
+    quantity_left = _numbers(positions["quantity_left"])
+    balance_left = _numbers(positions["balance_left"])
+    market_value = close * quantity_left
+    with np.errstate(divide="ignore", invalid="ignore"):
+        unrealized_percent = (market_value - balance_left) / balance_left * 100
+    return positions.assign(
+        close=close,
+        market_value=market_value,
+        **{"Unrealized P/L (INR)": market_value - balance_left, "Unrealized P/L in %": unrealized_percent},
+    )
+
+
+def unrealized_totals(marked):
+    priced = ~np.isnan(marked["close"].to_numpy())
+    return {
+        "unrealized_pl": float(marked["Unrealized P/L (INR)"].to_numpy()[priced].sum()),
+        "market_value": float(marked["market_value"].to_numpy()[priced].sum()),
+        "cost": float(_numbers(marked["balance_left"])[priced].sum()),
+        "priced": int(priced.sum()),
+        "unpriced": sorted(set(marked.loc[~priced, "script_name"].astype(str))),
+    }
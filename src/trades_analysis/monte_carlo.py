@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from src.trades_analysis.derived_columns import parse_dates
+
+PERCENTILES = [5, 50, 95]
+# Simulated trading years drawn from when building paths; large enough that
+# paths rarely repeat a year, small enough to build in a few milliseconds
+YEAR_POOL_SIZE = 20000
+# The pool draws about YEAR_POOL_SIZE x trades per year trade returns, so the
+# rate is capped to keep that within a few hundred MB
+MAX_TRADES_PER_YEAR = 500
+
+
+def journal_return_profile(df, initial_amount):
+    """What the journal says about returns, frequency and position size.
+
+    Returns the realized "P/L in %" of every booked trade, the number of
+    trades booked per year over the journal's span, and the average capital
+    put into one trade as a fraction of ``initial_amount``.
+    """
+    booked = parse_dates(df["date_out"]).notna().to_numpy()
+    returns = pd.to_numeric(df["P/L in %"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)[booked]
+    returns = returns[~np.isnan(returns)]
+
+    date_in = parse_dates(df["date_in"])
+    date_out = parse_dates(df["date_out"])
+    first, last = date_in.min(), max(date_out.max(), date_in.max())
+    span_years = max((last - first).days / 365.25, 1.0) if pd.notna(first) and pd.notna(last) else 1.0
+
+    amount_in = pd.to_numeric(df["amount_in"], errors="coerce")
+    capital_fraction = float(amount_in.mean() / initial_amount) if initial_amount and amount_in.notna().any() else 0.0
+    return returns, len(returns) / span_years, capital_fraction
+
+
+def simulate_growth(returns_pct, trades_per_year, initial_amount, years, capital_fraction,
+                    paths=50000, seed=0, pool_size=YEAR_POOL_SIZE):
+    """Percentile bands of the portfolio value over ``years`` years.
+
+    Each simulated year books a Poisson number of trades whose returns are
+    resampled from ``returns_pct``; a trade moves the portfolio by its
+    return times ``capital_fraction``. Years are first built into a pool of
+    yearly log-returns, then every path draws its years from that pool, so
+    the whole simulation is a handful of array operations however many paths
+    are asked for. Returns one row per year (0 is today) with a column per
+    percentile.
+    """
+    rng = np.random.default_rng(seed)
+    trade_log_returns = np.log1p(np.clip(np.asarray(returns_pct, dtype="float64") / 100 * capital_fraction, -0.999999, None))
+
+    counts = rng.poisson(trades_per_year, size=pool_size)
+    draws = rng.choice(trade_log_returns, size=int(counts.sum()))
+    year_pool = np.bincount(np.repeat(np.arange(pool_size), counts), weights=draws, minlength=pool_size)
+
+    log_growth = np.zeros((paths, years + 1))
+    np.cumsum(year_pool[rng.integers(0, pool_size, size=(paths, years))], axis=1, out=log_growth[:, 1:])
+    # Percentiles of the log are percentiles of the value; exp() only the bands
+    bands = np.percentile(log_growth, PERCENTILES, axis=0)
+    frame = pd.DataFrame({f"p{p}": initial_amount * np.exp(band) for p, band in zip(PERCENTILES, bands)})
+    frame.insert(0, "year", np.arange(years + 1))
+    return frame
@@ -0,0 +1,177 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+from src.trades_analysis.derived_columns import parse_dates
+
+# Months per bucket; every granularity is derived from one month ordinal
+GRANULARITIES = {"month": 1, "quarter": 3, "year": 12}
+
+
+def _readonly(values):
+    values = np.ascontiguousarray(values)
+    values.setflags(write=False)
+    return values
+
+
+def _period_label(ordinal, granularity):
+    if granularity == "month":
+        return f"{ordinal // 12}-{ordinal % 12 + 1:02d}"
+    if granularity == "quarter":
+        return f"{ordinal // 4}Q{ordinal % 4 + 1}"
+    return f"{ordinal}"
+
+
+def _month_ordinals(dates):
+    # year * 12 + month - 1, -1 where the date is missing
+    dates = parse_dates(dates)
+    ordinals = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype="float64", na_value=np.nan)
+    return np.where(np.isnan(ordinals), -1, ordinals).astype("int64")
+
+
+@dataclass(frozen=True)
+class PeriodTable:
+    """Aggregates of one granularity, one entry per period ordinal."""
+
+    granularity: str
+    periods: np.ndarray
+    realized_pl: np.ndarray
+    entered: np.ndarray
+    open: np.ndarray
+    booked: np.ndarray
+
+    def __post_init__(self):
+        # Arrays unpickled in another process come back writable
+        for name in ["periods", "realized_pl", "entered", "open", "booked"]:
+            getattr(self, name).setflags(write=False)
+
+    def __reduce__(self):
+        # Unpickling skips __init__ by default, and with it __post_init__
+        return PeriodTable, (self.granularity, self.periods, self.realized_pl, self.entered, self.open, self.booked)
+
+    @property
+    def labels(self):
+        return [_period_label(int(p), self.granularity) for p in self.periods]
+
+    def frame(self):
+        realized_pl = np.asarray(self.realized_pl)
+        return pd.DataFrame({
+            "period": self.labels,
+            "realized_pl": realized_pl,
+            "cumulative_pl": realized_pl.cumsum(),
+            "entered": self.entered,
+            "open": self.open,
+            "booked": self.booked,
+        })
+
+    def __add__(self, other):
+        # Counts and P/L are sums, so two journals' tables merge period by period
+        periods = np.union1d(self.periods, other.periods)
+        merged = {}
+        for name in ["realized_pl", "entered", "open", "booked"]:
+            left, right = getattr(self, name), getattr(other, name)
+            values = np.zeros(len(periods), dtype=np.result_type(left, right))
+            values[np.searchsorted(periods, self.periods)] += left
+            values[np.searchsorted(periods, other.periods)] += right
+            merged[name] = _readonly(values)
+        return PeriodTable(granularity=self.granularity, periods=_readonly(periods), **merged)
+
+    def profits(self):
+        # Periods with something booked, as plotted by the P/L charts
+        frame = self.frame()
+        return frame[frame["booked"] > 0].reset_index(drop=True)
+
+    def trades(self):
+        # Periods with trades entered, as plotted by the trade count chart
+        frame = self.frame()
+        return frame[frame["entered"] > 0].reset_index(drop=True)
+
+
+class PeriodCube:
+    """Realized P/L and entered/open/booked counts keyed by (granularity, period).
+
+    Built in one pass over the journal and never mutated afterwards, so the
+    same cube can be handed to every chart for as long as the journal is
+    unchanged.
+    """
+
+    def __init__(self, tables):
+        self._tables = MappingProxyType(dict(tables))
+
+    @classmethod
+    def from_frame(cls, df):
+        month_in = _month_ordinals(df["date_in"])
+        month_out = _month_ordinals(df["date_out"])
+        pl = pd.to_numeric(df["P/L (INR)"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        pl = np.nan_to_num(pl, nan=0.0)
+        is_open = pd.to_numeric(df["quantity_left"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan) > 0
+
+        has_in = month_in >= 0
+        has_out = month_out >= 0
+        tables = {}
+        for granularity, months in GRANULARITIES.items():
+            period_in = month_in // months
+            period_out = month_out // months
+            periods = np.union1d(period_in[has_in], period_out[has_out])
+            slot_in = np.searchsorted(periods, period_in[has_in])
+            slot_out = np.searchsorted(periods, period_out[has_out])
+            size = len(periods)
+            tables[granularity] = PeriodTable(
+                granularity=granularity,
+                periods=_readonly(periods),
+                realized_pl=_readonly(np.bincount(slot_out, weights=pl[has_out], minlength=size)),
+                entered=_readonly(np.bincount(slot_in, minlength=size)),
+                open=_readonly(np.bincount(slot_in, weights=is_open[has_in], minlength=size).astype("int64")),
+                booked=_readonly(np.bincount(slot_out, minlength=size)),
+            )
+        return cls(tables)
+
+    def __reduce__(self):
+        # The mapping proxy can't be pickled; rebuild it from the tables
+        return PeriodCube, (dict(self._tables),)
+
+    def __add__(self, other):
+        return PeriodCube({g: self._tables[g] + other._tables[g] for g in self._tables})
+
+    def table(self, granularity):
+        return self._tables[granularity]
+
+    def frame(self, granularity):
+        return self._tables[granularity].frame()
+
+    def get(self, granularity, period):
+        frame = self.frame(granularity)
+        row = frame[frame["period"] == str(period)]
+        if row.empty:
+            raise KeyError((granularity, period))
+        return row.iloc[0].to_dict()
+
+
+def build_period_cube(df):
+    return PeriodCube.from_frame(df)
+
+
+def merge_period_cubes(cubes):
+    cubes = list(cubes)
+    merged = cubes[0]
+    for cube in cubes[1:]:
+        merged = merged + cube
+    return merged
+
+
+def period_profits(cube, granularity):
+    # Realized P/L per period in the columns the profit charts use
+    return cube.table(granularity).profits().rename(columns={'realized_pl': 'P/L (INR)', 'cumulative_pl': 'cumulative_profit'})
+
+
+def period_trades(cube, granularity):
+    # Trades entered, still open and booked per period of entry
+    return cube.table(granularity).trades().rename(columns={
+        'period': 'month_in', 'entered': 'total_trades', 'open': 'open_trades', 'booked': 'booked_trades'
+    })
+
+
+def yearly_profits(cube):
+    return cube.table("year").profits().rename(columns={'period': 'year', 'realized_pl': 'P/L (INR)'})
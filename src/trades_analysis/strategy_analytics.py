@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+
+from src.trades_analysis.derived_columns import parse_dates
+
+# Running sums kept per trade_base; every windowed metric is a ratio of two of them
+SUM_FIELDS = ["trades", "wins", "pl", "gross_profit", "gross_loss", "days", "capital"]
+STRATEGY_METRICS = ["trades", "win_rate", "expectancy", "profit_factor", "avg_days", "capital_turnover"]
+# Windows offered in the comparison view, in days; None is the whole history
+DEFAULT_WINDOWS = {"30 days": 30, "90 days": 90, "180 days": 180, "1 year": 365, "All time": None}
+
+
+def _numbers(values):
+    return pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def booked_trades(df):
+    """One row per booked (or partly booked) trade with the values the sums are built from."""
+    # Trades without a base are left out, like in the per-base summaries
+    date_out = parse_dates(df["date_out"])
+    booked = (date_out.notna() & df["trade_base"].notna()).to_numpy()
+    pl = np.nan_to_num(_numbers(df["P/L (INR)"])[booked])
+    sold = _numbers(df["quantity_in"])[booked] - np.nan_to_num(_numbers(df["quantity_left"])[booked])
+    return pd.DataFrame({
+        "trade_base": df["trade_base"].astype(object)[booked].astype(str).to_numpy(),
+        "day": date_out[booked].to_numpy(dtype="datetime64[D]").astype("int64"),
+        "trades": 1.0,
+        "wins": (pl > 0).astype("float64"),
+        "pl": pl,
+        "gross_profit": np.clip(pl, 0, None),
+        "gross_loss": np.clip(-pl, 0, None),
+        "days": np.nan_to_num(_numbers(df["days_taken"])[booked]),
+        # Capital cycled through the trade: the cost of the shares sold
+        "capital": np.nan_to_num(_numbers(df["price_in"])[booked] * sold),
+    }, index=df.index[booked])
+
+
+def _metrics(sums, capital=None):
+    # sums: array (..., len(SUM_FIELDS)) of windowed sums
+    fields = dict(zip(SUM_FIELDS, np.moveaxis(sums, -1, 0)))
+    trades = fields["trades"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        profit_factor = np.where(fields["gross_loss"] > 0, fields["gross_profit"] / fields["gross_loss"],
+                                 np.where(fields["gross_profit"] > 0, np.inf, np.nan))
+        return {
+            "trades": trades,
+            "win_rate": fields["wins"] / trades * 100,
+            "expectancy": fields["pl"] / trades,
+            "profit_factor": profit_factor,
+            "avg_days": fields["days"] / trades,
+            "capital_turnover": fields["capital"] / capital if capital else np.full_like(trades, np.nan),
+        }
+
+
+class _BaseSeries:
+    """Booked trades of one base sorted by exit day, with prefix sums."""
+
+    def __init__(self, days, values):
+        self.days = days
+        self.prefix = np.vstack([np.zeros((1, len(SUM_FIELDS))), np.cumsum(values, axis=0)])
+
+    @classmethod
+    def from_rows(cls, rows):
+        rows = rows.sort_values("day", kind="stable")
+        return cls(rows["day"].to_numpy(), rows[SUM_FIELDS].to_numpy(dtype="float64"))
+
+    def extend(self, rows):
+        # Trades booked on or after the last exit only extend the prefix sums
+        rows = rows.sort_values("day", kind="stable")
+        values = rows[SUM_FIELDS].to_numpy(dtype="float64")
+        self.days = np.concatenate([self.days, rows["day"].to_numpy()])
+        self.prefix = np.vstack([self.prefix, self.prefix[-1] + np.cumsum(values, axis=0)])
+
+    def sums(self, start, end):
+        # Sums over exits in (start, end]; start/end are day numbers, broadcastable
+        lo = np.searchsorted(self.days, start, side="right")
+        hi = np.searchsorted(self.days, end, side="right")
+        return self.prefix[hi] - self.prefix[lo]
+
+
+class StrategyAnalytics:
+    """Rolling and expanding performance of every trade_base.
+
+    Each base keeps its booked trades sorted by date_out with prefix sums of
+    the counts, P/L, holding days and capital, so the metrics over any window
+    ending on any day are two binary searches and a subtraction. Comparing
+    many bases across many windows never goes back to the trades, and newly
+    booked trades extend the sums instead of rebuilding them.
+    """
+
+    def __init__(self, trades):
+        self.trades = trades
+        self.bases = {base: _BaseSeries.from_rows(rows) for base, rows in trades.groupby("trade_base", sort=True)}
+        self._hashes = np.sort(self._row_hashes(trades))
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(booked_trades(df))
+
+    @staticmethod
+    def _row_hashes(trades):
+        return pd.util.hash_pandas_object(trades, index=True).to_numpy()
+
+    @property
+    def last_day(self):
+        return max((series.days[-1] for series in self.bases.values() if len(series.days)), default=None)
+
+    def append(self, trades):
+        # Newly booked trades; a base that gets one dated before its latest
+        # exit is rebuilt, every other base just extends its sums
+        self.trades = pd.concat([self.trades, trades])
+        self._hashes = np.sort(np.concatenate([self._hashes, self._row_hashes(trades)]))
+        for base, rows in trades.groupby("trade_base", sort=False):
+            series = self.bases.get(base)
+            if series is not None and len(series.days) and rows["day"].min() >= series.days[-1]:
+                series.extend(rows)
+            else:
+                self.bases[base] = _BaseSeries.from_rows(self.trades[self.trades["trade_base"] == base])
+        # New bases take their sorted place, as in a fresh build
+        self.bases = dict(sorted(self.bases.items()))
+        return self
+
+    def sync(self, df):
+        """Bring the engine up to date with a newer version of the journal.
+
+        Booked trades the engine hasn't seen are appended; if any it has seen
+        changed or disappeared, it is rebuilt. Returns the engine to use.
+        """
+        return self.sync_trades(booked_trades(df))
+
+    def sync_trades(self, trades):
+        # sync() for booked_trades() already built, e.g. per journal
+        hashes = self._row_hashes(trades)
+        seen = np.zeros(len(hashes), dtype=bool)
+        if len(self._hashes):
+            slots = np.minimum(np.searchsorted(self._hashes, hashes), len(self._hashes) - 1)
+            seen = self._hashes[slots] == hashes
+        if seen.sum() != len(self._hashes):
+            return StrategyAnalytics(trades)
+        return self.append(trades[~seen]) if (~seen).any() else self
+
+    def _window_sums(self, base, window, as_of):
+        as_of = np.asarray(as_of, dtype="int64")
+        start = np.iinfo("int64").min if window is None else as_of - window
+        return self.bases[base].sums(start, as_of)
+
+    def window(self, base, window=None, as_of=None, capital=None):
+        # Metrics of one base over the `window` days up to as_of (default: the last exit)
+        as_of = self.last_day if as_of is None else _day_number(as_of)
+        return {name: float(value) for name, value in _metrics(self._window_sums(base, window, as_of), capital).items()}
+
+    def rolling(self, base, window=None, capital=None):
+        """Metrics of one base as of each of its exits, over the trailing window.
+
+        With window=None the metrics are expanding. All exits are evaluated in
+        one vectorized pass over the prefix sums.
+        """
+        series = self.bases[base]
+        metrics = _metrics(self._window_sums(base, window, series.days), capital)
+        return pd.DataFrame(metrics, index=pd.DatetimeIndex(series.days.astype("datetime64[D]"), name="date_out"))
+
+    def compare(self, windows=None, as_of=None, capital=None, bases=None):
+        """One row per base, a column per (metric, window) over windows ending as_of."""
+        windows = DEFAULT_WINDOWS if windows is None else windows
+        bases = list(self.bases) if bases is None else [b for b in bases if b in self.bases]
+        as_of = self.last_day if as_of is None else _day_number(as_of)
+        columns = {}
+        for label, window in windows.items():
+            sums = np.array([self._window_sums(base, window, as_of) for base in bases]).reshape(len(bases), -1)
+            for name, values in _metrics(sums, capital).items():
+                columns[(name, label)] = values
+        table = pd.DataFrame(columns, index=pd.Index(bases, name="trade_base"))
+        table.columns = pd.MultiIndex.from_tuples(table.columns, names=["metric", "window"])
+        return table
+
+    def rank(self, metric, window_label, windows=None, as_of=None, capital=None, min_trades=1):
+        # Bases ordered by one metric over one window; bases with too few trades go last
+        table = self.compare({window_label: (windows or DEFAULT_WINDOWS)[window_label]}, as_of, capital)
+        table = table.droplevel("window", axis=1)
+        eligible = table["trades"] >= min_trades
+        return pd.concat([table[eligible].sort_values(metric, ascending=False, kind="stable"), table[~eligible]])
+
+
+def _day_number(value):
+    return np.datetime64(pd.Timestamp(value), "D").astype("int64")
+
+
+def build_strategy_analytics(df):
+    return StrategyAnalytics.from_frame(df)
@@ -0,0 +1,89 @@
+import numpy as np
+import plotly.graph_objects as go
+import streamlit as st
+from src.trades_analysis.strategy_analytics import DEFAULT_WINDOWS, STRATEGY_METRICS, build_strategy_analytics
+from src.instrumentation.spans import span, timed
+
+METRIC_LABELS = {
+    "trades": "Trades",
+    "win_rate": "Win rate %",
+    "expectancy": "Expectancy (INR)",
+    "profit_factor": "Profit factor",
+    "avg_days": "Avg days held",
+    "capital_turnover": "Capital turnover",
+}
+METRIC_FORMATS = {
+    "trades": "{:.0f}",
+    "win_rate": "{:.1f}%",
+    "expectancy": "₹{:,.2f}",
+    "profit_factor": "{:.2f}",
+    "avg_days": "{:.1f}",
+    "capital_turnover": "{:.2f}x",
+}
+
+
+@timed("strategy_performance")
+def strategy_performance(df, initial_amount, analytics=None):
+    st.subheader("Strategy Performance")
+    st.caption("Booked trades per trade base over windows ending on the latest exit. "
+               "Capital turnover is the cost of the shares sold relative to the total investment.")
+
+    # Every window of every base is a lookup into the same prefix sums
+    if analytics is None:
+        analytics = build_strategy_analytics(df)
+    if not analytics.bases:
+        st.info("No booked trades with a trade base yet")
+        return
+
+    col1, col2, col3, col4 = st.columns([2, 1.2, 1.2, 1])
+    with col1:
+        labels = st.multiselect("Windows", list(DEFAULT_WINDOWS), default=list(DEFAULT_WINDOWS), key="strategy_windows")
+    labels = labels or ["All time"]
+    with col2:
+        rank_metric = st.selectbox("Rank by", STRATEGY_METRICS, index=STRATEGY_METRICS.index("expectancy"),
+                                   format_func=METRIC_LABELS.get, key="strategy_rank_metric")
+    with col3:
+        rank_window = st.selectbox("Over", labels, index=len(labels) - 1, key="strategy_rank_window")
+    with col4:
+        min_trades = st.number_input("Min trades", min_value=1, value=3, key="strategy_min_trades")
+
+    with span("strategy_performance.table"):
+        ranked = analytics.rank(rank_metric, rank_window, capital=initial_amount, min_trades=min_trades)
+        table = analytics.compare({label: DEFAULT_WINDOWS[label] for label in labels}, capital=initial_amount)
+        table = table.loc[ranked.index]
+        formats = {f"{METRIC_LABELS[metric]} · {window}": METRIC_FORMATS[metric] for metric, window in table.columns}
+        table.columns = list(formats)
+        st.dataframe(table.style.format(formats, na_rep="–"), use_container_width=True)
+
+    st.divider()
+    st.subheader("Rolling " + METRIC_LABELS[rank_metric])
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        bases = st.multiselect("Trade bases", list(analytics.bases), default=list(ranked.index[:4]), key="strategy_rolling_bases")
+    with col2:
+        rolling_label = st.selectbox("Window", list(DEFAULT_WINDOWS), index=list(DEFAULT_WINDOWS).index("90 days"),
+                                     key="strategy_rolling_window")
+
+    # One point per exit of each base, all evaluated in one pass per base
+    with span("strategy_performance.rolling_chart"):
+        fig = go.Figure()
+        for base in bases:
+            rolling = analytics.rolling(base, DEFAULT_WINDOWS[rolling_label], capital=initial_amount)
+            values = rolling[rank_metric].replace([np.inf, -np.inf], np.nan)
+            fig.add_trace(go.Scattergl(x=rolling.index, y=values.to_numpy(), name=base, mode='lines+markers',
+                                       marker=dict(size=5)))
+
+        fig.update_layout(
+            xaxis_title='Exit date',
+            yaxis_title=METRIC_LABELS[rank_metric],
+            height=550,
+            margin=dict(t=100),
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#2c3e50', size=18),
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+        )
+        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#e0e0e0')
+        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#e0e0e0')
+
+        st.plotly_chart(fig, use_container_width=True)
@@ -0,0 +1,276 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from src.journal.schema import widen_prices
+from src.trades_analysis.derived_columns import calculate_derived_columns
+
+TOTAL_FIELDS = ["total_trades", "open_trades", "partially_booked_trades",
+                "total_profit_loss", "total_balance_left", "total_amount_in"]
+BASE_FIELDS = ["P/L (INR)", "trades", "open_trades"]
+
+
+def _numeric(series):
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+class SummaryMetrics:
+    """Totals behind the Trade Summaries metrics, kept as additive state.
+
+    Metrics of two disjoint sets of rows add up to the metrics of their
+    union, so rows can be added, removed (subtracted) or merged across
+    journals without going back to the full frame.
+    """
+
+    def __init__(self, totals=None, by_base=None):
+        self.totals = dict.fromkeys(TOTAL_FIELDS, 0.0) if totals is None else dict(totals)
+        self.by_base = pd.DataFrame(columns=BASE_FIELDS, dtype="float64") if by_base is None else by_base
+
+    @classmethod
+    def from_frame(cls, df):
+        quantity_left = _numeric(df["quantity_left"])
+        quantity_in = _numeric(df["quantity_in"])
+        is_open = quantity_left > 0
+        is_partial = is_open & (quantity_left < quantity_in)
+        pl = _numeric(df["P/L (INR)"])
+        totals = {
+            "total_trades": float(len(df)),
+            "open_trades": float(is_open.sum()),
+            "partially_booked_trades": float(is_partial.sum()),
+            "total_profit_loss": float(np.nansum(pl)),
+            "total_balance_left": float(np.nansum(_numeric(df["balance_left"]))),
+            "total_amount_in": float(np.nansum(_numeric(df["amount_in"]))),
+        }
+        trade_base = df["trade_base"].astype(object)
+        by_base = pd.DataFrame({
+            "trade_base": trade_base.where(trade_base.isna(), trade_base.astype(str)).to_numpy(),
+            "P/L (INR)": np.nan_to_num(pl),
+            "trades": 1.0,
+            "open_trades": is_open.astype("float64"),
+        }).groupby("trade_base").sum()
+        by_base.index.name = None
+        return cls(totals, by_base)
+
+    def _combine(self, other, sign):
+        totals = {k: self.totals[k] + sign * other.totals[k] for k in TOTAL_FIELDS}
+        by_base = self.by_base.add(sign * other.by_base, fill_value=0)
+        by_base = by_base[by_base["trades"] > 0.5]
+        return SummaryMetrics(totals, by_base)
+
+    def __add__(self, other):
+        return self._combine(other, 1)
+
+    def __sub__(self, other):
+        return self._combine(other, -1)
+
+    @property
+    def total_trades(self):
+        return int(round(self.totals["total_trades"]))
+
+    @property
+    def open_trades(self):
+        return int(round(self.totals["open_trades"]))
+
+    @property
+    def partially_booked_trades(self):
+        return int(round(self.totals["partially_booked_trades"]))
+
+    @property
+    def total_profit_loss(self):
+        return self.totals["total_profit_loss"]
+
+    @property
+    def total_balance_left(self):
+        return self.totals["total_balance_left"]
+
+    @property
+    def total_amount_in(self):
+        return self.totals["total_amount_in"]
+
+    @property
+    def closed_trades(self):
+        return self.total_trades - self.open_trades
+
+    def trade_base_profits(self):
+        # Same shape the summaries tab used to build with groupby().agg()
+        return self.by_base.sort_values("P/L (INR)", ascending=False)
+
+    def trade_base_counts(self, exclude=()):
+        counts = self.by_base.loc[~self.by_base.index.isin(exclude), "trades"].round().astype(int)
+        return counts[counts > 0].sort_values(ascending=False, kind="stable")
+
+    def open_trades_by_base(self):
+        return self.by_base["open_trades"].round().astype(int)
+
+    def matches(self, other, rtol=1e-9, atol=1e-6):
+        if not all(np.isclose(self.totals[k], other.totals[k], rtol=rtol, atol=atol) for k in TOTAL_FIELDS):
+            return False
+        left = self.by_base.sort_index()
+        right = other.by_base.sort_index()
+        return left.index.equals(right.index) and np.allclose(left[BASE_FIELDS], right[BASE_FIELDS], rtol=rtol, atol=atol)
+
+
+def summary_totals(metrics, initial_amount):
+    # Headline numbers of the Trade Summaries tab, as plain values
+    total_profit_loss = metrics.total_profit_loss
+    total_balance_left = metrics.total_balance_left
+    total_amount_in = metrics.total_amount_in
+    return {
+        "total_trades": metrics.total_trades,
+        "open_trades": metrics.open_trades,
+        "closed_trades": metrics.closed_trades,
+        "partially_booked_trades": metrics.partially_booked_trades,
+        "total_profit_loss": total_profit_loss,
+        "total_balance_left": total_balance_left,
+        "total_amount_in": total_amount_in,
+        "profit_loss_percent_balance": (total_profit_loss / total_balance_left) * 100 if total_balance_left != 0 else 0,
+        "profit_loss_percent_circulated": (total_profit_loss / total_amount_in) * 100 if total_amount_in != 0 else 0,
+        "profit_loss_percent_invested": (total_profit_loss / initial_amount) * 100 if initial_amount else 0,
+    }
+
+
+def _normalize_changes(changes):
+    changes = changes or {}
+    return {
+        "edited_rows": {int(pos): dict(values) for pos, values in changes.get("edited_rows", {}).items()},
+        "added_rows": [dict(row) for row in changes.get("added_rows", [])],
+        "deleted_rows": sorted({int(pos) for pos in changes.get("deleted_rows", [])}),
+    }
+
+
+def shift_change_set(changes, offset):
+    # Change set of an editor showing rows offset.. of the journal, in
+    # positions of the whole journal
+    changes = _normalize_changes(changes)
+    if offset:
+        changes["edited_rows"] = {pos + offset: values for pos, values in changes["edited_rows"].items()}
+        changes["deleted_rows"] = [pos + offset for pos in changes["deleted_rows"]]
+    return changes
+
+
+def _rows_frame(records, columns):
+    frame = pd.DataFrame.from_records(records, columns=columns) if records else pd.DataFrame(columns=columns)
+    # Edited rows are summarized the way Save Data would store them
+    return calculate_derived_columns(frame) if len(frame) else frame
+
+
+def changed_rows(df, positions, edited_rows):
+    records = widen_prices(df.iloc[list(positions)]).to_dict("records")
+    for record, pos in zip(records, positions):
+        record.update(edited_rows.get(pos, {}))
+    return _rows_frame(records, df.columns)
+
+
+def apply_change_set(df, changes):
+    # Materialize an st.data_editor change set on top of the frame it edits
+    changes = _normalize_changes(changes)
+    # Positions past the end belong to a change set of another version of the
+    # journal; there is no row left for them to change
+    edited = {pos: values for pos, values in changes["edited_rows"].items() if 0 <= pos < len(df)}
+    deleted = {pos for pos in changes["deleted_rows"] if 0 <= pos < len(df)}
+    edited_positions = [pos for pos in sorted(edited) if pos not in deleted]
+    # Rows typed into the editor are float64; the untouched ones join them at
+    # their quoted prices
+    df = widen_prices(df)
+    keep = np.ones(len(df), dtype=bool)
+    keep[list(deleted | set(edited_positions))] = False
+    parts = [df[keep], changed_rows(df, edited_positions, edited), _rows_frame(changes["added_rows"], df.columns)]
+    # Edited rows stay where they were and added ones go last, like the
+    # frame the editor returns
+    order = [np.flatnonzero(keep), np.array(edited_positions, dtype="int64"),
+             len(df) + np.arange(len(changes["added_rows"]))]
+    parts, order = [part for part in parts if len(part)], [o for part, o in zip(parts, order) if len(part)]
+    if not parts:
+        return df.iloc[:0].reset_index(drop=True)
+    with warnings.catch_warnings():
+        # Rows typed into the editor often leave whole columns empty
+        warnings.simplefilter("ignore", FutureWarning)
+        frame = pd.concat(parts, ignore_index=True)
+    return frame.iloc[np.argsort(np.concatenate(order), kind="stable")].reset_index(drop=True)
+
+
+class IncrementalSummary:
+    """SummaryMetrics of a journal plus the editor's pending change set.
+
+    sync() receives the data editor's cumulative change set on every rerun
+    and applies only what differs from the previously applied one: rows whose
+    edits changed are subtracted with their old values and added back with
+    the new ones. Large or malformed change sets fall back to a full rebuild.
+    """
+
+    def __init__(self, df, version=None, rebuild_ratio=0.25):
+        self.df = df
+        self.version = version
+        self.rebuild_ratio = rebuild_ratio
+        self.applied = _normalize_changes(None)
+        self.metrics = SummaryMetrics.from_frame(df)
+        self.rebuilds = 1
+        self.rows_applied = 0
+        self._edited = (None, {})
+
+    @property
+    def pending_changes(self):
+        return len(self.applied["edited_rows"]) + len(self.applied["added_rows"]) + len(self.applied["deleted_rows"])
+
+    def _row_state(self, changes, pos):
+        if pos in changes["deleted_rows"]:
+            return "deleted"
+        return changes["edited_rows"].get(pos)
+
+    def _rows_metrics(self, changes, positions):
+        # Untouched rows count with their stored values, edited ones re-derived
+        untouched = [pos for pos in positions if self._row_state(changes, pos) is None]
+        edited = [pos for pos in positions if isinstance(self._row_state(changes, pos), dict)]
+        return (SummaryMetrics.from_frame(self.df.iloc[untouched])
+                + SummaryMetrics.from_frame(changed_rows(self.df, edited, changes["edited_rows"])))
+
+    def rebuild(self, changes=None):
+        self.applied = _normalize_changes(changes)
+        self.metrics = SummaryMetrics.from_frame(apply_change_set(self.df, self.applied))
+        self.rebuilds += 1
+        return self.metrics
+
+    def sync(self, changes):
+        new = _normalize_changes(changes)
+        old = self.applied
+        touched = set(old["edited_rows"]) | set(old["deleted_rows"]) | set(new["edited_rows"]) | set(new["deleted_rows"])
+        if any(pos < 0 or pos >= len(self.df) for pos in touched):
+            return self.rebuild(new)
+
+        stale = sorted(pos for pos in touched if self._row_state(old, pos) != self._row_state(new, pos))
+        first_added = 0
+        while (first_added < min(len(old["added_rows"]), len(new["added_rows"]))
+               and old["added_rows"][first_added] == new["added_rows"][first_added]):
+            first_added += 1
+        delta_rows = len(stale) + len(old["added_rows"]) + len(new["added_rows"]) - 2 * first_added
+        if delta_rows == 0:
+            self.applied = new
+            return self.metrics
+        if delta_rows > self.rebuild_ratio * max(len(self.df), 1):
+            return self.rebuild(new)
+
+        metrics = self.metrics - self._rows_metrics(old, stale) + self._rows_metrics(new, stale)
+        metrics = (metrics
+                   - SummaryMetrics.from_frame(_rows_frame(old["added_rows"][first_added:], self.df.columns))
+                   + SummaryMetrics.from_frame(_rows_frame(new["added_rows"][first_added:], self.df.columns)))
+        self.metrics = metrics
+        self.applied = new
+        self.rows_applied += delta_rows
+        return self.metrics
+
+    def edited_derived(self, name, builder):
+        # builder(journal with the pending change set applied), built once per
+        # change set so views next to the totals show the same unsaved edits
+        applied, derived = self._edited
+        if applied != self.applied:
+            derived = {}
+            self._edited = (self.applied, derived)
+        if name not in derived:
+            derived[name] = builder(apply_change_set(self.df, self.applied))
+        return derived[name]
+
+    def verify(self):
+        # Consistency check against a full recompute of the edited journal
+        full = SummaryMetrics.from_frame(apply_change_set(self.df, self.applied))
+        return self.metrics.matches(full)
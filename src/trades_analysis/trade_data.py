@@ -1,72 +1,121 @@
+import math
+
 import pandas as pd
 import streamlit as st
 from pathlib import Path
 import os
+from src.journal.store import open_journal_store
+from src.journal.edit_log import EditLogJournalStore
+from src.journal.schema import editable_frame
+from src.journal.cache import journal_cache
+from src.trades_analysis.derived_columns import calculate_derived_columns
+from src.trades_analysis.summary_metrics import apply_change_set, shift_change_set
+from src.trades_analysis.trade_grid import trade_grid
+from src.instrumentation.spans import span, timed
+
+DEFAULT_INITIAL_AMOUNT = 1000000
+# Rows the editor sends to the browser at a time
+EDITOR_PAGE_SIZES = [100, 250, 500, 1000]
+EDITOR_KEY = "journal_editor"
+# First journal position shown in the editor, for mapping its change set
+EDITOR_OFFSET_KEY = "journal_editor_offset"
+
+
+def editor_changes():
+    # The editor's unsaved change set, in positions of the whole journal
+    return shift_change_set(st.session_state.get(EDITOR_KEY), st.session_state.get(EDITOR_OFFSET_KEY, 0))
+
+
+def editor_window(rows, key=EDITOR_KEY):
+    # Contiguous page of the journal the editor shows, the newest by default.
+    # The page can't change while there are unsaved edits: the editor would
+    # start over on the new rows and drop them
+    changes = st.session_state.get(key) or {}
+    pending = any(changes.get(part) for part in ["edited_rows", "added_rows", "deleted_rows"])
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        page_size = st.selectbox("Rows in editor", EDITOR_PAGE_SIZES, index=1, key=f"{key}_page_size",
+                                 disabled=pending)
+    pages = max(1, math.ceil(rows / page_size))
+    if st.session_state.get(f"{key}_page", pages) > pages or f"{key}_page" not in st.session_state:
+        st.session_state[f"{key}_page"] = pages
+    with col2:
+        page = st.number_input("Editor page", min_value=1, max_value=pages, key=f"{key}_page", disabled=pending,
+                               help="Save or undo the unsaved edits to move to another page" if pending else None)
+    start = (min(page, pages) - 1) * page_size
+    stop = min(start + page_size, rows)
+    with col3:
+        st.caption(f"Editing rows {start + 1 if rows else 0}–{stop} of {rows}; new rows are added to the journal's end")
+    return start, stop
+
+@timed("trade_data")
+def trade_data(df, journal):
+    store = open_journal_store(journal)
 
-def trade_data(df, csv_file):
-    # Function to calculate derived columns
-    def calculate_derived_columns(df):
-        # Convert date_in and date_out to datetime if they're not already
-        df['date_in'] = pd.to_datetime(df['date_in'], format='%d/%m', errors='coerce')
-        df['date_out'] = pd.to_datetime(df['date_out'], format='%d/%m', errors='coerce')
-        df["amount_in"] = df["price_in"] * df["quantity_in"]
-        df["balance_left"] = df["price_in"] * df["quantity_left"]
-        df["P/L (INR)"] = (df["price_out"] - df["price_in"]) * (df["quantity_in"] - df["quantity_left"])
-        df["P/L in %"] = df.apply(lambda row: 0 if pd.isna(row["price_out"]) else 
-                                        ((row["price_out"] - row["price_in"]) / row["price_in"]) * 100, axis=1)
-        df["days_taken"] = df.apply(lambda row: 0 if pd.isna(row["date_out"]) or pd.isna(row["date_in"]) else 
-                                    (row["date_out"] - row["date_in"]).days, axis=1)
-        return df
-    
     st.subheader("Amount Invested")
     
-    initial_amount = st.number_input("Initial Amount Invested (INR)", min_value=0, value=1000000)
+    # Kept outside the widget's state so the other sections can read it
+    # even on reruns where this one isn't rendered
+    initial_amount = st.number_input("Initial Amount Invested (INR)", min_value=0,
+                                     value=st.session_state.get("initial_amount", DEFAULT_INITIAL_AMOUNT))
+    st.session_state["initial_amount"] = initial_amount
     st.metric("Initial Amount Invested", f"₹{initial_amount}", delta=None, delta_color="off")
 
     st.divider()
     st.subheader("Add/Edit Data")
 
-    edited_df = st.data_editor(
-        df,
-        # hide_index=True,
-        num_rows="dynamic",
-        use_container_width=True,
-        column_config={
-            "trade_base": st.column_config.TextColumn(width="small"),
-            "price_in": st.column_config.NumberColumn(width="small", format="₹%.2f"),
-            "quantity_in": st.column_config.NumberColumn(width="small"),
-            "amount_in": st.column_config.NumberColumn(width="small", format="₹%.2f"),
-            "quantity_left": st.column_config.NumberColumn(width="small"),
-            "balance_left": st.column_config.NumberColumn(width="small", format="₹%.2f"),
-            "date_in": st.column_config.DateColumn(width="small"),
-            "date_out": st.column_config.DateColumn(width="small"),
-            "price_out": st.column_config.NumberColumn(width="small", format="₹%.2f"),
-            "P/L (INR)": st.column_config.NumberColumn(width="small", format="₹%.2f"),
-            "P/L in %": st.column_config.NumberColumn(width="small", format="%.2f%%"),
-            "days_taken": st.column_config.NumberColumn(width="small"),
-        }
-    )
-
-    def highlight_survived(df):
-        if df["quantity_left"] == 0:
-            return ['background-color: #8ef05d']*len(df)
-        elif df["quantity_left"] < df["quantity_in"]:
-            return ['background-color: lightblue']*len(df)
-        else:
-            return ['background-color: pink']*len(df)
+    # Only a page of the journal goes to the browser; its change set is mapped
+    # back to journal positions for the totals and the save
+    start, stop = editor_window(len(df))
+    st.session_state[EDITOR_OFFSET_KEY] = start
+    with span("trade_data.editor"):
+        st.data_editor(
+            editable_frame(df.iloc[start:stop]),
+            key=EDITOR_KEY,
+            # hide_index=True,
+            num_rows="dynamic",
+            use_container_width=True,
+            column_config={
+                "trade_base": st.column_config.TextColumn(width="small"),
+                "price_in": st.column_config.NumberColumn(width="small", format="₹%.2f"),
+                "quantity_in": st.column_config.NumberColumn(width="small"),
+                "amount_in": st.column_config.NumberColumn(width="small", format="₹%.2f"),
+                "quantity_left": st.column_config.NumberColumn(width="small"),
+                "balance_left": st.column_config.NumberColumn(width="small", format="₹%.2f"),
+                "date_in": st.column_config.DateColumn(width="small"),
+                "date_out": st.column_config.DateColumn(width="small"),
+                "price_out": st.column_config.NumberColumn(width="small", format="₹%.2f"),
+                "P/L (INR)": st.column_config.NumberColumn(width="small", format="₹%.2f"),
+                "P/L in %": st.column_config.NumberColumn(width="small", format="%.2f%%"),
+                "days_taken": st.column_config.NumberColumn(width="small"),
+            }
+        )
 
+    saved = st.session_state.pop("journal_saved", None)
+    if saved:
+        st.success("Data saved successfully!")
+        if isinstance(saved, dict) and saved["conflicts"]:
+            st.warning(f"{len(saved['conflicts'])} of the saved rows had been changed in another session since "
+                       "this one loaded the journal; your version replaced theirs")
 
+    changes = editor_changes()
     if st.button("Save Data", key="save_button"):
-        edited_df = calculate_derived_columns(edited_df)
-        edited_df.to_csv(csv_file, index=False)
-        st.success("Data saved successfully!")
+        with span("trade_data.save"):
+            if isinstance(store, EditLogJournalStore):
+                # Only the rows in the editor's change set are appended to the log
+                saved = store.save_changes(df, changes)
+            else:
+                store.save(calculate_derived_columns(apply_change_set(editable_frame(df), changes)))
+                saved = True
+            journal_cache.invalidate(store)
+        # Rerun the whole page so every section picks up the new journal
+        st.session_state["journal_saved"] = saved
+        st.rerun()
 
     st.divider()
     st.write(":green-background[**Fully Booked**]", ":blue-background[**Partially Booked**]", ":red-background[**Not Booked**]")
-    edited_df['date_in'] = pd.to_datetime(edited_df['date_in']).dt.date
-    edited_df['date_out'] = pd.to_datetime(edited_df['date_out']).dt.date
-    edited_df["price_in"] = edited_df["price_in"].apply(lambda x: round(x,2))
-    edited_df["price_out"] = edited_df["price_out"].apply(lambda x: round(x,2))
-    st.dataframe(edited_df.style.apply(highlight_survived, axis=1), use_container_width=True)
+    # The grid shows the journal with the unsaved edits, like the editor
+    pending = changes["edited_rows"] or changes["added_rows"] or changes["deleted_rows"]
+    trade_grid(apply_change_set(df, changes) if pending else df)
 
     return initial_amount
@@ -0,0 +1,120 @@
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.trades_analysis.derived_columns import parse_dates
+from src.instrumentation.spans import span, timed
+
+# Booking status of a trade and the row colour it gets in the grid
+BOOKING_STATUSES = ["Fully Booked", "Partially Booked", "Not Booked"]
+STATUS_CSS = {
+    "Fully Booked": "background-color: #8ef05d",
+    "Partially Booked": "background-color: lightblue",
+    "Not Booked": "background-color: pink",
+}
+PAGE_SIZES = [25, 50, 100, 250, 1000]
+
+
+def _numbers(values):
+    return pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def booking_status(df):
+    # Same rules as the old per-row highlight: nothing left is fully booked,
+    # less left than bought is partially booked, anything else (including
+    # rows with missing quantities) is not booked
+    quantity_in = _numbers(df["quantity_in"])
+    quantity_left = _numbers(df["quantity_left"])
+    codes = np.select([quantity_left == 0, quantity_left < quantity_in], [0, 1], default=2)
+    return pd.Series(pd.Categorical.from_codes(codes, BOOKING_STATUSES), index=df.index, name="status")
+
+
+def filter_positions(df, symbols=None, bases=None, statuses=None, date_range=None, status=None):
+    # Row positions matching every filter given; nothing is copied until a
+    # page of these positions is taken
+    mask = np.ones(len(df), dtype=bool)
+    if symbols:
+        mask &= df["script_name"].isin(symbols).to_numpy()
+    if bases:
+        mask &= df["trade_base"].isin(bases).to_numpy()
+    if statuses:
+        status = booking_status(df) if status is None else status
+        mask &= status.isin(statuses).to_numpy()
+    if date_range:
+        start, end = date_range
+        dates = parse_dates(df["date_in"])
+        mask &= ((dates >= pd.Timestamp(start)) & (dates < pd.Timestamp(end) + pd.Timedelta(days=1))).to_numpy()
+    return np.flatnonzero(mask)
+
+
+def page_positions(positions, page, page_size):
+    pages = max(1, math.ceil(len(positions) / page_size))
+    page = min(max(page, 1), pages)
+    start = (page - 1) * page_size
+    return positions[start:start + page_size], pages
+
+
+def styled_page(page, status):
+    # Dates shown without the time, prices at two decimals, and the whole row
+    # coloured from the status column in one go instead of a callback per row
+    page = page.copy()
+    for column in ["date_in", "date_out"]:
+        if column in page.columns:
+            page[column] = parse_dates(page[column]).dt.date
+    for column in ["price_in", "price_out"]:
+        if column in page.columns:
+            page[column] = _numbers(page[column]).round(2)
+    for column in ["quantity_in", "quantity_left"]:
+        if column in page.columns:
+            page[column] = _numbers(page[column])
+
+    css = status.map(STATUS_CSS).astype(object).to_numpy()
+    styles = pd.DataFrame(np.repeat(css[:, None], len(page.columns), axis=1),
+                          index=page.index, columns=page.columns)
+    return page.style.apply(lambda _: styles, axis=None)
+
+
+def _options(values):
+    return sorted({str(v) for v in pd.unique(values) if not pd.isna(v)})
+
+
+@timed("trade_grid")
+def trade_grid(df, key="trade_grid"):
+    # Filterable, paginated view of the journal; only the visible page is
+    # styled and sent to the browser
+    col1, col2, col3, col4 = st.columns([2, 1.5, 1.5, 2])
+    with col1:
+        symbols = st.multiselect("Symbol", _options(df["script_name"]), key=f"{key}_symbols")
+    with col2:
+        bases = st.multiselect("Trade base", _options(df["trade_base"]), key=f"{key}_bases")
+    with col3:
+        statuses = st.multiselect("Status", BOOKING_STATUSES, key=f"{key}_statuses")
+    with col4:
+        date_range = st.date_input("Entered between", value=(), key=f"{key}_dates")
+
+    with span("trade_grid.filter"):
+        status = booking_status(df)
+        positions = filter_positions(df, symbols, bases, statuses,
+                                     date_range if len(date_range or ()) == 2 else None, status)
+
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{key}_page_size")
+    pages = max(1, math.ceil(len(positions) / page_size))
+    # Narrowing the filters can leave the remembered page past the last one
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    with col2:
+        page = st.number_input("Page", min_value=1, max_value=pages, key=f"{key}_page")
+
+    with span("trade_grid.page"):
+        visible, pages = page_positions(positions, page, page_size)
+        styled = styled_page(df.iloc[visible], status.iloc[visible])
+    with col3:
+        first = (min(page, pages) - 1) * page_size + 1 if len(visible) else 0
+        st.caption(f"Showing {first}–{first + len(visible) - 1 if len(visible) else 0} of {len(positions)} "
+                   f"trades ({len(df)} in the journal)")
+    st.dataframe(styled, use_container_width=True)
+    return positions
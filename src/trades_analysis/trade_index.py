@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+# Per-symbol aggregates behind the "Top Profitable trades" tables
+SYMBOL_AGGREGATES = {
+    "P/L (INR)": "sum",
+    "P/L in %": "mean",
+    "price_in": "mean",
+    "price_out": "mean",
+}
+
+# Columns of the per-trade leaderboards
+DURATION_COLUMNS = ["script_name", "days_taken", "P/L (INR)", "P/L in %", "price_in", "price_out", "trade_base"]
+RECENT_COLUMNS = ["script_name", "price_in", "price_out", "P/L (INR)", "P/L in %", "days_taken", "date_out"]
+
+
+def _numbers(values):
+    return pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def top_k(values, k, largest=True):
+    """Positions of the k largest (or smallest) values, best first.
+
+    Matches ``Series.nlargest(k, keep="first")`` without the NaN: ties keep
+    their original order, and when fewer than k values are known only those
+    are returned. Only the candidates picked by a partial selection are
+    sorted, never the whole array.
+    """
+    valid = np.flatnonzero(~np.isnan(values))
+    keys = values[valid] if largest else -values[valid]
+    k = min(max(int(k), 0), len(keys))
+    if k == 0:
+        return np.empty(0, dtype="int64")
+    if k < len(keys):
+        kth = np.partition(keys, len(keys) - k)[len(keys) - k]
+        above = np.flatnonzero(keys > kth)
+        ties = np.flatnonzero(keys == kth)[:k - len(above)]
+        chosen = np.concatenate([above, ties])
+    else:
+        chosen = np.arange(len(keys))
+    order = np.lexsort((chosen, -keys[chosen]))
+    return valid[chosen[order]]
+
+
+def _symbol_sums(df):
+    # Per-symbol sums and non-NaN counts of every aggregated column; those of
+    # several journals add up, and the means are taken only at the end
+    sums = df.groupby("script_name", observed=True)[list(SYMBOL_AGGREGATES)].agg(["sum", "count"])
+    sums.index = sums.index.astype(object)
+    return sums
+
+
+def _symbol_table(sums):
+    return pd.DataFrame({column: sums[(column, "sum")] / sums[(column, "count")] if how == "mean"
+                         else sums[(column, "sum")] for column, how in SYMBOL_AGGREGATES.items()},
+                        index=sums.index).rename_axis("script_name")
+
+
+class TradeIndex:
+    """Per-symbol and per-trade sort keys of one journal version.
+
+    Built once per journal and shared by every leaderboard on the summaries
+    tab; each query is a partial selection over a prepared array, so changing
+    how many rows a table shows doesn't regroup or resort the journal.
+    """
+
+    def __init__(self, df, symbol_sums):
+        self.df = df
+        self.symbol_sums = symbol_sums
+        self.symbols = _symbol_table(symbol_sums)
+        self._symbol_keys = {column: _numbers(self.symbols[column]) for column in ["P/L (INR)", "P/L in %"]}
+        days = _numbers(df["days_taken"])
+        self._days = np.where(days > 0, days, np.nan)
+        date_out = pd.to_datetime(df["date_out"], errors="coerce")
+        self._date_out = date_out.to_numpy(dtype="datetime64[ns]").astype("int64").astype("float64")
+        self._date_out[date_out.isna().to_numpy()] = np.nan
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df, _symbol_sums(df))
+
+    def top_symbols(self, k, by="P/L (INR)"):
+        # Same rows as groupby("script_name").agg(...).nlargest(k, by), less any NaN
+        return self.symbols.iloc[top_k(self._symbol_keys[by], k)]
+
+    def fastest(self, k, columns=None):
+        # Booked trades with the fewest days held; open trades have no
+        # duration or exit, so every per-trade table stops at the booked ones
+        return self._select("_days", k, columns, largest=False)
+
+    def slowest(self, k, columns=None):
+        return self._select("_days", k, columns)
+
+    def recent(self, k, columns=None):
+        # Most recently booked trades; same-day trades in journal order
+        return self._select("_date_out", k, columns)
+
+    def _select(self, key, k, columns, largest=True):
+        _, rows = self._candidates(key, k, largest)
+        return rows if columns is None else rows[columns]
+
+    def _candidates(self, key, k, largest):
+        # The top k rows by one sort key, and their keys
+        keys = getattr(self, key)
+        positions = top_k(keys, k, largest)
+        return keys[positions], self.df.iloc[positions]
+
+
+class MergedTradeIndex(TradeIndex):
+    """The leaderboards of several journals' indexes, without their frames concatenated.
+
+    Symbol sums add up across journals; a per-trade leaderboard takes the top
+    k of every journal and selects the top k among those, so ties still keep
+    the order of the journals and of their rows.
+    """
+
+    def __init__(self, indexes):
+        self.indexes = list(indexes)
+        sums = pd.concat([index.symbol_sums for index in self.indexes])
+        self.symbol_sums = sums.groupby(level=0, sort=True).sum()
+        self.symbols = _symbol_table(self.symbol_sums)
+        self._symbol_keys = {column: _numbers(self.symbols[column]) for column in ["P/L (INR)", "P/L in %"]}
+
+    def _candidates(self, key, k, largest):
+        parts = [index._candidates(key, k, largest) for index in self.indexes]
+        keys = np.concatenate([keys for keys, _ in parts])
+        rows = pd.concat([rows for _, rows in parts], ignore_index=True)
+        positions = top_k(keys, k, largest)
+        return keys[positions], rows.iloc[positions]
+
+
+def build_trade_index(df):
+    return TradeIndex.from_frame(df)
+
+
+def merge_trade_indexes(indexes):
+    indexes = list(indexes)
+    return indexes[0] if len(indexes) == 1 else MergedTradeIndex(indexes)
@@ -1,6 +1,9 @@
 import streamlit as st
-import matplotlib.pyplot as plt
 import pandas as pd
+from src.trades_analysis.summary_metrics import SummaryMetrics, summary_totals
+from src.trades_analysis.mark_to_market import mark_to_market, unrealized_totals
+from src.trades_analysis.trade_index import DURATION_COLUMNS, RECENT_COLUMNS, build_trade_index
+from src.instrumentation.spans import span, timed
 
 # Define the styling function
 def style_dataframe(df):
@@ -20,26 +23,32 @@ def style_dataframe(df):
                 })
 
 
-def trade_summaries(df, initial_amount):
+@timed("trade_summaries")
+def trade_summaries(df, initial_amount, metrics=None, latest_prices=None, index=None):
     st.subheader("Trade Summaries")
 
-    # Calculate and display summaries
-    total_trades = len(df)
-    open_trades = df[df["quantity_left"] > 0].shape[0]
-    closed_trades = total_trades - open_trades
-    partially_booked_trades = df[(df["quantity_left"] > 0) & (df["quantity_left"] < df["quantity_in"])].shape[0]
-    total_profit_loss = df["P/L (INR)"].sum()
-    total_balance_left = df["balance_left"].sum()
-    total_amount_in = df["amount_in"].sum()
-    profit_loss_percent_balance = (total_profit_loss / total_balance_left) * 100 if total_balance_left != 0 else 0
-    profit_loss_percent_circulated = (total_profit_loss / total_amount_in) * 100 if total_amount_in != 0 else 0
-    profit_loss_percent_invested = (total_profit_loss/initial_amount) * 100
+    # Totals come from the running metrics when the page keeps them up to date
+    # with the editor's unsaved changes, otherwise they are computed from df
+    if metrics is None:
+        metrics = SummaryMetrics.from_frame(df)
+    # Every leaderboard below is a top-k query on the same index
+    if index is None:
+        with span("trade_summaries.index"):
+            index = build_trade_index(df)
+    totals = summary_totals(metrics, initial_amount)
+    total_trades = totals["total_trades"]
+    open_trades = totals["open_trades"]
+    closed_trades = totals["closed_trades"]
+    partially_booked_trades = totals["partially_booked_trades"]
+    total_profit_loss = totals["total_profit_loss"]
+    total_balance_left = totals["total_balance_left"]
+    total_amount_in = totals["total_amount_in"]
+    profit_loss_percent_balance = totals["profit_loss_percent_balance"]
+    profit_loss_percent_circulated = totals["profit_loss_percent_circulated"]
+    profit_loss_percent_invested = totals["profit_loss_percent_invested"]
 
     # Calculate profit booked for each trade base
-    trade_base_profits = df.groupby("trade_base").agg({
-        "P/L (INR)": "sum",
-        "script_name": "count"
-    }).sort_values("P/L (INR)", ascending=False)
+    trade_base_profits = metrics.trade_base_profits()
 
     col1, col2, col3, col4 = st.columns([1.2, 1.5, 2, 2])
     with col1:
@@ -49,8 +58,8 @@ def trade_summaries(df, initial_amount):
         st.metric("Partially Booked Trades", partially_booked_trades, delta=None, delta_color="off")
 
     with col2:
-        top_4_trade_base_count = df[~df['trade_base'].isin(['AVG', 'LONG'])]['trade_base'].value_counts().nlargest(4)
-        open_trades_by_base = df[(df["quantity_left"] > 0) & (~df['trade_base'].isin(['AVG', 'LONG']))]['trade_base'].value_counts()
+        top_4_trade_base_count = metrics.trade_base_counts(exclude=['AVG', 'LONG']).nlargest(4)
+        open_trades_by_base = metrics.open_trades_by_base()
         for base, count in top_4_trade_base_count.items():
             open_count = open_trades_by_base.get(base, 0)
             st.metric(f"{base}", f"{count} ({open_count} open)", delta=None, delta_color="off")
@@ -58,7 +67,7 @@ def trade_summaries(df, initial_amount):
     with col3:
         # st.subheader("Top 4 Profitable Trade Bases")
         for base, row in trade_base_profits.head(4).iterrows():
-            st.metric(f"{base} ({int(row['script_name'])} trades)", f"₹{row['P/L (INR)']:.2f}", delta=None, delta_color="off")
+            st.metric(f"{base} ({int(row['trades'])} trades)", f"₹{row['P/L (INR)']:.2f}", delta=None, delta_color="off")
 
     with col4:
         st.metric("Total investement", f"₹{initial_amount}", delta=None, delta_color="normal")
@@ -67,6 +76,10 @@ def trade_summaries(df, initial_amount):
         st.metric("P/L % (Circulated)", f"{profit_loss_percent_circulated:.2f}% (₹{total_amount_in/100000:.2f}L)", delta=None, delta_color="normal")
         # st.metric("Avg P/L %", f"{avg_profit_loss_percent:.2f}%", delta=None, delta_color="normal")
 
+    if latest_prices is not None:
+        st.divider()
+        open_positions_marked(df, latest_prices, total_profit_loss, initial_amount)
+
     st.divider()
     # Display top profitable trades by amount and percentage with variable input
     st.header("Top Profitable trades")
@@ -75,35 +88,27 @@ def trade_summaries(df, initial_amount):
 
     with col1:
         st.subheader("By Amount")
-        top_by_amount = df.groupby("script_name").agg({
-            "P/L (INR)": "sum",
-            "P/L in %": "mean",
-            "price_in": "mean",
-            "price_out": "mean"
-        }).nlargest(num_trades_to_display, "P/L (INR)")
-        styled_df_amount = top_by_amount.reset_index()
+        with span("trade_summaries.top_by_amount"):
+            top_by_amount = index.top_symbols(num_trades_to_display, "P/L (INR)")
+            styled_df_amount = top_by_amount.reset_index()
 
-        # Apply styling and display
-        st.dataframe(
-            style_dataframe(styled_df_amount),
-            use_container_width=True
-        )
+            # Apply styling and display
+            st.dataframe(
+                style_dataframe(styled_df_amount),
+                use_container_width=True
+            )
 
 
     with col2:
         st.subheader("By Percentage")
-        top_by_percentage = df.groupby("script_name").agg({
-            "P/L (INR)": "sum",
-            "P/L in %": "mean",
-            "price_in": "mean",
-            "price_out": "mean"
-        }).nlargest(num_trades_to_display, "P/L in %")
-        styled_df_percentage = top_by_percentage.reset_index()
-        # Apply styling and display
-        st.dataframe(
-            style_dataframe(styled_df_percentage),
-            use_container_width=True
-        )
+        with span("trade_summaries.top_by_percentage"):
+            top_by_percentage = index.top_symbols(num_trades_to_display, "P/L in %")
+            styled_df_percentage = top_by_percentage.reset_index()
+            # Apply styling and display
+            st.dataframe(
+                style_dataframe(styled_df_percentage),
+                use_container_width=True
+            )
 
     st.divider()
     # Display top fastest and slowest trades with user input for number of trades
@@ -111,18 +116,51 @@ def trade_summaries(df, initial_amount):
     with col1:
         st.subheader("Top Fastest Trades")
         num_fastest_trades = st.number_input("Number of Fastest Trades to Display", min_value=1, value=5)
-        top_by_fastest = df[df["days_taken"] > 0].nsmallest(num_fastest_trades, "days_taken")[["script_name", "days_taken", "P/L (INR)", "P/L in %", "price_in", "price_out", "trade_base"]]
-        st.dataframe(style_dataframe(top_by_fastest), use_container_width=True)
+        with span("trade_summaries.fastest"):
+            top_by_fastest = index.fastest(num_fastest_trades, DURATION_COLUMNS)
+            st.dataframe(style_dataframe(top_by_fastest), use_container_width=True)
 
     with col2:
         st.subheader("Top Slowest Trades")
         num_slowest_trades = st.number_input("Number of Slowest Trades to Display", min_value=1, value=5)
-        top_by_slowest = df[df["days_taken"] > 0].nlargest(num_slowest_trades, "days_taken")[["script_name", "days_taken", "P/L (INR)", "P/L in %", "price_in", "price_out", "trade_base"]]
-        st.dataframe(style_dataframe(top_by_slowest), use_container_width=True)
+        with span("trade_summaries.slowest"):
+            top_by_slowest = index.slowest(num_slowest_trades, DURATION_COLUMNS)
+            st.dataframe(style_dataframe(top_by_slowest), use_container_width=True)
 
     st.divider()
     st.header("Recently booked trades")
     num_recent_trades = st.number_input("Number of Recent Trades to Display", min_value=1, value=5)
-    df_recent = df[df["date_out"].notna()]
-    df_recent = df_recent.sort_values(by=["date_out"], ascending=False)
-    st.dataframe(style_dataframe(df_recent[["script_name", "price_in", "price_out", "P/L (INR)", "P/L in %", "days_taken", "date_out"]].head(num_recent_trades)), use_container_width=True)
\ No newline at end of file
+    with span("trade_summaries.recent"):
+        df_recent = index.recent(num_recent_trades, RECENT_COLUMNS)
+        st.dataframe(style_dataframe(df_recent), use_container_width=True)
+
+
+@timed("open_positions_marked")
+def open_positions_marked(df, latest_prices, total_profit_loss, initial_amount):
+    st.header("Open Positions at Market")
+    marked = mark_to_market(df, latest_prices)
+    totals = unrealized_totals(marked)
+    unrealized_pl = totals["unrealized_pl"]
+    unrealized_percent = unrealized_pl / totals["cost"] * 100 if totals["cost"] else 0
+    total_percent_invested = (total_profit_loss + unrealized_pl) / initial_amount * 100 if initial_amount else 0
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Unrealized P/L", f"₹{unrealized_pl:,.2f}", delta=f"{unrealized_percent:.2f}%")
+    with col2:
+        st.metric("Market Value (Open)", f"₹{totals['market_value']/100000:.2f}L", delta=None, delta_color="off")
+    with col3:
+        st.metric("P/L incl. Unrealized", f"{total_percent_invested:.2f}% (₹{(total_profit_loss + unrealized_pl)/100000:.2f}L)",
+                  delta=None, delta_color="normal")
+    if totals["unpriced"]:
+        st.caption(f"No price for {', '.join(totals['unpriced'])}; left out of the unrealized totals")
+
+    with span("open_positions_marked.table"):
+        table = marked.sort_values("Unrealized P/L (INR)", ascending=False, na_position="last")
+        st.dataframe(table.style.format({
+            "close": "{:.2f}",
+            "balance_left": "{:,.2f}",
+            "market_value": "{:,.2f}",
+            "Unrealized P/L (INR)": "{:,.2f}",
+            "Unrealized P/L in %": "{:.2f}%",
+        }), use_container_width=True)
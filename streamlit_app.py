@@ -1,5 +1,18 @@
 import streamlit as st
 import plotly.graph_objects as go
+from pathlib import Path
+from src.journal.store import open_journal_store
+from src.journal.cache import journal_cache
+from src.trades_analysis.monte_carlo import MAX_TRADES_PER_YEAR, journal_return_profile, simulate_growth
+
+JOURNAL_PATH = Path("SKORM_Journal.parquet") if Path("SKORM_Journal.parquet").exists() else Path("SKORM_Journal.csv")
+MONTE_CARLO_COLUMNS = ["date_in", "date_out", "amount_in", "P/L in %"]
+
+
+@st.cache_data(max_entries=32, show_spinner="Simulating paths")
+def growth_bands(returns_pct, trades_per_year, initial_amount, years, capital_fraction, paths, seed):
+    # Keyed on every input, so moving a slider back is served from the cache
+    return simulate_growth(returns_pct, trades_per_year, initial_amount, years, capital_fraction, paths, seed)
 
 st.set_page_config(page_title="Trade Data Management", page_icon="💼", layout="wide",)
 
@@ -29,6 +42,7 @@ col1, col2, col3 = st.columns(3)
 initial_amount = col1.number_input("Initial Amount Investing (INR)", min_value=0, value=1000000, step=100000)
 annual_profit_percent = col2.number_input("Annual Profit Target (%)", min_value=0, value=20, step=1)
 years_to_project = col3.number_input("Number of Years", min_value=1, value=10, step=1)
+mode = st.radio("Projection", ["Fixed target", "Monte Carlo from journal"], horizontal=True)
 
 years = []
 amounts = []
@@ -52,6 +66,37 @@ fig.add_trace(go.Scatter(
     textposition='top center'
 ))
 
+if mode == "Monte Carlo from journal":
+    # Bootstraps the journal's booked trades: how often they happen, what they
+    # return and how much capital each one takes
+    journal = journal_cache.load(open_journal_store(JOURNAL_PATH), MONTE_CARLO_COLUMNS)
+    returns_pct, trades_per_year, capital_fraction = journal_return_profile(journal, initial_amount)
+    col1, col2, col3, col4 = st.columns(4)
+    trades_per_year = col1.number_input("Trades per Year", min_value=0.0, max_value=float(MAX_TRADES_PER_YEAR),
+                                        value=min(round(trades_per_year, 1), float(MAX_TRADES_PER_YEAR)), step=1.0)
+    capital_percent = col2.number_input("Capital per Trade (%)", min_value=0.0, max_value=100.0,
+                                        value=round(capital_fraction * 100, 2), step=0.5)
+    paths = col3.number_input("Simulated Paths", min_value=1000, max_value=200000, value=50000, step=10000)
+    seed = col4.number_input("Seed", min_value=0, value=0, step=1)
+
+    if len(returns_pct) == 0:
+        st.warning("The journal has no booked trades to simulate from yet.")
+    else:
+        bands = growth_bands(returns_pct, trades_per_year, initial_amount, years_to_project - 1,
+                             capital_percent / 100, paths, seed)
+        crore = bands[["p5", "p50", "p95"]] / 10000000
+        fig.add_trace(go.Scatter(x=bands["year"], y=crore["p95"], name="P95", mode="lines",
+                                 line=dict(color="rgba(89, 161, 79, 0.6)", width=1)))
+        fig.add_trace(go.Scatter(x=bands["year"], y=crore["p5"], name="P5 – P95", mode="lines",
+                                 line=dict(color="rgba(89, 161, 79, 0.6)", width=1),
+                                 fill="tonexty", fillcolor="rgba(89, 161, 79, 0.2)"))
+        fig.add_trace(go.Scatter(x=bands["year"], y=crore["p50"], name="Median (P50)", mode="lines",
+                                 line=dict(color="#59a14f", width=3, dash="dash")))
+        st.caption(f"{len(returns_pct)} booked trades resampled, {trades_per_year:.1f} trades a year at "
+                   f"{capital_percent:.2f}% of capital each, over {paths:,} paths. Median after "
+                   f"{years_to_project - 1} years: {crore['p50'].iloc[-1]:.2f}Cr "
+                   f"(P5 {crore['p5'].iloc[-1]:.2f}Cr, P95 {crore['p95'].iloc[-1]:.2f}Cr)")
+
 st.divider()
 
 st.subheader("Growth of Investment")
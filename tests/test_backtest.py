@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.backtest.rules import EXIT_REASONS, ExitRule, apply_rule, rule_grid
+from src.backtest.sweep import run_sweep
+from src.live_data.price_store import PriceStore
+
+DAY = 19_000
+
+
+def paths(*bars, days=None, horizon=None):
+    # One entry on DAY with the given (open, high, low, close) bars after it,
+    # padded to ``horizon`` like entry_paths does
+    horizon = horizon or len(bars)
+    days = days or [DAY + 1 + i for i in range(len(bars))]
+    padded = list(bars) + [bars[-1]] * (horizon - len(bars)) if bars else [(0, 0, 0, 0)] * horizon
+    values = np.array(padded, dtype="float64").reshape(1, horizon, 4)
+    result = {name: values[:, :, i] for i, name in enumerate(["open", "high", "low", "close"])}
+    result["day"] = np.array([list(days) + [days[-1] if days else DAY] * (horizon - len(days))], dtype="int64")
+    result["valid"] = (np.arange(horizon) < len(bars))[None, :]
+    return result
+
+
+def exit_of(rule, path, entry=100.0):
+    exit_bar, exit_price, reason = apply_rule(rule, [entry], [DAY], path)
+    return int(exit_bar[0]), float(exit_price[0]), EXIT_REASONS[reason[0]]
+
+
+def test_stop_wins_when_stop_and_target_hit_on_one_bar():
+    path = paths((100, 101, 99, 100), (100, 112, 94, 105))
+    assert exit_of(ExitRule(target_pct=10, stop_pct=5), path) == (1, 95.0, "stop")
+    assert exit_of(ExitRule(target_pct=10), path) == (1, pytest.approx(110.0), "target")
+
+
+def test_gaps_through_a_level_fill_at_the_open():
+    assert exit_of(ExitRule(stop_pct=5), paths((100, 101, 99, 100), (90, 92, 88, 91))) == (1, 90.0, "stop")
+    assert exit_of(ExitRule(target_pct=10), paths((115, 118, 114, 116))) == (0, 115.0, "target")
+
+
+def test_trailing_stop_trails_the_peak_before_the_bar():
+    # The first bar's own high doesn't lift its level, so 107 only stops out on the second
+    path = paths((100, 120, 107, 118), (118, 119, 107, 110))
+    assert exit_of(ExitRule(trailing_pct=10), path) == (1, 108.0, "trailing")
+    # Never below the entry price's level
+    assert exit_of(ExitRule(trailing_pct=10), paths((100, 100, 95, 96), (96, 97, 89, 90))) == (1, 90.0, "trailing")
+
+
+def test_max_days_exits_at_the_close_of_the_first_bar_past_the_limit():
+    path = paths((100, 101, 99, 100), (100, 102, 99, 101), (101, 103, 100, 102), (102, 104, 101, 103),
+                 days=[DAY + 1, DAY + 2, DAY + 5, DAY + 8])
+    assert exit_of(ExitRule(max_days=4), path) == (2, 102.0, "max_days")
+    assert exit_of(ExitRule(max_days=5, stop_pct=5), path) == (2, 102.0, "max_days")
+
+
+def test_entries_still_open_when_the_horizon_runs_out():
+    path = paths((100, 101, 99, 100), (100, 102, 99, 101), horizon=5)
+    assert exit_of(ExitRule(target_pct=50, stop_pct=50, max_days=30), path) == (1, 101.0, "open")
+    exit_bar, exit_price, reason = apply_rule(ExitRule(stop_pct=5), [100.0], [DAY], paths(horizon=3))
+    assert (exit_bar[0], reason[0]) == (-1, 0) and np.isnan(exit_price[0])
+
+
+def daily(start, closes):
+    dates = pd.bdate_range(start, periods=len(closes))
+    close = np.asarray(closes, dtype="float64")
+    return pd.DataFrame({"date": dates.date, "open": close, "high": close * 1.02, "low": close * 0.97,
+                         "close": close, "volume": 1000})
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PriceStore(tmp_path / "prices", fetcher=None)
+    rng = np.random.default_rng(7)
+    for symbol in ["AAA", "BBB"]:
+        bars = daily("2024-01-01", 100 * np.cumprod(1 + rng.normal(0, 0.02, 120)))
+        store.append(symbol, bars, bars["date"].iloc[0], bars["date"].iloc[-1])
+    return store
+
+
+@pytest.fixture
+def journal():
+    return pd.DataFrame({
+        "script_name": ["AAA", "BBB", "AAA", "CCC", "BBB"],
+        "trade_base": ["ML-5", "BTS", "ML-5", "JK", "JK"],
+        "date_in": ["2024-01-03", "2024-01-10", "2024-03-01", "2024-02-01", "2024-07-01"],
+        "price_in": [100.0, 101.0, 98.0, 50.0, 110.0],
+        "quantity_in": [10, 5, 8, 1, 3],
+    })
+
+
+RULES = rule_grid(targets=(None, 5), stops=(None, 3), trailing=(None, 4), max_days=(None, 20))
+
+
+def test_parallel_sweep_matches_the_serial_one(journal, store):
+    serial, info = run_sweep(journal, RULES, store, horizon=60, cache_dir=None)
+    parallel, _ = run_sweep(journal, RULES, store, horizon=60, cache_dir=None, max_workers=2, parallel_min_cells=0)
+    pd.testing.assert_frame_equal(parallel, serial)
+    assert info["missing_symbols"] == ["CCC"]
+    # The last entry is past the stored bars, so it has no prices
+    assert set(serial["entry"]) == {0, 1, 2}
+    assert (serial["exit_reason"] != "open").any() and (serial["exit_reason"] == "open").any()
+
+
+def test_exit_cache_starts_over_when_the_prices_change(journal, store, tmp_path):
+    cache = tmp_path / "backtests"
+    first, info = run_sweep(journal, RULES, store, horizon=60, cache_dir=cache)
+    assert (info["computed_rules"], info["cached_rules"]) == (len(RULES), 0)
+    again, info = run_sweep(journal, RULES, store, horizon=60, cache_dir=cache)
+    assert (info["computed_rules"], info["cached_rules"]) == (0, len(RULES))
+    pd.testing.assert_frame_equal(again, first)
+
+    # Newer bars change the price version, so nothing cached is reused
+    more = daily("2024-06-17", np.linspace(110, 130, 40))
+    store.append("BBB", more, more["date"].iloc[0], more["date"].iloc[-1])
+    fresh, info = run_sweep(journal, RULES, store, horizon=60, cache_dir=cache)
+    assert (info["computed_rules"], info["cached_rules"]) == (len(RULES), 0)
+    assert 4 in set(fresh["entry"])
+    assert len(list(cache.iterdir())) == 2
@@ -0,0 +1,97 @@
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from src.live_data.bulk_fetcher import BulkFetcher, SimulatedFetcher, TokenBucket, refresh_latest_prices
+from src.live_data.price_store import PriceStore
+
+START = date.today() - timedelta(days=20)
+FAST = dict(backoff=0.001, timeout=2.0, rate=1000.0)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PriceStore(tmp_path / "prices", fetcher=None)
+
+
+class MalformedFetcher:
+    # Answers with a frame missing most price columns for one symbol
+    name = "malformed"
+
+    def __init__(self, bad_symbol):
+        self.bad_symbol = bad_symbol
+        self.inner = SimulatedFetcher(latency=0, jitter=0)
+
+    def fetch(self, symbol, start, end):
+        bars = self.inner.fetch(symbol, start, end)
+        return bars[["date", "close"]] if symbol == self.bad_symbol else bars
+
+
+def run(fetcher, symbols):
+    try:
+        return {result.symbol: result for result in fetcher.run(symbols, START)}
+    finally:
+        fetcher.close()
+
+
+def test_fetches_and_stores_every_symbol(store):
+    results = run(BulkFetcher(store, SimulatedFetcher(latency=0.01, jitter=0), **FAST), ["AAA", "BBB", "AAA"])
+    assert sorted(results) == ["AAA", "BBB"]
+    assert all(result.ok and result.attempts == 1 for result in results.values())
+    assert len(store.history("AAA")) > 0
+
+
+def test_failing_symbol_is_retried_then_reported(store):
+    fetcher = SimulatedFetcher(latency=0, jitter=0, fail_symbols=["BAD"])
+    results = run(BulkFetcher(store, fetcher, retries=2, **FAST), ["BAD", "GOOD"])
+    assert not results["BAD"].ok and results["BAD"].attempts == 3
+    assert "ConnectionError" in results["BAD"].error
+    assert results["GOOD"].ok
+    assert sum(1 for symbol, _, _ in fetcher.calls if symbol == "BAD") == 3
+
+
+def test_flaky_requests_succeed_on_retry(store):
+    fetcher = SimulatedFetcher(latency=0, jitter=0, failure_rate=0.5, seed=3)
+    results = run(BulkFetcher(store, fetcher, retries=10, **FAST), [f"S{i}" for i in range(10)])
+    assert all(result.ok for result in results.values())
+    assert sum(result.attempts for result in results.values()) > 10
+
+
+def test_hung_request_times_out(store):
+    fetcher = SimulatedFetcher(latency=0, jitter=0, hang_rate=1.0, hang=1.0)
+    results = run(BulkFetcher(store, fetcher, retries=0, backoff=0.001, timeout=0.05, rate=1000.0), ["SLOW"])
+    assert not results["SLOW"].ok and "FetchTimeout" in results["SLOW"].error
+    assert store.history("SLOW").empty
+
+
+def test_store_errors_fail_only_that_symbol(store):
+    results = run(BulkFetcher(store, MalformedFetcher("BAD"), **FAST), ["BAD", "GOOD", "OTHER"])
+    assert not results["BAD"].ok and "KeyError" in results["BAD"].error
+    assert results["GOOD"].ok and results["OTHER"].ok
+
+
+def test_refresh_latest_prices_reports_failures(store):
+    prices, failed = refresh_latest_prices(store, ["BAD", "GOOD"], fetcher=MalformedFetcher("BAD"), **FAST)
+    assert list(failed) == ["BAD"]
+    assert pd.isna(prices["BAD"]) and not pd.isna(prices["GOOD"])
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    began = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    # The first token is free, the other ten arrive 1/50 s apart
+    assert time.monotonic() - began >= 10 / 50 * 0.9
+
+
+def test_fetchers_of_one_upstream_share_a_bucket(store):
+    fetcher = SimulatedFetcher()
+    first, second = BulkFetcher(store, fetcher, rate=2.0), BulkFetcher(store, SimulatedFetcher(), rate=2.0)
+    assert first.bucket is second.bucket
+    other = BulkFetcher(store, fetcher, rate=3.0)
+    assert other.bucket is not first.bucket
+    for bulk in [first, second, other]:
+        bulk.close()
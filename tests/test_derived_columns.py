@@ -0,0 +1,84 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.journal.store import open_journal_store
+from src.trades_analysis.derived_columns import DERIVED_COLUMNS, calculate_derived_columns
+
+ROOT = Path(__file__).resolve().parents[1]
+JOURNALS = ["SKORM_Journal.csv", "trade_data.csv"]
+
+
+def rowwise_derived_columns(df):
+    # The row-wise apply() the Save button ran before the columns were
+    # vectorized. Dates are parsed as ISO here: the old format='%d/%m' dropped
+    # the year, which is the one intended difference.
+    df["date_in"] = pd.to_datetime(df["date_in"], format="ISO8601", errors="coerce")
+    df["date_out"] = pd.to_datetime(df["date_out"], format="ISO8601", errors="coerce")
+    df["amount_in"] = df["price_in"] * df["quantity_in"]
+    df["balance_left"] = df["price_in"] * df["quantity_left"]
+    df["P/L (INR)"] = (df["price_out"] - df["price_in"]) * (df["quantity_in"] - df["quantity_left"])
+    df["P/L in %"] = df.apply(lambda row: 0 if pd.isna(row["price_out"]) else
+                              ((row["price_out"] - row["price_in"]) / row["price_in"]) * 100, axis=1)
+    df["days_taken"] = df.apply(lambda row: 0 if pd.isna(row["date_out"]) or pd.isna(row["date_in"]) else
+                                (row["date_out"] - row["date_in"]).days, axis=1)
+    return df
+
+
+def with_edge_rows(df):
+    # Rows still being typed in, open and partly exited trades
+    extra = pd.DataFrame([
+        {"script_name": "OPEN", "trade_base": "ML-5", "price_in": 100.0, "quantity_in": 10, "quantity_left": 10,
+         "date_in": "2024-03-01", "date_out": np.nan, "price_out": np.nan},
+        {"script_name": "PARTIAL", "trade_base": "ML-5", "price_in": 250.5, "quantity_in": 40, "quantity_left": 15,
+         "date_in": "2024-03-01", "date_out": "2024-04-15", "price_out": 280.25},
+        {"script_name": "NOPRICE", "trade_base": np.nan, "price_in": np.nan, "quantity_in": np.nan,
+         "quantity_left": np.nan, "date_in": np.nan, "date_out": "2024-04-15", "price_out": 10.0},
+        {"script_name": "NODATEIN", "trade_base": "BTS", "price_in": 50.0, "quantity_in": 5, "quantity_left": 0,
+         "date_in": np.nan, "date_out": "2024-04-15", "price_out": 45.0},
+    ])
+    return pd.concat([df, extra], ignore_index=True)
+
+
+def assert_same_derived(actual, expected):
+    for column in ["amount_in", "balance_left", "P/L (INR)", "P/L in %"]:
+        np.testing.assert_allclose(actual[column].to_numpy(dtype="float64", na_value=np.nan),
+                                   expected[column].to_numpy(dtype="float64", na_value=np.nan),
+                                   rtol=1e-9, equal_nan=True, err_msg=column)
+    np.testing.assert_array_equal(actual["days_taken"].to_numpy(dtype="int64"),
+                                  expected["days_taken"].to_numpy(dtype="int64"))
+    for column in ["date_in", "date_out"]:
+        pd.testing.assert_series_equal(actual[column], expected[column], check_names=False)
+
+
+@pytest.mark.parametrize("journal", JOURNALS)
+def test_matches_rowwise_apply(journal):
+    raw = with_edge_rows(pd.read_csv(ROOT / journal))
+    expected = rowwise_derived_columns(raw.copy())
+    actual = calculate_derived_columns(raw.copy())
+    assert_same_derived(actual, expected)
+
+
+@pytest.mark.parametrize("journal", JOURNALS)
+def test_matches_rowwise_apply_on_typed_journal(journal):
+    # The typed loader keeps prices as float32; they come back at the
+    # decimals they were quoted at
+    typed = open_journal_store(ROOT / journal).load()
+    raw = pd.read_csv(ROOT / journal)
+    expected = rowwise_derived_columns(raw.copy())
+    actual = calculate_derived_columns(typed.copy())
+    assert_same_derived(actual.reset_index(drop=True), expected)
+
+
+def test_editor_dates_and_day_first_strings():
+    # st.data_editor hands back datetime.date objects; old sheets typed 23/02/2024
+    df = pd.DataFrame({
+        "price_in": [100.0, 100.0], "quantity_in": [1, 1], "quantity_left": [0, 0], "price_out": [110.0, 90.0],
+        "date_in": [pd.Timestamp("2024-01-10").date(), "01/02/2024"],
+        "date_out": [pd.Timestamp("2024-01-20").date(), "23/02/2024"],
+    })
+    out = calculate_derived_columns(df)
+    assert out["days_taken"].tolist() == [10, 22]
+    assert set(DERIVED_COLUMNS) <= set(out.columns)
@@ -0,0 +1,94 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.journal.edit_log import LOG_FILE, EditLogJournalStore, encode_record, read_records, replay
+from src.journal.schema import widen_prices
+from src.journal.store import JOURNAL_COLUMNS, migrate_csv_to_parquet
+
+ROOT = Path(__file__).resolve().parents[1]
+ADDED = {"script_name": "NEWCO", "trade_base": "ML-5", "price_in": 101.1, "quantity_in": 3, "quantity_left": 3,
+         "date_in": "2024-06-03"}
+
+
+@pytest.fixture(params=["SKORM_Journal.csv", "trade_data.csv"])
+def store(request, tmp_path):
+    # SKORM keeps price_in as float64 (one price has 3 decimals), trade_data's prices are float32
+    shutil.copy(ROOT / request.param, tmp_path / request.param)
+    return EditLogJournalStore(migrate_csv_to_parquet(tmp_path / request.param).path)
+
+
+def prices(df):
+    return widen_prices(df)[["price_in", "price_out"]].reset_index(drop=True)
+
+
+def test_save_changes_appends_the_rows_it_touched(store):
+    df = store.load()
+    saved = store.save_changes(df, {"edited_rows": {0: {"price_out": 615.3}}, "added_rows": [ADDED],
+                                    "deleted_rows": [2]})
+    assert (saved["upserted"], saved["deleted"], saved["conflicts"]) == (2, 1, [])
+    back = store.load()
+    assert len(back) == len(df) and df.index[2] not in back.index
+    assert back.index[-1] == df.index.max() + 1
+    assert widen_prices(back)["price_out"].iat[0] == 615.3
+    added = widen_prices(back).iloc[-1]
+    assert added["price_in"] == 101.1 and added["amount_in"] == pytest.approx(303.3, abs=1e-9)
+
+
+def test_prices_survive_edits_and_compaction(store):
+    df = store.load()
+    store.save_changes(df, {"edited_rows": {0: {"price_out": 615.3}}, "added_rows": [ADDED]})
+    store.save_changes(store.load(), {"edited_rows": {1: {"quantity_left": 0}}})
+    before = store.load()
+    assert store.compact() == 2
+    after = store.load()
+    pd.testing.assert_frame_equal(prices(after), prices(before))
+    # Rows nobody edited keep the prices they were migrated with
+    pd.testing.assert_frame_equal(prices(after.iloc[2:-1]), prices(df.iloc[2:]))
+    assert str(after["price_in"].dtype) == str(df["price_in"].dtype)
+    # The next edit re-derives amounts from the exact prices
+    store.save_changes(after, {"edited_rows": {len(after) - 1: {"quantity_in": 5, "quantity_left": 5}}})
+    assert store.load()["amount_in"].iat[-1] == pytest.approx(505.5, abs=1e-9)
+
+
+def test_replay_keeps_the_last_upsert_and_stops_at_a_torn_line(store):
+    df = store.load()
+    store.save_changes(df, {"edited_rows": {0: {"price_out": 1.5}}})
+    store.save_changes(store.load(), {"edited_rows": {0: {"price_out": 2.5}}})
+    records, _ = read_records(store.log_path)
+    # Replaying the same change sets again changes nothing
+    once = replay(store.snapshot.load(), records[1:])
+    twice = replay(once, records[1:])
+    pd.testing.assert_frame_equal(once, twice)
+    assert widen_prices(once)["price_out"].iat[0] == 2.5
+
+    torn = encode_record({"seq": 3, "next_row": 0, "deletes": [int(df.index[0])]})
+    with open(store.log_path, "ab") as f:
+        f.write(torn[:-5])
+    assert len(read_records(store.log_path)[0]) == len(records)
+    assert widen_prices(store.load())["price_out"].iat[0] == 2.5
+
+
+def test_compact_folds_the_log_into_a_new_generation(store):
+    df = store.load()
+    store.save_changes(df, {"deleted_rows": [0]})
+    generation = store.snapshot.generation()
+    assert store.compact() == 1
+    assert store.snapshot.generation() != generation
+    header, *rest = read_records(store.path / LOG_FILE)[0]
+    assert rest == [] and header["snapshot"] == store.snapshot.generation()
+    assert len(store.load()) == len(df) - 1
+    assert store.compact() == 0
+
+
+def test_rows_saved_by_another_session_are_conflicts(store):
+    first, second = store.load(), store.load()
+    store.save_changes(first, {"edited_rows": {0: {"price_out": 10.0}, 1: {"price_out": 11.0}}})
+    saved = store.save_changes(second, {"edited_rows": {1: {"price_out": 12.0}, 3: {"price_out": 13.0}}})
+    assert saved["conflicts"] == [int(second.index[1])]
+    # The later save wins
+    assert widen_prices(store.load())["price_out"].iat[1] == 12.0
+    assert np.isclose(widen_prices(store.load())["price_out"].iat[0], 10.0)
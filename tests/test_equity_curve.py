@@ -0,0 +1,40 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.journal.store import JOURNAL_COLUMNS, open_journal_store
+from src.trades_analysis.equity_curve import daily_unrealized_pl, held_symbols
+from src.trades_analysis.mark_to_market import mark_to_market, unrealized_totals
+
+ROOT = Path(__file__).resolve().parents[1]
+DAYS = pd.date_range("2024-01-01", "2024-01-06", name="date")
+
+
+def test_unrealized_pl_holds_sold_shares_until_their_exit():
+    trades = pd.DataFrame({
+        "script_name": ["A", "A", "B", "C"],
+        "price_in": [10.0, 20.0, 5.0, 1.0],
+        "quantity_in": [10, 4, 6, 100],
+        "quantity_left": [4, 0, 6, 0],
+        "date_in": ["2024-01-02", "2024-01-03", "2024-01-05", "2023-12-01"],
+        # C was sold before the first day and is never held on one
+        "date_out": ["2024-01-04", "2024-01-05", None, "2023-12-20"],
+    })
+    closes = {"A": pd.Series(11.0, index=DAYS), "B": pd.Series(6.0, index=DAYS), "C": pd.Series(2.0, index=DAYS)}
+    # Jan 3 holds all 10 shares of the first lot and the second lot; 6 shares
+    # of the first are sold on Jan 4 and the second lot on Jan 5
+    assert daily_unrealized_pl(trades, DAYS, closes).tolist() == [0, 10, -26, -32, 10, 10]
+    assert held_symbols(trades, DAYS[0]) == ["A", "B"]
+
+
+def test_last_day_matches_the_open_positions_at_market():
+    journal = open_journal_store(ROOT / "SKORM_Journal.csv").load(JOURNAL_COLUMNS)
+    symbols = held_symbols(journal, journal["date_in"].min())
+    rng = np.random.default_rng(1)
+    prices = {symbol: float(rng.uniform(10, 500)) for symbol in symbols}
+    today = pd.Timestamp.today().normalize()
+    days = pd.date_range(today - pd.Timedelta(days=5), today, name="date")
+    unrealized = daily_unrealized_pl(journal, days, {s: pd.Series(p, index=days) for s, p in prices.items()})
+    marked = unrealized_totals(mark_to_market(journal, prices))
+    assert np.isclose(unrealized.iloc[-1], marked["unrealized_pl"])
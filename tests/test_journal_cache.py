@@ -0,0 +1,96 @@
+import shutil
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.journal.cache import JournalCache
+from src.journal.store import CsvJournalStore
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def store(tmp_path):
+    shutil.copy(ROOT / "SKORM_Journal.csv", tmp_path / "SKORM_Journal.csv")
+    return CsvJournalStore(tmp_path / "SKORM_Journal.csv")
+
+
+def test_hits_only_stat_the_journal(store, monkeypatch):
+    cache = JournalCache()
+    first = cache.load(store)
+    monkeypatch.setattr(store, "load", lambda columns=None: pytest.fail("a hit read the journal"))
+    pd.testing.assert_frame_equal(cache.load(store), first)
+    assert cache.stats() == {"hits": 1, "misses": 1, "invalidations": 0, "entries": 1}
+    # Other columns are an entry of their own
+    monkeypatch.undo()
+    cache.load(store, ["script_name", "P/L (INR)"])
+    assert cache.stats()["entries"] == 2
+
+
+def test_a_changed_fingerprint_reloads(store):
+    cache = JournalCache()
+    builds = []
+    count = cache.derived(store, "rows", lambda df: builds.append(1) or len(df))
+    assert cache.derived(store, "rows", len) == count and len(builds) == 1
+    df = store.load()
+    store.save(df.iloc[:-1])
+    assert len(cache.load(store)) == count - 1
+    assert cache.derived(store, "rows", len) == count - 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_invalidate_drops_every_entry_of_the_store(store, monkeypatch):
+    cache = JournalCache()
+    cache.load(store)
+    cache.load(store, ["script_name"])
+    # A save the filesystem's mtime resolution would hide
+    monkeypatch.setattr(store, "fingerprint", lambda: ("same",))
+    cache.load(store)
+    cache.invalidate(store)
+    assert cache.stats()["entries"] == 0 and cache.stats()["invalidations"] == 1
+    cache.load(store)
+    assert cache.stats()["misses"] == 4
+
+
+def test_loads_run_outside_the_lock(store, tmp_path, monkeypatch):
+    # While one journal is being read, hits on another one still go through
+    other = CsvJournalStore(tmp_path / "other.csv")
+    shutil.copy(store.path, other.path)
+    cache = JournalCache()
+    cache.load(other)
+    loading, release = threading.Event(), threading.Event()
+    load = store.load
+
+    def slow_load(columns=None):
+        loading.set()
+        assert release.wait(10)
+        return load(columns)
+
+    monkeypatch.setattr(store, "load", slow_load)
+    reader = threading.Thread(target=cache.load, args=(store,))
+    reader.start()
+    assert loading.wait(10)
+    hit = threading.Thread(target=cache.load, args=(other,))
+    hit.start()
+    hit.join(5)
+    assert not hit.is_alive()
+    release.set()
+    reader.join(10)
+    assert cache.stats()["entries"] == 2
+
+
+def test_a_load_racing_a_save_is_not_cached(store, monkeypatch):
+    cache = JournalCache()
+    load = store.load
+
+    def load_then_invalidate(columns=None):
+        # Another session saves and invalidates while this one reads
+        df = load(columns)
+        cache.invalidate(store)
+        return df
+
+    monkeypatch.setattr(store, "load", load_then_invalidate)
+    cache.load(store)
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.journal.multi import JournalSet
+from src.journal.store import JOURNAL_COLUMNS
+from src.trades_analysis.equity_curve import daily_realized_pl, merge_daily_pl
+from src.trades_analysis.strategy_analytics import StrategyAnalytics, booked_trades
+from src.trades_analysis.summary_metrics import SummaryMetrics
+from src.trades_analysis.trade_index import DURATION_COLUMNS, RECENT_COLUMNS, build_trade_index, merge_trade_indexes
+
+ROOT = Path(__file__).resolve().parents[1]
+ACCOUNTS = ["SKORM", "OTHER"]
+
+
+@pytest.fixture(scope="module")
+def journal_set(tmp_path_factory):
+    # The SKORM journal split into two accounts at a row that isn't a day boundary
+    root = tmp_path_factory.mktemp("journals")
+    journal = pd.read_csv(ROOT / "SKORM_Journal.csv")
+    journal.iloc[:117].to_csv(root / "SKORM_Journal.csv", index=False)
+    journal.iloc[117:].to_csv(root / "OTHER_Journal.csv", index=False)
+    journals = JournalSet(max_workers=1)
+    journals.refresh({account: root / f"{account}_Journal.csv" for account in ACCOUNTS}, JOURNAL_COLUMNS)
+    return journals
+
+
+@pytest.fixture(scope="module")
+def combined(journal_set):
+    return journal_set.frame(ACCOUNTS)
+
+
+def test_merged_leaderboards_match_the_concatenated_journal(journal_set, combined):
+    merged = journal_set.derived(ACCOUNTS, "trade_index", build_trade_index, merge=merge_trade_indexes)
+    whole = build_trade_index(combined)
+    for k in [1, 5, 40]:
+        for by in ["P/L (INR)", "P/L in %"]:
+            expected = whole.top_symbols(k, by)
+            assert list(merged.top_symbols(k, by).index) == list(expected.index)
+            assert np.allclose(merged.top_symbols(k, by).to_numpy(float), expected.to_numpy(float), equal_nan=True)
+        for name, columns in [("fastest", DURATION_COLUMNS), ("slowest", DURATION_COLUMNS), ("recent", RECENT_COLUMNS)]:
+            got = getattr(merged, name)(k, columns).reset_index(drop=True).astype(str)
+            assert got.equals(getattr(whole, name)(k, columns).reset_index(drop=True).astype(str))
+
+
+def test_merged_daily_pl_matches_the_concatenated_journal(journal_set, combined):
+    merged = journal_set.derived(ACCOUNTS, "daily_pl", daily_realized_pl, merge=merge_daily_pl)
+    pd.testing.assert_series_equal(merged, daily_realized_pl(combined), check_freq=False)
+
+
+def test_merged_booked_trades_give_the_same_strategy_metrics(journal_set, combined):
+    trades = journal_set.derived(ACCOUNTS, "booked_trades", booked_trades,
+                                 merge=lambda parts: pd.concat(parts, keys=ACCOUNTS))
+    merged, whole = StrategyAnalytics(trades), StrategyAnalytics.from_frame(combined)
+    pd.testing.assert_frame_equal(merged.compare(), whole.compare())
+
+
+def test_no_accounts_add_up_to_nothing(journal_set):
+    assert journal_set.metrics([]).total_trades == 0
+    assert journal_set.metrics(ACCOUNTS).matches(SummaryMetrics.from_frame(journal_set.frame(ACCOUNTS)))
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.journal.store import CsvJournalStore
+from src.trades_analysis.monte_carlo import PERCENTILES, journal_return_profile, simulate_growth
+
+ROOT = Path(__file__).resolve().parents[1]
+INITIAL = 1_000_000
+
+
+@pytest.fixture
+def profile():
+    return journal_return_profile(CsvJournalStore(ROOT / "SKORM_Journal.csv").load(), INITIAL)
+
+
+def test_profile_of_a_bundled_journal(profile):
+    returns, trades_per_year, capital_fraction = profile
+    assert len(returns) and not np.isnan(returns).any()
+    assert trades_per_year > 0 and 0 < capital_fraction < 1
+
+
+def test_bands_are_ordered_and_seeded(profile):
+    returns, trades_per_year, capital_fraction = profile
+    bands = simulate_growth(returns, trades_per_year, INITIAL, 10, capital_fraction, paths=5000, seed=3)
+    assert list(bands.columns) == ["year"] + [f"p{p}" for p in PERCENTILES]
+    assert bands["year"].tolist() == list(range(11))
+    # Everything starts from today's value and the bands never cross
+    assert (bands.iloc[0, 1:] == INITIAL).all()
+    assert (bands["p5"] <= bands["p50"]).all() and (bands["p50"] <= bands["p95"]).all()
+    assert (bands["p95"] - bands["p5"]).iloc[1:].is_monotonic_increasing
+    again = simulate_growth(returns, trades_per_year, INITIAL, 10, capital_fraction, paths=5000, seed=3)
+    pd.testing.assert_frame_equal(again, bands)
+    other = simulate_growth(returns, trades_per_year, INITIAL, 10, capital_fraction, paths=5000, seed=4)
+    assert not other.equals(bands)
+
+
+def test_no_trades_keeps_the_value():
+    bands = simulate_growth([10.0, -5.0], 0, INITIAL, 3, 0.1, paths=100)
+    assert (bands.drop(columns="year") == INITIAL).all().all()
@@ -0,0 +1,83 @@
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.journal.store import CsvJournalStore
+from src.trades_analysis.period_cube import (build_period_cube, merge_period_cubes, period_profits, period_trades,
+                                             yearly_profits)
+
+ROOT = Path(__file__).resolve().parents[1]
+JOURNALS = ["SKORM_Journal.csv", "trade_data.csv"]
+FREQUENCIES = {"month": "M", "quarter": "Q"}
+
+
+@pytest.fixture(params=JOURNALS)
+def journal(request):
+    return request.param
+
+
+def baseline(name):
+    df = pd.read_csv(ROOT / name)
+    df["date_in"] = pd.to_datetime(df["date_in"])
+    df["date_out"] = pd.to_datetime(df["date_out"])
+    return df
+
+
+def baseline_profits(df, freq):
+    # The profit chart's groupby before the cube
+    profits = df.groupby(df["date_out"].dt.to_period(freq))["P/L (INR)"].sum().reset_index()
+    profits["period"] = profits["date_out"].astype(str)
+    profits["cumulative_profit"] = profits["P/L (INR)"].cumsum()
+    return profits[["period", "P/L (INR)", "cumulative_profit"]]
+
+
+def baseline_trades(df, freq):
+    # The trade count chart's three groupbys and merges before the cube
+    month_in = df["date_in"].dt.to_period(freq).astype(str)
+    trades = df.groupby(month_in).size().rename("total_trades")
+    open_trades = df[df["quantity_left"] > 0].groupby(month_in).size().rename("open_trades")
+    booked = df.groupby(df["date_out"].dt.to_period(freq).astype(str)).size().rename("booked_trades")
+    merged = pd.concat([trades, open_trades.reindex(trades.index), booked.reindex(trades.index)], axis=1).fillna(0)
+    return merged.rename_axis("month_in").reset_index()
+
+
+@pytest.mark.parametrize("granularity", ["month", "quarter"])
+def test_cube_matches_the_period_groupbys(journal, granularity):
+    df = baseline(journal)
+    cube = build_period_cube(CsvJournalStore(ROOT / journal).load())
+    freq = FREQUENCIES[granularity]
+
+    profits = period_profits(cube, granularity)
+    expected = baseline_profits(df, freq)
+    assert profits["period"].tolist() == expected["period"].tolist()
+    np.testing.assert_allclose(profits["P/L (INR)"], expected["P/L (INR)"])
+    np.testing.assert_allclose(profits["cumulative_profit"], expected["cumulative_profit"])
+
+    trades = period_trades(cube, granularity)
+    expected = baseline_trades(df, freq)
+    assert trades["month_in"].tolist() == expected["month_in"].tolist()
+    for column in ["total_trades", "open_trades", "booked_trades"]:
+        assert trades[column].tolist() == expected[column].tolist(), column
+
+
+def test_cube_matches_the_yearly_groupby(journal):
+    df = baseline(journal)
+    expected = df.groupby(df["date_out"].dt.year)["P/L (INR)"].sum()
+    yearly = yearly_profits(build_period_cube(CsvJournalStore(ROOT / journal).load()))
+    assert yearly["year"].tolist() == [str(int(year)) for year in expected.index]
+    np.testing.assert_allclose(yearly["P/L (INR)"], expected.to_numpy())
+
+
+def test_merged_cubes_match_one_cube_of_both_journals():
+    frames = [CsvJournalStore(ROOT / name).load() for name in JOURNALS]
+    merged = merge_period_cubes([build_period_cube(df) for df in frames])
+    combined = build_period_cube(pd.concat(frames, ignore_index=True))
+    for granularity in ["month", "quarter", "year"]:
+        pd.testing.assert_frame_equal(merged.frame(granularity), combined.frame(granularity))
+    # Tables are read-only, also after a round trip to a worker process
+    table = pickle.loads(pickle.dumps(merged)).table("month")
+    with pytest.raises(ValueError):
+        table.realized_pl[0] = 1.0
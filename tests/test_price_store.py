@@ -0,0 +1,120 @@
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.live_data.price_store import (COMPACT_SEGMENTS, MANIFEST_NAME, PRICE_COLUMNS, LocalFixtureFetcher, PriceStore, merge_ranges,
+                                       missing_ranges)
+
+START = date(2024, 1, 1)
+
+
+def bars(start, days, base=100.0):
+    dates = pd.bdate_range(start, periods=days)
+    close = base + np.arange(days, dtype="float64")
+    return pd.DataFrame({"date": dates.date, "open": close, "high": close + 1, "low": close - 1, "close": close,
+                         "volume": 1000})
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    root = tmp_path / "fixtures"
+    root.mkdir()
+    bars(START, 60).to_csv(root / "AAA.csv", index=False)
+    return LocalFixtureFetcher(root)
+
+
+@pytest.fixture
+def store(tmp_path, fixtures):
+    return PriceStore(tmp_path / "prices", fixtures)
+
+
+def test_merge_ranges_joins_touching_and_overlapping():
+    assert merge_ranges([(10, 12), (1, 3), (4, 5), (11, 20), (30, 30)]) == [(1, 5), (10, 20), (30, 30)]
+    assert merge_ranges([]) == []
+
+
+def test_missing_ranges():
+    covered = [(5, 9), (15, 20)]
+    assert missing_ranges(covered, 1, 25) == [(1, 4), (10, 14), (21, 25)]
+    assert missing_ranges(covered, 5, 9) == []
+    assert missing_ranges(covered, 7, 16) == [(10, 14)]
+    assert missing_ranges([], 3, 4) == [(3, 4)]
+
+
+def test_ensure_fetches_only_gaps(store, fixtures):
+    end = START + timedelta(days=40)
+    assert store.ensure("AAA", START + timedelta(days=10), end) == [(START + timedelta(days=10), end)]
+    assert store.coverage("AAA") == [(START + timedelta(days=10), end)]
+    fixtures.calls.clear()
+    # Only the part before what's stored is fetched again
+    assert store.ensure("AAA", START, end) == [(START, START + timedelta(days=9))]
+    assert fixtures.calls == [("AAA", START, START + timedelta(days=9))]
+    fixtures.calls.clear()
+    assert store.ensure("AAA", START, end) == []
+    assert fixtures.calls == []
+    history = store.history("AAA", START, end)
+    assert list(history.columns) == PRICE_COLUMNS
+    assert history["date"].is_monotonic_increasing and history["date"].is_unique
+
+
+def test_days_without_bars_still_count_as_covered(store, fixtures):
+    # A symbol with no fixture has no bars, but the range was still fetched
+    store.ensure("NOBARS", START, START + timedelta(days=5))
+    assert store.history("NOBARS").empty
+    assert store.missing("NOBARS", START, START + timedelta(days=5)) == []
+
+
+def test_today_is_never_covered(store):
+    today = date.today()
+    store.append("AAA", bars(today - timedelta(days=3), 1), today - timedelta(days=3), today)
+    assert store.missing("AAA", today - timedelta(days=3), today) == [(today, today)]
+
+
+def test_later_segments_win_and_compact_keeps_history(store):
+    store.append("AAA", bars(START, 20), START, START + timedelta(days=27))
+    revised = bars(START + timedelta(days=7), 5, base=500.0)
+    store.append("AAA", revised, START + timedelta(days=7), START + timedelta(days=13))
+    before = store.history("AAA")
+    assert before.set_index("date").loc[pd.Timestamp(revised["date"].iloc[0]), "close"] == 500.0
+    assert len(before) == 20
+
+    store.compact("AAA")
+    segments = sorted(p.name for p in (store.root / "AAA").glob("*.arrow"))
+    assert len(segments) == 1
+    pd.testing.assert_frame_equal(store.history("AAA"), before)
+    assert store.coverage("AAA") == [(START, START + timedelta(days=27))]
+
+
+def test_repeated_refreshes_keep_segments_bounded(store):
+    # Today is never covered, so every refresh appends another segment
+    today = date.today()
+    for i in range(3 * COMPACT_SEGMENTS):
+        store.append("AAA", bars(today - timedelta(days=i), 1, base=100.0 + i), today - timedelta(days=i), today)
+        assert len(store._manifest("AAA")["segments"]) <= COMPACT_SEGMENTS
+    segments = list((store.root / "AAA").glob("*.arrow"))
+    assert len(segments) == len(store._manifest("AAA")["segments"])
+    # Nothing is lost when segments are folded; later refreshes still win
+    expected = pd.concat([bars(today - timedelta(days=i), 1, base=100.0 + i) for i in range(3 * COMPACT_SEGMENTS)])
+    expected = expected.drop_duplicates("date", keep="last").sort_values("date")
+    assert store.history("AAA")["close"].tolist() == expected["close"].tolist()
+
+
+def test_concurrent_appends_keep_every_segment(tmp_path):
+    # Sessions refreshing the same symbol at once must not claim the same segment
+    store = PriceStore(tmp_path / "prices", fetcher=None)
+    chunks = [bars(START + timedelta(days=7 * i), 5, base=100.0 * (i + 1)) for i in range(16)]
+
+    def append(i):
+        PriceStore(store.root).append("AAA", chunks[i], chunks[i]["date"].iloc[0], chunks[i]["date"].iloc[-1])
+
+    threads = [threading.Thread(target=append, args=(i,)) for i in range(len(chunks))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store._manifest("AAA")["segments"]) == len(chunks)
+    assert len(store.history("AAA")) == 5 * len(chunks)
+    assert (store.root / "AAA" / MANIFEST_NAME).exists()
@@ -0,0 +1,41 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+REPORT_KEYS = ["rows", "initial_amount", "summary", "drawdown", "trade_bases", "top_by_amount", "top_by_percentage",
+               "fastest", "slowest", "recent", "monthly_profits", "quarterly_profits", "yearly_profits",
+               "monthly_trades"]
+# Runs the CLI in a fresh interpreter and prints the heavy modules it imported
+IMPORTS_SCRIPT = """
+import json
+import sys
+from src.cli.report import main
+main(sys.argv[1:])
+print(json.dumps(sorted(m for m in ("streamlit", "plotly") if m in sys.modules)), file=sys.stderr)
+"""
+
+
+def run(*args):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True, timeout=300)
+
+
+def test_json_report_of_bundled_journals():
+    reports = json.loads(run("-m", "src.cli.report", "SKORM_Journal.csv", "trade_data.csv", "--combined",
+                             "--top", "3").stdout)
+    assert list(reports) == ["SKORM", "trade_data", "ALL"]
+    for report in reports.values():
+        assert list(report) == REPORT_KEYS
+        assert len(report["top_by_amount"]) <= 3 and report["monthly_profits"]
+    assert reports["ALL"]["rows"] == reports["SKORM"]["rows"] + reports["trade_data"]["rows"]
+
+
+@pytest.mark.parametrize("charts, imported", [(False, []), (True, ["plotly"])])
+def test_streamlit_is_never_imported_and_plotly_only_for_charts(tmp_path, charts, imported):
+    args = ["SKORM_Journal.csv", "--format", "html", "-o", str(tmp_path)] + (["--charts"] if charts else [])
+    result = run("-c", IMPORTS_SCRIPT, *args)
+    assert json.loads(result.stderr.strip().splitlines()[-1]) == imported
+    assert (tmp_path / "SKORM.html").exists()
@@ -0,0 +1,84 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.journal.schema import (JOURNAL_SCHEMA, _compact_float, _compact_int, apply_schema, editable_frame,
+                                schema_report, widen_prices)
+from src.journal.store import CsvJournalStore
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_prices_that_round_trip_at_two_decimals_become_float32():
+    notes = []
+    values = _compact_float(pd.Series([345.14, 1856.5, np.nan, 0.05]), notes, "price_in")
+    assert values.dtype == "float32" and notes == []
+    assert widen_prices(pd.DataFrame({"price_in": values}))["price_in"].tolist()[:2] == [345.14, 1856.5]
+
+
+def test_a_price_with_more_decimals_keeps_the_column_float64():
+    notes = []
+    values = pd.Series([345.14, 1856.525, 10.0])
+    kept = _compact_float(values, notes, "price_in")
+    assert kept.dtype == "float64" and kept.tolist() == values.tolist()
+    assert notes == ["price_in: 1 value(s) need more than 2 decimals, kept as float64"]
+
+
+def test_whole_numbers_become_nullable_ints():
+    notes = []
+    values = _compact_int(pd.Series([1.0, np.nan, 2_000_000_000.0]), "Int32", notes, "quantity_in")
+    assert str(values.dtype) == "Int32" and values.isna().tolist() == [False, True, False] and notes == []
+
+
+def test_fractions_and_overflow_are_reported_apart():
+    notes = []
+    values = pd.Series([1.5, 3e9, 4.0, -3e9])
+    assert _compact_int(values, "Int32", notes, "quantity_in").dtype == "float64"
+    assert notes == ["quantity_in: 1 value(s) are not whole numbers, kept as float64",
+                     "quantity_in: 2 value(s) don't fit Int32, kept as float64"]
+    notes = []
+    _compact_int(pd.Series([3e9]), "Int32", notes, "quantity_in")
+    assert notes == ["quantity_in: 1 value(s) don't fit Int32, kept as float64"]
+
+
+def test_apply_schema_types_and_validates_a_journal():
+    df = pd.DataFrame({
+        "script_name": ["ABC", "ABC", None],
+        "trade_base": ["ML-5", "BTS", "ML-5"],
+        "price_in": ["100.5", "0", "20"],
+        "quantity_in": [10, 5, 1],
+        "quantity_left": [12, 0, 1],
+        "date_in": ["2024-01-05", "2024-01-02", "2024-02-01"],
+        "date_out": ["2024-01-03", None, None],
+        "notes": ["a", "b", "c"],
+    })
+    typed = apply_schema(df, required=["script_name", "P/L (INR)"])
+    for column in df.columns.drop("notes"):
+        assert str(typed[column].dtype) == JOURNAL_SCHEMA[column]
+    assert typed["notes"].dtype == object
+    report = schema_report(typed)
+    assert report["rows"] == 3 and report["kept_wide"] == []
+    assert report["issues"] == ["missing column(s): P/L (INR)", "1 row(s) have more quantity_left than quantity_in",
+                                "1 row(s) have a price_in of zero or less", "1 row(s) were booked before they were entered",
+                                "1 row(s) have no script_name"]
+    assert schema_report(apply_schema(df, validate=False))["issues"] == []
+
+
+@pytest.mark.parametrize("name", ["SKORM_Journal.csv", "trade_data.csv"])
+def test_bundled_journals_shrink(name):
+    report = schema_report(CsvJournalStore(ROOT / name).load())
+    assert report["memory_after"] < report["memory_before"]
+
+
+def test_editable_frame_turns_categories_into_strings():
+    typed = apply_schema(pd.DataFrame({"script_name": ["ABC", "XYZ"], "trade_base": ["ML-5", None],
+                                       "price_in": [1.0, 2.0]}))
+    editable = editable_frame(typed)
+    assert editable["script_name"].dtype == object and editable["trade_base"].dtype == object
+    assert editable["script_name"].tolist() == ["ABC", "XYZ"] and pd.isna(editable["trade_base"].iat[1])
+    assert editable["price_in"].dtype == "float32"
+    # A new symbol can be set without being one of the categories
+    editable.loc[1, "script_name"] = "NEWCO"
+    assert isinstance(typed["script_name"].dtype, pd.CategoricalDtype)
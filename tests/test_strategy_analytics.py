@@ -0,0 +1,68 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.journal.store import CsvJournalStore
+from src.trades_analysis.strategy_analytics import SUM_FIELDS, StrategyAnalytics, booked_trades
+
+ROOT = Path(__file__).resolve().parents[1]
+CAPITAL = 1_000_000
+
+
+@pytest.fixture(params=["SKORM_Journal.csv", "trade_data.csv"])
+def journal(request):
+    return CsvJournalStore(ROOT / request.param).load()
+
+
+def pandas_rolling(trades, base, window):
+    # Reference: a time-based pandas rolling sum per exit, where every exit of
+    # one day sees all of that day's trades
+    rows = trades[trades["trade_base"] == base].sort_values("day", kind="stable")
+    rows = rows.set_index(pd.DatetimeIndex(rows["day"].to_numpy().astype("datetime64[D]"), name="date_out"))
+    sums = rows[SUM_FIELDS].expanding() if window is None else rows[SUM_FIELDS].rolling(f"{window}D")
+    sums = sums.sum().groupby(level=0).transform("last")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pd.DataFrame({
+            "trades": sums["trades"],
+            "win_rate": sums["wins"] / sums["trades"] * 100,
+            "expectancy": sums["pl"] / sums["trades"],
+            "profit_factor": np.where(sums["gross_loss"] > 0, sums["gross_profit"] / sums["gross_loss"],
+                                      np.where(sums["gross_profit"] > 0, np.inf, np.nan)),
+            "avg_days": sums["days"] / sums["trades"],
+            "capital_turnover": sums["capital"] / CAPITAL,
+        }, index=sums.index)
+
+
+@pytest.mark.parametrize("window", [30, 90, 365, None])
+def test_rolling_matches_pandas(journal, window):
+    engine = StrategyAnalytics.from_frame(journal)
+    assert engine.bases
+    for base in engine.bases:
+        pd.testing.assert_frame_equal(engine.rolling(base, window, CAPITAL), pandas_rolling(engine.trades, base, window),
+                                      check_freq=False)
+
+
+def test_synced_appends_match_a_full_rebuild(journal):
+    # Trades booked later arrive in exit order, so most bases only extend their sums
+    order = booked_trades(journal).sort_values("day", kind="stable").index
+    earlier = journal.drop(order[len(order) // 2:])
+    engine = StrategyAnalytics.from_frame(earlier)
+    synced = engine.sync(journal)
+    assert synced is engine
+    rebuilt = StrategyAnalytics.from_frame(journal)
+    pd.testing.assert_frame_equal(synced.compare(capital=CAPITAL), rebuilt.compare(capital=CAPITAL))
+    for base in rebuilt.bases:
+        pd.testing.assert_frame_equal(synced.rolling(base, 90, CAPITAL), rebuilt.rolling(base, 90, CAPITAL))
+
+
+def test_sync_rebuilds_when_a_seen_trade_changed(journal):
+    engine = StrategyAnalytics.from_frame(journal)
+    edited = journal.copy()
+    first = booked_trades(journal).index[0]
+    edited.loc[first, "P/L (INR)"] = 12345.0
+    synced = engine.sync(edited)
+    assert synced is not engine
+    pd.testing.assert_frame_equal(synced.compare(), StrategyAnalytics.from_frame(edited).compare())
+    assert engine.sync(journal) is engine
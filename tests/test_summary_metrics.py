@@ -0,0 +1,131 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.journal.store import JOURNAL_COLUMNS, open_journal_store
+from src.trades_analysis.summary_metrics import IncrementalSummary, SummaryMetrics, apply_change_set, shift_change_set
+
+ROOT = Path(__file__).resolve().parents[1]
+BASES = ["ML-5", "BTS", "LONG", "NEWBASE"]
+
+
+@pytest.fixture(scope="module")
+def journal():
+    return open_journal_store(ROOT / "SKORM_Journal.csv").load(JOURNAL_COLUMNS)
+
+
+def random_row(rng):
+    # A row as the editor hands it back: typed columns only, derived ones empty
+    quantity = int(rng.integers(1, 100))
+    booked = rng.random() < 0.6
+    return {
+        "script_name": f"SYM{rng.integers(0, 5)}",
+        "trade_base": str(rng.choice(BASES)),
+        "price_in": round(float(rng.uniform(10, 1000)), 2),
+        "quantity_in": quantity,
+        "quantity_left": 0 if booked else int(rng.integers(1, quantity + 1)),
+        "date_in": "2024-05-02",
+        "date_out": "2024-06-10" if booked else None,
+        "price_out": round(float(rng.uniform(10, 1000)), 2) if booked else None,
+    }
+
+
+def random_edit(rng):
+    edits = {}
+    if rng.random() < 0.5:
+        edits["price_out"] = round(float(rng.uniform(10, 1000)), 2)
+        edits["date_out"] = "2024-07-01"
+    if rng.random() < 0.5:
+        edits["quantity_left"] = int(rng.integers(0, 5))
+    if rng.random() < 0.3:
+        edits["trade_base"] = str(rng.choice(BASES))
+    return edits or {"price_in": round(float(rng.uniform(10, 1000)), 2)}
+
+
+def next_change_set(rng, changes, rows):
+    # The editor's change set is cumulative: each rerun adds to, revises or
+    # undoes what the previous one held
+    changes = {"edited_rows": dict(changes["edited_rows"]), "added_rows": list(changes["added_rows"]),
+               "deleted_rows": list(changes["deleted_rows"])}
+    action = rng.choice(["edit", "edit", "add", "delete", "undo_edit", "undo_add", "edit_added"])
+    if action == "edit":
+        pos = int(rng.integers(0, rows))
+        changes["edited_rows"][pos] = {**changes["edited_rows"].get(pos, {}), **random_edit(rng)}
+    elif action == "add":
+        changes["added_rows"].append(random_row(rng))
+    elif action == "delete":
+        changes["deleted_rows"].append(int(rng.integers(0, rows)))
+    elif action == "undo_edit" and changes["edited_rows"]:
+        changes["edited_rows"].pop(int(rng.choice(list(changes["edited_rows"]))))
+    elif action == "undo_add" and changes["added_rows"]:
+        changes["added_rows"].pop(int(rng.integers(0, len(changes["added_rows"]))))
+    elif action == "edit_added" and changes["added_rows"]:
+        pos = int(rng.integers(0, len(changes["added_rows"])))
+        changes["added_rows"][pos] = {**changes["added_rows"][pos], **random_edit(rng)}
+    return changes
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_incremental_matches_full_recompute(journal, seed):
+    rng = np.random.default_rng(seed)
+    # A high rebuild ratio keeps every step on the incremental path
+    summary = IncrementalSummary(journal, rebuild_ratio=10)
+    changes = {"edited_rows": {}, "added_rows": [], "deleted_rows": []}
+    for _ in range(40):
+        changes = next_change_set(rng, changes, len(journal))
+        metrics = summary.sync(changes)
+        full = SummaryMetrics.from_frame(apply_change_set(journal, changes))
+        assert metrics.matches(full)
+        assert summary.verify()
+    assert summary.rebuilds == 1
+
+
+def test_large_change_set_rebuilds(journal):
+    summary = IncrementalSummary(journal, rebuild_ratio=0.01)
+    changes = {"edited_rows": {pos: {"quantity_left": 0} for pos in range(10)}, "added_rows": [], "deleted_rows": []}
+    metrics = summary.sync(changes)
+    assert summary.rebuilds == 2
+    assert metrics.matches(SummaryMetrics.from_frame(apply_change_set(journal, changes)))
+
+
+def test_out_of_range_positions_rebuild(journal):
+    summary = IncrementalSummary(journal)
+    changes = {"edited_rows": {len(journal) + 5: {"price_in": 1.0}}, "added_rows": [], "deleted_rows": []}
+    metrics = summary.sync(changes)
+    assert summary.rebuilds == 2
+    assert metrics.matches(SummaryMetrics.from_frame(journal))
+
+
+def test_metrics_add_and_subtract(journal):
+    half = len(journal) // 2
+    first = SummaryMetrics.from_frame(journal.iloc[:half])
+    second = SummaryMetrics.from_frame(journal.iloc[half:])
+    whole = SummaryMetrics.from_frame(journal)
+    assert (first + second).matches(whole)
+    assert (whole - second).matches(first)
+
+
+def test_edited_derived_follows_change_set(journal):
+    summary = IncrementalSummary(journal)
+    assert summary.edited_derived("rows", len) == len(journal)
+    summary.sync({"added_rows": [random_row(np.random.default_rng(0))]})
+    assert summary.edited_derived("rows", len) == len(journal) + 1
+    summary.sync({"deleted_rows": [0, 1]})
+    assert summary.edited_derived("rows", len) == len(journal) - 2
+
+
+def test_paged_editor_change_set_maps_to_journal_rows(journal):
+    # An editor showing rows 100.. reports positions within its page
+    page = {"edited_rows": {3: {"quantity_left": 0}}, "added_rows": [random_row(np.random.default_rng(1))],
+            "deleted_rows": [0]}
+    changes = shift_change_set(page, 100)
+    assert list(changes["edited_rows"]) == [103] and changes["deleted_rows"] == [100]
+    edited = apply_change_set(journal, changes)
+    # Row order is kept, the added row goes last
+    expected = list(journal["script_name"].astype(str))
+    del expected[100]
+    assert list(edited["script_name"].astype(str)[:-1]) == expected
+    assert edited["script_name"].iloc[-1] == page["added_rows"][0]["script_name"]
+    assert edited["quantity_left"].iloc[102] == 0
@@ -0,0 +1,70 @@
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import streamlit as st
+
+from src.journal.edit_log import EditLogJournalStore
+from src.journal.schema import editable_frame, schema_report, widen_prices
+from src.journal.store import JOURNAL_COLUMNS, CsvJournalStore, migrate_csv_to_parquet
+from src.trades_analysis.derived_columns import calculate_derived_columns
+from src.trades_analysis.summary_metrics import apply_change_set
+from src.trades_analysis.trade_data import EDITOR_KEY, EDITOR_OFFSET_KEY, editor_changes
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture(params=["SKORM_Journal.csv", "trade_data.csv"])
+def csv_store(request, tmp_path):
+    shutil.copy(ROOT / request.param, tmp_path / request.param)
+    return CsvJournalStore(tmp_path / request.param)
+
+
+def save_like_trade_data(store, changes):
+    # The CSV branch of trade_data()'s Save button
+    df = store.load(JOURNAL_COLUMNS)
+    store.save(calculate_derived_columns(apply_change_set(editable_frame(df), changes)))
+
+
+def test_saving_one_edit_leaves_the_other_prices_alone(csv_store):
+    before = pd.read_csv(csv_store.path)
+    kept_wide = schema_report(csv_store.load(JOURNAL_COLUMNS))["kept_wide"]
+    save_like_trade_data(csv_store, {"edited_rows": {1: {"price_out": 123.45}}, "deleted_rows": [],
+                                     "added_rows": [{"script_name": "NEWCO", "price_in": 10.1, "quantity_in": 3,
+                                                     "quantity_left": 3, "date_in": "2024-06-03"}]})
+    after = pd.read_csv(csv_store.path)
+    assert len(after) == len(before) + 1 and after["price_out"].iat[1] == 123.45
+    untouched = before.index != 1
+    # Derived columns are recomputed on save, from the prices as they were typed
+    expected = calculate_derived_columns(before.copy())
+    for column in ["price_in", "price_out", "amount_in", "balance_left", "P/L (INR)", "P/L in %"]:
+        pd.testing.assert_series_equal(after[column].iloc[:len(before)][untouched], expected[column][untouched],
+                                       check_dtype=False)
+    assert after["price_in"].iat[-1] == 10.1
+    # Prices that were compact stay compact on the next load
+    assert schema_report(csv_store.load(JOURNAL_COLUMNS))["kept_wide"] == kept_wide
+
+
+@pytest.mark.parametrize("backend", ["csv", "parquet"])
+def test_an_edit_on_page_two_lands_on_its_journal_row(csv_store, backend, monkeypatch):
+    store = csv_store if backend == "csv" else EditLogJournalStore(migrate_csv_to_parquet(csv_store.path).path)
+    df = store.load(JOURNAL_COLUMNS)
+    # The editor's second page of 20 rows reports positions within the page
+    monkeypatch.setitem(st.session_state, EDITOR_OFFSET_KEY, 20)
+    monkeypatch.setitem(st.session_state, EDITOR_KEY, {"edited_rows": {3: {"price_out": 123.45}}, "added_rows": [],
+                                                       "deleted_rows": [0]})
+    changes = editor_changes()
+    if backend == "csv":
+        store.save(calculate_derived_columns(apply_change_set(editable_frame(df), changes)))
+    else:
+        store.save_changes(df, changes)
+    after = widen_prices(store.load(JOURNAL_COLUMNS))
+    assert len(after) == len(df) - 1
+    # Journal row 20 is gone, row 23 carries the edit, the rows around it don't
+    expected = widen_prices(df).drop(df.index[20])
+    assert after["price_out"].tolist()[22] == 123.45
+    assert after["script_name"].astype(str).tolist() == expected["script_name"].astype(str).tolist()
+    others = [i for i in range(len(after)) if i != 22]
+    assert after["price_out"].iloc[others].tolist() == pytest.approx(expected["price_out"].iloc[others].tolist(),
+                                                                      nan_ok=True)
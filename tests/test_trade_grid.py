@@ -0,0 +1,40 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.trades_analysis.trade_grid import BOOKING_STATUSES, STATUS_CSS, booking_status, filter_positions, page_positions
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def highlight_survived(row):
+    # The grid's old per-row highlight
+    if row["quantity_left"] == 0:
+        return ["background-color: #8ef05d"] * len(row)
+    elif row["quantity_left"] < row["quantity_in"]:
+        return ["background-color: lightblue"] * len(row)
+    else:
+        return ["background-color: pink"] * len(row)
+
+
+@pytest.mark.parametrize("name", ["SKORM_Journal.csv", "trade_data.csv"])
+def test_booking_status_matches_the_row_wise_highlight(name):
+    df = pd.read_csv(ROOT / name)
+    # Plus the edge cases: missing quantities, more left than bought
+    df = pd.concat([df, pd.DataFrame({"quantity_in": [np.nan, 5, 5, 0, np.nan],
+                                      "quantity_left": [0, np.nan, 7, 0, np.nan]})], ignore_index=True)
+    expected = [highlight_survived(row)[0] for _, row in df[["quantity_in", "quantity_left"]].iterrows()]
+    status = booking_status(df)
+    assert status.map(STATUS_CSS).astype(str).tolist() == expected
+    assert list(status.cat.categories) == BOOKING_STATUSES
+
+
+def test_status_filter_and_pages():
+    df = pd.DataFrame({"script_name": list("ABCDE"), "trade_base": ["x"] * 5, "date_in": ["2024-01-01"] * 5,
+                       "quantity_in": [10, 10, 10, 10, 10], "quantity_left": [0, 5, 10, 0, 3]})
+    positions = filter_positions(df, statuses=["Fully Booked", "Partially Booked"])
+    assert positions.tolist() == [0, 1, 3, 4]
+    assert [p.tolist() for p in page_positions(positions, 2, 3)[:1]] == [[4]]
+    assert page_positions(positions, 9, 3)[1] == 2
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.journal.store import JOURNAL_COLUMNS, open_journal_store
+from src.trades_analysis.trade_index import SYMBOL_AGGREGATES, build_trade_index, top_k
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture(scope="module")
+def journal():
+    return open_journal_store(ROOT / "SKORM_Journal.csv").load(JOURNAL_COLUMNS)
+
+
+def test_top_k_is_a_stable_sort_without_nan():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 20, 200).astype("float64")
+    values[rng.random(200) < 0.3] = np.nan
+    known = pd.Series(values).dropna()
+    for k in [0, 1, 7, 50, len(known) - 1, len(known), len(known) + 1, 500]:
+        assert list(top_k(values, k)) == list(known.sort_values(ascending=False, kind="stable").index[:k])
+        assert list(top_k(values, k, largest=False)) == list(known.sort_values(kind="stable").index[:k])
+
+
+def test_per_trade_tables_stop_at_the_booked_trades(journal):
+    index = build_trade_index(journal)
+    booked = pd.to_datetime(journal["date_out"], errors="coerce").notna().sum()
+    held = (pd.to_numeric(journal["days_taken"], errors="coerce") > 0).sum()
+    for k in [held + 3, len(journal) + 10]:
+        assert len(index.recent(k)) == booked
+        assert index.recent(k)["date_out"].notna().all()
+        for table in [index.fastest(k), index.slowest(k)]:
+            assert len(table) == held and (pd.to_numeric(table["days_taken"]) > 0).all()
+
+
+def test_top_symbols_never_pads(journal):
+    index = build_trade_index(journal)
+    symbols = journal.groupby("script_name", observed=True).agg(SYMBOL_AGGREGATES)
+    for by in ["P/L (INR)", "P/L in %"]:
+        table = index.top_symbols(len(symbols) + 5, by)
+        assert len(table) == symbols[by].notna().sum() and table[by].notna().all()
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.journal.edit_log import LOG_FILE, read_records
+from src.journal.store import open_journal_store
+from src.journal.tradebook_import import TradebookError, TradebookImporter, import_tradebooks
+
+HEADER = "symbol,trade_date,trade_type,quantity,price,trade_id,order_id,order_execution_time\n"
+
+
+def tradebook(path, *fills):
+    # fills: (symbol, day, side, quantity, price, trade_id, order_id, time)
+    lines = [",".join(str(value) for value in fill) + "\n" for fill in fills]
+    path.write_text(HEADER + "".join(lines))
+    return path
+
+
+def journal(path):
+    return open_journal_store(path).load()
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return tmp_path, tmp_path / "Broker_Journal.parquet"
+
+
+def test_sells_close_the_oldest_lots_first(paths):
+    root, target = paths
+    source = tradebook(root / "tb.csv",
+                       ("ABC", "2024-01-02", "buy", 10, 100, "t1", "o1", "2024-01-02 10:00:00"),
+                       ("ABC", "2024-01-03", "buy", 5, 110, "t2", "o2", "2024-01-03 10:00:00"),
+                       ("ABC", "2024-01-05", "sell", 12, 120, "t3", "o3", "2024-01-05 10:00:00"))
+    report = import_tradebooks([source], target)
+    assert (report.lots_opened, report.lots_closed, report.unmatched) == (2, 1, {})
+    lots = journal(target)
+    assert lots["quantity_left"].tolist() == [0, 3]
+    assert lots["price_out"].tolist() == [120, 120]
+    assert lots["P/L (INR)"].tolist() == [200, 20]
+    assert lots["date_out"].tolist() == [pd.Timestamp("2024-01-05")] * 2
+
+
+def test_partial_exits_average_the_exit_price(paths):
+    root, target = paths
+    source = tradebook(root / "tb.csv",
+                       ("ABC", "2024-01-02", "buy", 10, 100, "t1", "o1", "2024-01-02 10:00:00"),
+                       ("ABC", "2024-01-04", "sell", 4, 110, "t2", "o2", "2024-01-04 10:00:00"),
+                       ("ABC", "2024-01-08", "sell", 2, 125, "t3", "o3", "2024-01-08 10:00:00"))
+    import_tradebooks([source], target)
+    lot = journal(target).iloc[0]
+    assert lot["quantity_left"] == 4
+    assert lot["price_out"] == pytest.approx((4 * 110 + 2 * 125) / 6)
+    assert lot["date_out"] == pd.Timestamp("2024-01-08")
+    assert lot["days_taken"] == 6
+
+
+def test_fills_of_one_order_make_one_lot(paths):
+    root, target = paths
+    source = tradebook(root / "tb.csv",
+                       ("ABC", "2024-01-02", "buy", 10, 100, "t1", "o1", "2024-01-02 10:00:00"),
+                       ("ABC", "2024-01-02", "buy", 30, 104, "t2", "o1", "2024-01-02 10:00:01"),
+                       ("ABC", "2024-01-03", "sell", 5, 110, "t3", "o2", "2024-01-03 10:00:00"),
+                       # Sold from already, so a later fill of the order opens a lot of its own
+                       ("ABC", "2024-01-03", "buy", 2, 108, "t4", "o1", "2024-01-03 10:00:01"))
+    report = import_tradebooks([source], target)
+    assert (report.buys, report.lots_opened) == (3, 2)
+    lots = journal(target)
+    assert lots["quantity_in"].tolist() == [40, 2]
+    assert lots["price_in"].iloc[0] == pytest.approx(103)
+    assert lots["quantity_left"].tolist() == [35, 2]
+
+
+def test_reimport_only_appends_the_new_fills(paths):
+    root, target = paths
+    first = tradebook(root / "jan.csv",
+                      ("ABC", "2024-01-02", "buy", 10, 100, "t1", "o1", "2024-01-02 10:00:00"),
+                      ("XYZ", "2024-01-03", "buy", 3, 50, "t2", "o2", "2024-01-03 10:00:00"))
+    import_tradebooks([first], target, trade_base="ML-5")
+    again = import_tradebooks([first], target)
+    assert (again.duplicates, again.buys) == (2, 0)
+
+    # The next export overlaps the first; a trade_base set in the app stays
+    store = open_journal_store(target)
+    store.save_changes(store.load(), {"edited_rows": {0: {"trade_base": "BTS"}}})
+    overlap = tradebook(root / "feb.csv",
+                        ("XYZ", "2024-01-03", "buy", 3, 50, "t2", "o2", "2024-01-03 10:00:00"),
+                        ("ABC", "2024-02-01", "sell", 10, 130, "t3", "o3", "2024-02-01 10:00:00"),
+                        ("XYZ", "2024-02-02", "buy", 1, 55, "t4", "o4", "2024-02-02 10:00:00"))
+    report = import_tradebooks([overlap], target, trade_base="JK")
+    assert (report.duplicates, report.sells, report.buys, report.lots_closed) == (1, 1, 1, 1)
+    lots = journal(target)
+    assert lots["script_name"].astype(str).tolist() == ["ABC", "XYZ", "XYZ"]
+    assert lots["trade_base"].astype(str).tolist() == ["BTS", "ML-5", "JK"]
+    assert lots["quantity_left"].tolist() == [0, 3, 1]
+    # Only the closed lot and the new one were written, as one change set
+    records, _ = read_records(target / LOG_FILE)
+    assert [r["upserts"]["index"] for r in records[1:]] == [[0, 1], [0], [0, 2]]
+
+
+def test_fills_going_back_in_time_across_chunks_are_rejected(paths):
+    root, target = paths
+    source = tradebook(root / "tb.csv",
+                       ("ABC", "2024-01-05", "buy", 10, 100, "t1", "o1", "2024-01-05 10:00:00"),
+                       ("XYZ", "2024-01-02", "buy", 10, 100, "t2", "o2", "2024-01-02 10:00:00"),
+                       ("ABC", "2024-01-03", "sell", 10, 120, "t3", "o3", "2024-01-03 10:00:00"),
+                       ("XYZ", "2024-01-06", "sell", 10, 120, "t4", "o4", "2024-01-06 10:00:00"))
+    with pytest.raises(TradebookError, match="ABC"):
+        TradebookImporter(target, chunksize=2).import_files([source])
+    assert not open_journal_store(target).exists()
+    # Within one chunk the fills are put in time order first
+    report = TradebookImporter(target, chunksize=4).import_files([source])
+    assert (report.lots_opened, report.lots_closed, report.unmatched) == (2, 1, {"ABC": 10})
+
+
+def test_resume_keeps_only_open_lots(paths):
+    root, target = paths
+    fills = [("S%d" % (i % 7), "2024-01-%02d" % (1 + i // 10), "buy" if i % 3 else "sell", 5, 100 + i, f"t{i}",
+              f"o{i}", "2024-01-%02d 10:00:%02d" % (1 + i // 10, i % 10)) for i in range(200)]
+    import_tradebooks([tradebook(root / "tb.csv", *fills)], target, chunksize=40)
+    lots = journal(target)
+    importer = TradebookImporter(target)
+    assert importer.book.size == int((lots["quantity_left"] > 0).sum())
+    assert sorted(importer.book.lot_id[:importer.book.size]) == sorted(lots.index[lots["quantity_left"] > 0])
+    assert np.array_equal(np.sort(importer.book.quantity_left[:importer.book.size]),
+                          np.sort(lots.loc[lots["quantity_left"] > 0, "quantity_left"].to_numpy(dtype="float64")))
+
+
+def test_flushing_between_chunks_matches_one_save(paths):
+    root, target = paths
+    # Orders of two fills, some of them split across chunks
+    fills = [("S%d" % ((i + 1) // 2 % 7), "2024-01-%02d" % (1 + i // 10), "buy" if i % 3 else "sell", 5, 100 + i,
+              f"t{i}", f"o{(i + 1) // 2}", "2024-01-%02d 10:00:%02d" % (1 + i // 10, i % 10)) for i in range(200)]
+    source = tradebook(root / "tb.csv", *fills)
+    once = root / "Once.parquet"
+    import_tradebooks([source], once, chunksize=40)
+    importer = TradebookImporter(target, chunksize=40, flush_lots=1)
+    importer.import_files([source])
+    # Every chunk was written as it was read, and only open lots stayed in memory
+    records, _ = read_records(target / LOG_FILE)
+    assert len(records) - 1 == 5
+    lots = journal(target)
+    assert importer.book.size == int((lots["quantity_left"] > 0).sum())
+    pd.testing.assert_frame_equal(lots, journal(once))
+    assert np.array_equal(np.load(target / "_imported_trades.npy"), np.load(once / "_imported_trades.npy"))
+
+
+def test_csv_journals_are_rejected(paths):
+    root, _ = paths
+    with pytest.raises(TradebookError, match="parquet"):
+        TradebookImporter(root / "Broker_Journal.csv")
+    assert not (root / "Broker_Journal.csv").exists()